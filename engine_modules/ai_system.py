@@ -8,8 +8,22 @@ from panda3d.core import Point3, Vec3, NodePath, LineSegs, CollisionRay, Collisi
 from enum import Enum
 import heapq
 import json
+import math
 from typing import List, Dict, Optional, Callable, Tuple
 import asyncio
+import queue
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
 
 
 # ==================== Behavior Tree Framework ====================
@@ -237,290 +251,2866 @@ class BehaviorTree:
         self.root.reset()
 
 
+# Compiled tree opcodes
+_OP_SEQUENCE, _OP_SELECTOR, _OP_PARALLEL, _OP_INVERTER, _OP_REPEATER, _OP_CONDITION, _OP_ACTION, _OP_OPAQUE = range(8)
+
+
+class BehaviorState:
+    """Per-agent state of a CompiledBehaviorTree
+    
+    cursor holds each composite's current child ordinal and each
+    repeater's count; resume is the running leaf to continue from (-1:
+    start at the root).
+    """
+    
+    __slots__ = ('cursor', 'successes', 'failures', 'resume')
+    
+    def __init__(self, size: int):
+        self.cursor = [0] * size
+        self.successes = [0] * size
+        self.failures = [0] * size
+        self.resume = -1
+
+
+class CompiledBehaviorTree:
+    """A behavior tree flattened into pre-order arrays
+    
+    One compiled template can drive any number of agents: node state lives
+    in a BehaviorState per agent rather than in the nodes, and ticks walk
+    the arrays with a loop (child/parent jumps) instead of recursive
+    method calls. When the last tick stopped at a RUNNING leaf with no
+    Parallel above it, the next tick resumes at that leaf. Results match
+    ticking the original tree (which keeps one shared state).
+    """
+    
+    def __init__(self, root: BehaviorNode):
+        self.ops: List[int] = []
+        self.parents: List[int] = []
+        self.children: List[Tuple[int, ...]] = []
+        self.functions: List[Optional[Callable]] = []
+        self.params: List[int] = []  # require_all (parallel) or count (repeater)
+        self.names: List[str] = []
+        self._emit(root, -1)
+        
+        n = len(self.ops)
+        # Composites a reset of each subtree rewinds (repeater counts survive
+        # resets, as in RepeaterNode)
+        subtree_end = [0] * n
+        for i in range(n - 1, -1, -1):
+            subtree_end[i] = subtree_end[self.children[i][-1]] if self.children[i] else i + 1
+        composite = (_OP_SEQUENCE, _OP_SELECTOR, _OP_PARALLEL)
+        self.reset_lists = [tuple(k for k in range(i, subtree_end[i]) if self.ops[k] in composite)
+                            for i in range(n)]
+        self.resumable = [self._resumable(i) for i in range(n)]
+    
+    def _emit(self, node: BehaviorNode, parent: int) -> int:
+        index = len(self.ops)
+        self.parents.append(parent)
+        self.names.append(node.name)
+        self.functions.append(None)
+        self.params.append(0)
+        self.children.append(())
+        
+        kids = []
+        if isinstance(node, SequenceNode):
+            op, kids = _OP_SEQUENCE, node.children
+        elif isinstance(node, SelectorNode):
+            op, kids = _OP_SELECTOR, node.children
+        elif isinstance(node, ParallelNode):
+            op, kids = _OP_PARALLEL, node.children
+            self.params[index] = 1 if node.require_all else 0
+        elif isinstance(node, InverterNode):
+            op, kids = _OP_INVERTER, [node.child] if node.child else []
+        elif isinstance(node, RepeaterNode):
+            op, kids = _OP_REPEATER, [node.child] if node.child else []
+            self.params[index] = node.count
+        elif isinstance(node, ConditionNode):
+            op = _OP_CONDITION
+            self.functions[index] = node.condition
+        elif isinstance(node, ActionNode):
+            op = _OP_ACTION
+            self.functions[index] = node.action
+        else:
+            # Unknown node type: tick the object itself (its state stays shared)
+            op = _OP_OPAQUE
+            self.functions[index] = node.tick
+        self.ops.append(op)
+        
+        self.children[index] = tuple(self._emit(child, index) for child in kids)
+        return index
+    
+    def _resumable(self, index: int) -> bool:
+        if self.ops[index] not in (_OP_CONDITION, _OP_ACTION, _OP_OPAQUE):
+            return False
+        parent = self.parents[index]
+        while parent >= 0:
+            if self.ops[parent] == _OP_PARALLEL:
+                return False  # Parallels re-tick every child
+            parent = self.parents[parent]
+        return True
+    
+    def __len__(self) -> int:
+        return len(self.ops)
+    
+    def new_state(self) -> BehaviorState:
+        return BehaviorState(len(self.ops))
+    
+    def reset(self, state: BehaviorState):
+        """Rewind an agent's state (like BehaviorTree.reset)"""
+        for k in self.reset_lists[0]:
+            state.cursor[k] = 0
+        state.resume = -1
+    
+    def tick(self, agent, dt: float, state: Optional[BehaviorState] = None) -> NodeStatus:
+        """Execute the tree for one agent
+        
+        state defaults to agent.behavior_state (created on first use).
+        """
+        if state is None:
+            state = agent.behavior_state
+            if state is None:
+                state = agent.behavior_state = self.new_state()
+        
+        node = state.resume
+        if node >= 0:
+            status = self.functions[node](agent, dt)
+            if status == NodeStatus.RUNNING:
+                # No Parallel above: every ancestor passes RUNNING through as is
+                return status
+            state.resume = -1
+            descending = False
+        else:
+            node = 0
+            descending = True
+            status = NodeStatus.FAILURE
+        
+        ops, parents, children, functions, params = self.ops, self.parents, self.children, self.functions, self.params
+        reset_lists = self.reset_lists
+        cursor, successes, failures = state.cursor, state.successes, state.failures
+        SUCCESS, FAILURE, RUNNING = NodeStatus.SUCCESS, NodeStatus.FAILURE, NodeStatus.RUNNING
+        
+        running_leaf = -1
+        
+        while True:
+            if descending:
+                op = ops[node]
+                if op == _OP_ACTION or op == _OP_OPAQUE:
+                    status = functions[node](agent, dt)
+                    if status == RUNNING:
+                        running_leaf = node
+                    descending = False
+                elif op == _OP_CONDITION:
+                    status = SUCCESS if functions[node](agent) else FAILURE
+                    descending = False
+                elif op == _OP_SEQUENCE or op == _OP_SELECTOR:
+                    kids = children[node]
+                    if cursor[node] < len(kids):
+                        node = kids[cursor[node]]
+                        continue
+                    for k in reset_lists[node]:
+                        cursor[k] = 0
+                    status = SUCCESS if op == _OP_SEQUENCE else FAILURE
+                    descending = False
+                elif op == _OP_PARALLEL:
+                    kids = children[node]
+                    if kids:
+                        successes[node] = failures[node] = 0
+                        cursor[node] = 0
+                        node = kids[0]
+                        continue
+                    status = SUCCESS if params[node] else FAILURE
+                    descending = False
+                elif op == _OP_INVERTER:
+                    if children[node]:
+                        node = children[node][0]
+                        continue
+                    status = FAILURE
+                    descending = False
+                else:  # _OP_REPEATER
+                    count = params[node]
+                    if not children[node]:
+                        status = FAILURE
+                    elif count > 0 and cursor[node] >= count:
+                        cursor[node] = 0
+                        status = SUCCESS
+                    else:
+                        node = children[node][0]
+                        continue
+                    descending = False
+                continue
+            
+            # Hand `status` from node to its parent
+            parent = parents[node]
+            if parent < 0:
+                break
+            op = ops[parent]
+            if op == _OP_SEQUENCE or op == _OP_SELECTOR:
+                if status == RUNNING:
+                    pass
+                elif (status == FAILURE) == (op == _OP_SEQUENCE):
+                    # Sequence failed / selector succeeded: rewind and report
+                    for k in reset_lists[parent]:
+                        cursor[k] = 0
+                else:
+                    cursor[parent] += 1
+                    kids = children[parent]
+                    if cursor[parent] < len(kids):
+                        node = kids[cursor[parent]]
+                        descending = True
+                        continue
+                    for k in reset_lists[parent]:
+                        cursor[k] = 0
+            elif op == _OP_PARALLEL:
+                if status == SUCCESS:
+                    successes[parent] += 1
+                elif status == FAILURE:
+                    failures[parent] += 1
+                kids = children[parent]
+                cursor[parent] += 1
+                if cursor[parent] < len(kids):
+                    node = kids[cursor[parent]]
+                    descending = True
+                    continue
+                total = len(kids)
+                if params[parent]:
+                    status = SUCCESS if successes[parent] == total else FAILURE if failures[parent] > 0 else RUNNING
+                else:
+                    status = SUCCESS if successes[parent] > 0 else FAILURE if failures[parent] == total else RUNNING
+            elif op == _OP_INVERTER:
+                if status == SUCCESS:
+                    status = FAILURE
+                elif status == FAILURE:
+                    status = SUCCESS
+            else:  # _OP_REPEATER
+                count = params[parent]
+                if status != RUNNING:
+                    cursor[parent] += 1
+                    for k in reset_lists[node]:
+                        cursor[k] = 0
+                status = RUNNING if count == -1 or cursor[parent] < count else SUCCESS
+            node = parent
+        
+        if status == RUNNING and running_leaf >= 0 and self.resumable[running_leaf]:
+            state.resume = running_leaf
+        return status
+
+
+def compile_behavior_tree(tree) -> CompiledBehaviorTree:
+    """Flatten a BehaviorTree (or root node) for per-agent-state ticking"""
+    root = tree.root if isinstance(tree, BehaviorTree) else tree
+    return CompiledBehaviorTree(root)
+
+
 # ==================== Navigation Mesh ====================
 
 class NavMeshNode:
-    """Single node/polygon in navigation mesh"""
+    """Single node/polygon in navigation mesh
     
-    def __init__(self, center: Point3, radius: float, walkable: bool = True):
-        self.center = center
-        self.radius = radius
-        self.walkable = walkable
-        self.neighbors: List[NavMeshNode] = []
-        self.cost = 1.0  # Movement cost multiplier
+    Lightweight view of one row of the NavigationMesh arrays; node data
+    lives in the mesh, so views can be created freely and compare equal
+    when they refer to the same node id.
+    """
+    
+    __slots__ = ('mesh', 'id')
+    
+    def __init__(self, mesh: 'NavigationMesh', node_id: int):
+        self.mesh = mesh
+        self.id = int(node_id)
+    
+    @property
+    def center(self) -> Point3:
+        return Point3(*self.mesh.centers[self.id])
+    
+    @property
+    def radius(self) -> float:
+        return float(self.mesh.radii[self.id])
+    
+    @property
+    def walkable(self) -> bool:
+        return bool(self.mesh.walkable[self.id])
+    
+    @walkable.setter
+    def walkable(self, value: bool):
+        self.mesh.set_walkable([self.id], value)
+    
+    @property
+    def cost(self) -> float:
+        """Movement cost multiplier"""
+        return float(self.mesh.costs[self.id])
+    
+    @cost.setter
+    def cost(self, value: float):
+        self.mesh.set_cost([self.id], value)
+    
+    @property
+    def neighbors(self) -> List['NavMeshNode']:
+        return [NavMeshNode(self.mesh, j) for j in self.mesh.neighbor_ids(self.id)]
     
     def add_neighbor(self, node: 'NavMeshNode'):
-        if node not in self.neighbors:
-            self.neighbors.append(node)
-            node.neighbors.append(self)
+        self.mesh.connect_nodes(self.id, node.id)
     
     def distance_to(self, other: 'NavMeshNode') -> float:
-        return (self.center - other.center).length()
+        return float(np.linalg.norm(self.mesh.centers[self.id] - self.mesh.centers[other.id]))
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, NavMeshNode) and other.mesh is self.mesh and other.id == self.id
+    
+    def __hash__(self) -> int:
+        return hash((id(self.mesh), self.id))
+    
+    def __lt__(self, other: 'NavMeshNode') -> bool:
+        return self.id < other.id
+    
+    def __repr__(self) -> str:
+        return f"NavMeshNode({self.id}, center={tuple(self.mesh.centers[self.id].tolist())})"
 
 
-class NavigationMesh:
-    """Navigation mesh for pathfinding"""
+class _NavMeshNodeList:
+    """Sequence of NavMeshNode views over a mesh (created on access)"""
     
-    def __init__(self, grid_size: Tuple[int, int, int] = (20, 20, 10), cell_size: float = 2.0):
-        self.grid_size = grid_size
-        self.cell_size = cell_size
-        self.nodes: List[NavMeshNode] = []
-        self.grid: Dict[Tuple[int, int, int], NavMeshNode] = {}
-        self.debug_visual: Optional[NodePath] = None
+    def __init__(self, mesh: 'NavigationMesh'):
+        self._mesh = mesh
     
-    def generate_grid(self, bounds_min: Point3, bounds_max: Point3):
-        """Generate a grid-based navigation mesh"""
-        self.nodes.clear()
-        self.grid.clear()
-        
-        x_range = int((bounds_max.x - bounds_min.x) / self.cell_size)
-        y_range = int((bounds_max.y - bounds_min.y) / self.cell_size)
-        z_range = int((bounds_max.z - bounds_min.z) / self.cell_size)
-        
-        # Create nodes
-        for x in range(x_range):
-            for y in range(y_range):
-                for z in range(z_range):
-                    pos = Point3(
-                        bounds_min.x + x * self.cell_size,
-                        bounds_min.y + y * self.cell_size,
-                        bounds_min.z + z * self.cell_size
-                    )
-                    node = NavMeshNode(pos, self.cell_size / 2)
-                    self.nodes.append(node)
-                    self.grid[(x, y, z)] = node
-        
-        # Connect neighbors (6-connectivity)
-        for x in range(x_range):
-            for y in range(y_range):
-                for z in range(z_range):
-                    node = self.grid[(x, y, z)]
-                    
-                    # Connect to adjacent cells
-                    for dx, dy, dz in [(1,0,0), (-1,0,0), (0,1,0), (0,-1,0), (0,0,1), (0,0,-1)]:
-                        nx, ny, nz = x + dx, y + dy, z + dz
-                        if (nx, ny, nz) in self.grid:
-                            neighbor = self.grid[(nx, ny, nz)]
-                            if neighbor not in node.neighbors:
-                                node.add_neighbor(neighbor)
+    def __len__(self) -> int:
+        return self._mesh.node_count
     
-    def mark_obstacle(self, position: Point3, radius: float):
-        """Mark area as non-walkable"""
-        for node in self.nodes:
-            if (node.center - position).length() <= radius + node.radius:
-                node.walkable = False
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [NavMeshNode(self._mesh, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("navmesh node index out of range")
+        return NavMeshNode(self._mesh, index)
     
-    def find_nearest_node(self, position: Point3) -> Optional[NavMeshNode]:
-        """Find closest walkable node to position"""
-        closest = None
-        min_dist = float('inf')
-        
-        for node in self.nodes:
-            if not node.walkable:
-                continue
-            dist = (node.center - position).length()
-            if dist < min_dist:
-                min_dist = dist
-                closest = node
+    def __iter__(self):
+        for i in range(len(self)):
+            yield NavMeshNode(self._mesh, i)
+
+
+class NavMeshSpatialIndex:
+    """Spatial hash over the walkable nodes of an irregular navmesh
+    
+    Buckets are cubes of ``bucket_size``; each holds the ids of the
+    walkable nodes whose centers fall inside. Walkability changes are
+    applied incrementally with update(). Nearest queries visit bucket
+    shells in growing Chebyshev rings and stop once no unvisited bucket
+    can hold a closer node.
+    """
+    
+    def __init__(self, centers: np.ndarray, walkable: np.ndarray, bucket_size: float):
+        self.bucket_size = float(bucket_size)
+        self.centers = centers.tolist()
+        self.buckets: Dict[Tuple[int, int, int], set] = {}
+        self.count = 0
+        self._low = np.zeros(3, dtype=np.int64)
+        self._high = np.full(3, -1, dtype=np.int64)
         
-        return closest
+        keys = np.floor(centers / self.bucket_size).astype(np.int64)
+        for node_id in np.flatnonzero(walkable).tolist():
+            self._insert(node_id, keys[node_id])
+    
+    def _key(self, node_id: int) -> np.ndarray:
+        return np.floor(np.array(self.centers[node_id]) / self.bucket_size).astype(np.int64)
+    
+    def _insert(self, node_id: int, key: np.ndarray):
+        bucket = self.buckets.setdefault(tuple(key.tolist()), set())
+        if node_id not in bucket:
+            bucket.add(node_id)
+            self.count += 1
+            if self.count == 1:
+                self._low, self._high = key.copy(), key.copy()
+            else:
+                self._low = np.minimum(self._low, key)
+                self._high = np.maximum(self._high, key)
+    
+    def insert(self, node_id: int):
+        """Add a (walkable) node"""
+        self._insert(node_id, self._key(node_id))
+    
+    def remove(self, node_id: int):
+        """Drop a node that became unwalkable"""
+        key = tuple(self._key(node_id).tolist())
+        bucket = self.buckets.get(key)
+        if bucket is not None and node_id in bucket:
+            bucket.discard(node_id)
+            self.count -= 1
+            if not bucket:
+                del self.buckets[key]
     
-    def find_path(self, start: Point3, goal: Point3) -> List[Point3]:
-        """A* pathfinding"""
-        start_node = self.find_nearest_node(start)
-        goal_node = self.find_nearest_node(goal)
+    def update(self, node_ids, walkable: bool):
+        """Apply a walkability change to several nodes"""
+        for node_id in np.asarray(node_ids, dtype=np.int64).ravel().tolist():
+            if walkable:
+                self.insert(node_id)
+            else:
+                self.remove(node_id)
+    
+    def nearest(self, position: np.ndarray) -> int:
+        """Id of the closest indexed node, or -1"""
+        if self.count == 0:
+            return -1
         
-        if not start_node or not goal_node:
-            return []
+        center = np.floor(position / self.bucket_size).astype(np.int64)
+        # Rings beyond this cannot contain indexed buckets
+        max_ring = int(max(np.abs(self._low - center).max(), np.abs(self._high - center).max()))
         
-        # A* algorithm
-        open_set = [(0, start_node)]
-        came_from = {}
-        g_score = {start_node: 0}
-        f_score = {start_node: start_node.distance_to(goal_node)}
+        point = position.tolist()
+        centers = self.centers
+        best_id, best = -1, math.inf
+        for ring in range(max_ring + 1):
+            for key in self._ring_keys(center, ring):
+                bucket = self.buckets.get(key)
+                if not bucket:
+                    continue
+                for node_id in bucket:
+                    dist = math.dist(centers[node_id], point)
+                    if dist < best or (dist == best and node_id < best_id):
+                        best_id, best = node_id, dist
+            
+            # Unvisited buckets are at least `ring` bucket widths away
+            if best_id >= 0 and best <= ring * self.bucket_size:
+                break
+        return best_id
+    
+    @staticmethod
+    def _ring_keys(center: np.ndarray, ring: int):
+        """Bucket keys at Chebyshev distance `ring` from center"""
+        cx, cy, cz = center.tolist()
+        if ring == 0:
+            yield (cx, cy, cz)
+            return
+        for dx in range(-ring, ring + 1):
+            for dy in range(-ring, ring + 1):
+                if abs(dx) == ring or abs(dy) == ring:
+                    for dz in range(-ring, ring + 1):
+                        yield (cx + dx, cy + dy, cz + dz)
+                else:
+                    yield (cx + dx, cy + dy, cz - ring)
+                    yield (cx + dx, cy + dy, cz + ring)
+
+
+class PathSearch:
+    """Resumable A* over the plain-list navmesh mirrors
+    
+    step() expands at most `budget` nodes and can be called again later,
+    so long searches can be spread over several frames.
+    """
+    
+    def __init__(self, lists, start_id: int, goal_id: int):
+        self.lists = lists
+        self.start_id = start_id
+        self.goal_id = goal_id
+        self.goal_center = lists[0][goal_id]
+        self.open_set = [(math.dist(lists[0][start_id], self.goal_center), start_id)]
+        self.came_from: Dict[int, int] = {}
+        self.g_score = {start_id: 0.0}
+        self.closed = set()
+        self.done = False
+        self.path: List[int] = []
+    
+    @property
+    def expansions(self) -> int:
+        return len(self.closed)
+    
+    def step(self, budget: Optional[int] = None) -> int:
+        """Expand up to budget nodes (all when None); returns nodes expanded"""
+        centers, offsets, adjacency, walkable, costs = self.lists
+        goal_id, goal_center = self.goal_id, self.goal_center
+        open_set, came_from, g_score, closed = self.open_set, self.came_from, self.g_score, self.closed
+        expanded = 0
         
         while open_set:
+            if budget is not None and expanded >= budget:
+                return expanded
             _, current = heapq.heappop(open_set)
+            if current == goal_id:
+                path = [current]
+                while current in came_from:
+                    current = came_from[current]
+                    path.append(current)
+                self.path = path[::-1]
+                break
+            if current in closed:
+                continue
+            closed.add(current)
+            expanded += 1
             
-            if current == goal_node:
-                # Reconstruct path
-                path = [goal]
-                node = goal_node
-                while node in came_from:
-                    path.append(node.center)
-                    node = came_from[node]
-                path.append(start)
-                return list(reversed(path))
-            
-            for neighbor in current.neighbors:
-                if not neighbor.walkable:
+            current_g = g_score[current]
+            current_center = centers[current]
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = adjacency[k]
+                if not walkable[neighbor] or neighbor in closed:
                     continue
                 
-                tentative_g = g_score[current] + current.distance_to(neighbor) * neighbor.cost
-                
-                if neighbor not in g_score or tentative_g < g_score[neighbor]:
+                neighbor_center = centers[neighbor]
+                tentative_g = current_g + math.dist(current_center, neighbor_center) * costs[neighbor]
+                if tentative_g < g_score.get(neighbor, math.inf):
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g
-                    f_score[neighbor] = tentative_g + neighbor.distance_to(goal_node)
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                    heapq.heappush(open_set, (tentative_g + math.dist(neighbor_center, goal_center), neighbor))
         
-        return []  # No path found
+        self.done = True  # Found, or open set exhausted (no path)
+        return expanded
+
+
+class JumpPointSearch:
+    """Jump Point Search over a uniform-cost 6-connected grid
     
-    def create_debug_visual(self, render: NodePath) -> NodePath:
-        """Create visual representation of navmesh"""
-        if self.debug_visual:
-            self.debug_visual.remove_node()
+    Same interface as PathSearch. Moves follow a canonical axis order
+    (x, then y, then z): a straight jump may turn onto a later axis at any
+    cell but onto an earlier axis only where a wall forces it, so open
+    areas are crossed without pushing every cell onto the heap. Only the
+    jump points are expanded; the returned path still lists every cell.
+    
+    Jumps are looked up in build_tables() output, so each one costs O(1)
+    whatever its length; only the goal, which the tables do not know
+    about, is checked per query.
+    """
+    
+    def __init__(self, walkable: List[int], dims: Tuple[int, int, int], start_id: int, goal_id: int,
+                 step_cost: float, tables: Dict[int, Dict[int, List[int]]]):
+        self.walkable = walkable
+        self.dims = dims
+        self.strides = (dims[1] * dims[2], dims[2], 1)
+        self.step_cost = step_cost
+        self.tables = tables
+        self.start_id = start_id
+        self.goal_id = goal_id
+        self.goal_coord = self._coord(goal_id)
+        h = self._heuristic(self._coord(start_id))
+        self.open_set = [(h, h, start_id)]
+        self.came_from: Dict[int, int] = {}
+        self.arrival: Dict[int, Tuple[int, int]] = {}
+        self.g_score = {start_id: 0.0}
+        self.closed = set()
+        self.done = False
+        self.path: List[int] = []
+    
+    @property
+    def expansions(self) -> int:
+        return len(self.closed)
+    
+    @staticmethod
+    def build_tables(walkable: np.ndarray, dims: Tuple[int, int, int]) -> Dict[int, Dict[int, List[int]]]:
+        """Per-cell jump results along every axis
         
-        lines = LineSegs()
-        lines.set_thickness(2.0)
+        Returns {axis: {sign: table}}. table[node] is the step count to the
+        next jump point in that direction, or minus the step count to the
+        first blocked cell or grid edge when there is none. A cell is a
+        jump point along an axis if a wall ending beside it forces a turn
+        onto an earlier axis, or if a jump along a later axis from it finds
+        one, so tables are built from the innermost axis out.
+        """
+        grid = np.asarray(walkable, dtype=bool).reshape(dims)
         
-        # Draw nodes
-        for node in self.nodes:
-            if node.walkable:
-                lines.set_color(0, 1, 0, 0.5)
-            else:
-                lines.set_color(1, 0, 0, 0.5)
+        def shifted(array, along, by, fill):
+            # out[i] = array[i + by] along `along`, fill outside the grid
+            out = np.full_like(array, fill)
+            n = array.shape[along]
+            if abs(by) < n:
+                dst = [slice(None)] * 3
+                src = [slice(None)] * 3
+                dst[along] = slice(max(0, -by), n - max(0, by))
+                src[along] = slice(max(0, by), n - max(0, -by))
+                out[tuple(dst)] = array[tuple(src)]
+            return out
+        
+        tables = {}
+        turns = np.zeros_like(grid)  # Cells with a jump point along a later axis
+        for axis in (2, 1, 0):
+            length = dims[axis]
+            positions = np.arange(length).reshape([-1 if a == axis else 1 for a in range(3)])
+            found_here = np.zeros_like(grid)
+            tables[axis] = {}
+            for sign in (1, -1):
+                behind = shifted(grid, axis, -sign, True)
+                forced = np.zeros_like(grid)
+                for earlier in range(axis):
+                    for side in (1, -1):
+                        beside = shifted(grid, earlier, side, False)
+                        forced |= beside & ~shifted(behind, earlier, side, True)
+                event = ~grid | forced | turns
+                
+                # Nearest event strictly ahead of each cell: a running min (max
+                # walking backwards) of event positions, shifted by one cell
+                if sign > 0:
+                    marks = np.where(event, positions, length)
+                    nearest = np.flip(np.minimum.accumulate(np.flip(marks, axis), axis=axis), axis)
+                else:
+                    marks = np.where(event, positions, -1)
+                    nearest = np.maximum.accumulate(marks, axis=axis)
+                ahead = shifted(nearest, axis, sign, length if sign > 0 else -1)
+                
+                found = (ahead >= 0) & (ahead < length)
+                steps = np.abs(ahead - positions)
+                edge = length - positions if sign > 0 else positions + 1
+                hit = found & np.take_along_axis(grid, np.clip(ahead, 0, length - 1), axis)
+                found_here |= hit
+                table = np.where(hit, steps, np.where(found, -steps, -edge))
+                tables[axis][sign] = table.ravel().tolist()
+            turns = turns | found_here
+        return tables
+    
+    def _coord(self, node_id: int) -> List[int]:
+        dims = self.dims
+        return [node_id // self.strides[0], (node_id // dims[2]) % dims[1], node_id % dims[2]]
+    
+    def _heuristic(self, coord: List[int]) -> float:
+        goal = self.goal_coord
+        return (abs(coord[0] - goal[0]) + abs(coord[1] - goal[1]) + abs(coord[2] - goal[2])) * self.step_cost
+    
+    def _directions(self, node: int, coord: List[int], arrival: Optional[Tuple[int, int]]):
+        """Pruned (axis, sign) moves out of a jump point"""
+        if arrival is None:
+            return [(axis, sign) for axis in range(3) for sign in (1, -1)]
+        axis, sign = arrival
+        moves = [(axis, sign)] + [(later, s) for later in range(axis + 1, 3) for s in (1, -1)]
+        walkable, dims, strides = self.walkable, self.dims, self.strides
+        behind = node - strides[axis] * sign
+        for earlier in range(axis):
+            stride = strides[earlier]
+            if coord[earlier] > 0 and walkable[node - stride] and not walkable[behind - stride]:
+                moves.append((earlier, -1))
+            if coord[earlier] < dims[earlier] - 1 and walkable[node + stride] and not walkable[behind + stride]:
+                moves.append((earlier, 1))
+        return moves
+    
+    def _jump(self, node: int, coord: List[int], axis: int, sign: int) -> Tuple[int, int]:
+        """Jump from node along axis; returns (jump point, steps) or (-1, 0)"""
+        jump = self.tables[axis][sign][node]
+        
+        # Cells in line with the goal on every earlier axis can reach it by
+        # later-axis moves alone, so the jump stops in the goal's column
+        goal = self.goal_coord
+        if goal[:axis] == coord[:axis]:
+            distance = (goal[axis] - coord[axis]) * sign
+            if 0 < distance and (distance < abs(jump) or distance == jump):
+                return node + self.strides[axis] * sign * distance, distance
+        return (node + self.strides[axis] * sign * jump, jump) if jump > 0 else (-1, 0)
+    
+    def step(self, budget: Optional[int] = None) -> int:
+        """Expand up to budget jump points (all when None); returns nodes expanded
+        
+        Open-set ties on f go to the entry nearest the goal: with the
+        Manhattan heuristic whole rectangles of cells tie, and breaking
+        toward the goal follows one of them instead of flooding it.
+        """
+        goal_id, strides, step_cost = self.goal_id, self.strides, self.step_cost
+        open_set, came_from, g_score, closed, arrival = (self.open_set, self.came_from, self.g_score,
+                                                         self.closed, self.arrival)
+        jump_point, directions, coord_of = self._jump, self._directions, self._coord
+        goal = self.goal_coord
+        expanded = 0
+        
+        while open_set:
+            if budget is not None and expanded >= budget:
+                return expanded
+            _, _, current = heapq.heappop(open_set)
+            if current == goal_id:
+                path = [current]
+                while current in came_from:
+                    axis, sign = arrival[current]
+                    parent = came_from[current]
+                    path.extend(range(current - strides[axis] * sign, parent - strides[axis] * sign,
+                                      -strides[axis] * sign))
+                    current = parent
+                self.path = path[::-1]
+                break
+            if current in closed:
+                continue
+            closed.add(current)
+            expanded += 1
             
-            # Draw connections
-            for neighbor in node.neighbors:
-                if neighbor.walkable and node.walkable:
-                    lines.move_to(node.center)
-                    lines.draw_to(neighbor.center)
+            coord = coord_of(current)
+            current_g = g_score[current]
+            remaining = abs(coord[0] - goal[0]) + abs(coord[1] - goal[1]) + abs(coord[2] - goal[2])
+            for axis, sign in directions(current, coord, arrival.get(current)):
+                node, steps = jump_point(current, coord, axis, sign)
+                if node < 0 or node in closed:
+                    continue
+                tentative_g = current_g + steps * step_cost
+                if tentative_g < g_score.get(node, math.inf):
+                    came_from[node] = current
+                    arrival[node] = (axis, sign)
+                    g_score[node] = tentative_g
+                    offset = coord[axis] - goal[axis]
+                    h = (remaining - abs(offset) + abs(offset + steps * sign)) * step_cost
+                    heapq.heappush(open_set, (tentative_g + h, h, node))
         
-        self.debug_visual = render.attach_new_node(lines.create())
-        return self.debug_visual
+        self.done = True
+        return expanded
 
 
-# ==================== AI Agent ====================
+class PathCache:
+    """LRU cache of node-id paths keyed by (start node, goal node)
+    
+    Every path is indexed under each node it crosses, so blocking nodes or
+    raising their cost drops only the paths through them. Unblocking keeps
+    cached paths (they stay walkable, if possibly no longer shortest) and
+    drops cached failures. The cap is on entries and on the total number
+    of stored path nodes.
+    """
+    
+    def __init__(self, max_entries: int = 512, max_nodes: int = 200_000):
+        self.max_entries = max_entries
+        self.max_nodes = max_nodes
+        self._entries: 'OrderedDict[Tuple[int, int], Tuple[int, ...]]' = OrderedDict()
+        self._by_node: Dict[int, set] = {}
+        self._failed: set = set()
+        self.node_total = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, start_id: int, goal_id: int) -> Optional[Tuple[int, ...]]:
+        key = (start_id, goal_id)
+        path = self._entries.get(key)
+        if path is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return path
+    
+    def put(self, start_id: int, goal_id: int, path: List[int]):
+        key = (start_id, goal_id)
+        if key in self._entries:
+            self._remove(key)
+        path = tuple(path)
+        self._entries[key] = path
+        self.node_total += len(path)
+        for node_id in path:
+            keys = self._by_node.get(node_id)
+            if keys is None:
+                self._by_node[node_id] = {key}
+            else:
+                keys.add(key)
+        if not path:
+            self._failed.add(key)
+        
+        while len(self._entries) > self.max_entries or self.node_total > self.max_nodes:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+    
+    def _remove(self, key: Tuple[int, int]):
+        path = self._entries.pop(key)
+        self.node_total -= len(path)
+        for node_id in path:
+            keys = self._by_node.get(node_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_node[node_id]
+        self._failed.discard(key)
+    
+    def invalidate_nodes(self, node_ids) -> int:
+        """Drop paths crossing any of node_ids; returns how many"""
+        keys = set()
+        for node_id in np.asarray(node_ids).ravel().tolist():
+            keys.update(self._by_node.get(node_id, ()))
+        for key in keys:
+            self._remove(key)
+        self.stats["invalidations"] += len(keys)
+        return len(keys)
+    
+    def invalidate_failed(self) -> int:
+        """Drop cached 'no path' results (after nodes become walkable)"""
+        keys = list(self._failed)
+        for key in keys:
+            self._remove(key)
+        self.stats["invalidations"] += len(keys)
+        return len(keys)
+    
+    def clear(self):
+        self._entries.clear()
+        self._by_node.clear()
+        self._failed.clear()
+        self.node_total = 0
+    
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats["entries"] = len(self._entries)
+        stats["nodes"] = self.node_total
+        return stats
 
-class AIAgent:
-    """AI-controlled agent with behavior tree and pathfinding"""
+
+class NavMeshDirtyRegion:
+    """Area whose walkability a dynamic obstacle edit changed
     
-    def __init__(self, name: str, node_path: NodePath, navmesh: NavigationMesh):
-        self.name = name
-        self.node_path = node_path
-        self.navmesh = navmesh
-        self.behavior_tree: Optional[BehaviorTree] = None
+    bounds_min/bounds_max enclose the obstacle before and after the edit;
+    blocked and cleared are the node ids that became non-walkable and
+    walkable. previous_version is the navmesh version before the edit.
+    """
+    
+    def __init__(self, bounds_min: np.ndarray, bounds_max: np.ndarray, blocked: np.ndarray,
+                 cleared: np.ndarray, previous_version: int):
+        self.bounds_min = bounds_min
+        self.bounds_max = bounds_max
+        self.blocked = blocked
+        self.cleared = cleared
+        self.previous_version = previous_version
+    
+    @property
+    def node_ids(self) -> np.ndarray:
+        return np.concatenate([self.blocked, self.cleared])
+    
+    def __repr__(self) -> str:
+        return (f"NavMeshDirtyRegion({self.bounds_min.tolist()}, {self.bounds_max.tolist()}, "
+                f"blocked={len(self.blocked)}, cleared={len(self.cleared)})")
+
+
+class NavigationMesh:
+    """Navigation mesh for pathfinding
+    
+    Nodes are stored as arrays indexed by integer node id: centers (N, 3)
+    float32, walkable flags (N,) uint8, cost multipliers and radii (N,)
+    float32. Adjacency is CSR: the neighbors of node i are
+    ``adjacency[adjacency_offsets[i]:adjacency_offsets[i + 1]]``.
+    Edges added with connect_nodes are folded into the CSR arrays lazily.
+    
+    Dynamic obstacles (add_obstacle/move_obstacle/remove_obstacle) are
+    boxes that block the cells they overlap. Each cell counts the
+    obstacles covering it and is walkable again once the last one leaves;
+    only the cells inside the obstacle's box are touched on grid meshes.
+    """
+    
+    # Neighbor offsets for grid meshes (6-connectivity)
+    GRID_OFFSETS = ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+    
+    SEARCH_MODES = ("astar", "jps")
+    
+    def __init__(self, grid_size: Tuple[int, int, int] = (20, 20, 10), cell_size: float = 2.0):
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self.debug_visual: Optional[NodePath] = None
+        # Set to None to disable path caching
+        self.path_cache: Optional[PathCache] = PathCache()
+        # "jps" uses Jump Point Search on uniform-cost grids, A* otherwise
+        # (see pathfinding_benchmark for when it pays off)
+        self.search_mode = "astar"
         
-        # State
-        self.position = Point3(0, 0, 0)
-        self.velocity = Vec3(0, 0, 0)
-        self.target_position: Optional[Point3] = None
-        self.path: List[Point3] = []
-        self.current_path_index = 0
+        # Set by generate_grid: node id = (x * dims[1] + y) * dims[2] + z
+        self.grid_origin: Optional[np.ndarray] = None
+        self.grid_dims: Tuple[int, int, int] = (0, 0, 0)
         
-        # Properties
-        self.max_speed = 5.0
-        self.acceleration = 10.0
-        self.stopping_distance = 0.5
+        self.node_count = 0
+        self._allocate(0)
+        self.adjacency_offsets = np.zeros(1, dtype=np.int32)
+        self.adjacency = np.zeros(0, dtype=np.int32)
+        self._pending_edges: List[Tuple[int, int]] = []
         
-        # Perception
-        self.visible_agents: List['AIAgent'] = []
-        self.visible_objects: List[NodePath] = []
-        self.vision_range = 20.0
-        self.vision_angle = 120.0  # degrees
+        # Bumped on any change. Structural changes drop the pathfinding
+        # list mirrors; walkability/cost edits patch them in place
+        self.version = 0
+        self._search_cache = None
+        self._snapshot = None
         
-        # Custom data for behaviors
-        self.blackboard: Dict = {}
+        # Nearest-node index for irregular meshes (grids use index math)
+        self._spatial_index: Optional[NavMeshSpatialIndex] = None
+        
+        # Callbacks told about changed node ids (None: structural change)
+        self._change_listeners: List[Callable[[Optional[np.ndarray]], None]] = []
+        self.hierarchy: Optional['NavMeshHierarchy'] = None
+        self.last_expansions = 0
+        self.last_search_mode = "astar"
+        self._jps_step_cost: Optional[float] = None  # -1 when JPS does not apply
+        self._jps_tables = None  # (version, JumpPointSearch.build_tables() result)
+        
+        # Dynamic obstacles: handle -> (bounds_min, bounds_max, covered node ids)
+        self._obstacles: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._next_obstacle = 1
+        self._dirty_region_listeners: List[Callable[[NavMeshDirtyRegion], None]] = []
     
-    def set_behavior_tree(self, tree: BehaviorTree):
-        """Set the behavior tree for this agent"""
-        self.behavior_tree = tree
+    def _allocate(self, capacity: int):
+        """(Re)allocate node arrays, preserving existing nodes"""
+        n = self.node_count
+        for name, dtype, tail, fill in (('_centers', np.float32, (3,), 0.0), ('_walkable', np.uint8, (), 1),
+                                        ('_costs', np.float32, (), 1.0), ('_radii', np.float32, (), 0.0),
+                                        # Obstacles covering each node; 1 where blocked other than by them
+                                        ('_obstacle_refs', np.int32, (), 0), ('_static_blocked', np.uint8, (), 0)):
+            array = np.full((capacity,) + tail, fill, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None and n:
+                array[:n] = old[:n]
+            setattr(self, name, array)
     
-    def set_target(self, target: Point3):
-        """Set movement target and calculate path"""
-        self.target_position = target
-        self.path = self.navmesh.find_path(self.position, target)
-        self.current_path_index = 0
+    # Views over the live node range
     
-    def move_to_next_waypoint(self, dt: float) -> NodeStatus:
-        """Move along calculated path"""
-        if not self.path or self.current_path_index >= len(self.path):
-            return NodeStatus.SUCCESS
-        
-        waypoint = self.path[self.current_path_index]
-        direction = waypoint - self.position
-        distance = direction.length()
+    @property
+    def nodes(self) -> _NavMeshNodeList:
+        return _NavMeshNodeList(self)
+    
+    @property
+    def centers(self) -> np.ndarray:
+        return self._centers[:self.node_count]
+    
+    @property
+    def walkable(self) -> np.ndarray:
+        return self._walkable[:self.node_count]
+    
+    @property
+    def costs(self) -> np.ndarray:
+        return self._costs[:self.node_count]
+    
+    @property
+    def radii(self) -> np.ndarray:
+        return self._radii[:self.node_count]
+    
+    def clear(self):
+        """Remove all nodes and edges"""
+        self.node_count = 0
+        self._allocate(0)
+        self.adjacency_offsets = np.zeros(1, dtype=np.int32)
+        self.adjacency = np.zeros(0, dtype=np.int32)
+        self._pending_edges.clear()
+        self.grid_origin = None
+        self.grid_dims = (0, 0, 0)
+        self._obstacles.clear()
+        self._mark_changed()
+    
+    def _mark_changed(self):
+        self.version += 1
+        self._search_cache = None
+        self._spatial_index = None
+        self._jps_step_cost = None
+        if self.path_cache is not None:
+            self.path_cache.clear()
+        self._notify(None)
+    
+    def add_change_listener(self, callback: Callable[[Optional[np.ndarray]], None]):
+        """Register callback(node_ids) for walkability/cost edits
         
-        if distance < self.stopping_distance:
-            self.current_path_index += 1
-            if self.current_path_index >= len(self.path):
-                self.velocity = Vec3(0, 0, 0)
-                return NodeStatus.SUCCESS
-            return NodeStatus.RUNNING
+        node_ids is an array of the changed node ids, or None after a
+        structural change (nodes or edges added, grid regenerated).
+        """
+        self._change_listeners.append(callback)
+    
+    def remove_change_listener(self, callback: Callable[[Optional[np.ndarray]], None]):
+        if callback in self._change_listeners:
+            self._change_listeners.remove(callback)
+    
+    def _notify(self, node_ids: Optional[np.ndarray]):
+        for callback in getattr(self, '_change_listeners', ()):
+            callback(node_ids)
+    
+    def add_dirty_region_listener(self, callback: Callable[[NavMeshDirtyRegion], None]):
+        """Register callback(region) for dynamic obstacle edits
         
-        # Steer toward waypoint
-        direction.normalize()
-        desired_velocity = direction * self.max_speed
-        steering = desired_velocity - self.velocity
+        Called once per edit that changed any cell, after the change
+        listeners have seen the individual walkability changes.
+        """
+        self._dirty_region_listeners.append(callback)
+    
+    def remove_dirty_region_listener(self, callback: Callable[[NavMeshDirtyRegion], None]):
+        if callback in self._dirty_region_listeners:
+            self._dirty_region_listeners.remove(callback)
+    
+    @property
+    def is_regular_grid(self) -> bool:
+        """True when every node is a generate_grid cell"""
+        dims = self.grid_dims
+        return self.grid_origin is not None and dims[0] * dims[1] * dims[2] == self.node_count
+    
+    def generate_grid(self, bounds_min: Point3, bounds_max: Point3):
+        """Generate a grid-based navigation mesh"""
+        self.clear()
         
-        self.velocity += steering * self.acceleration * dt
-        if self.velocity.length() > self.max_speed:
-            self.velocity.normalize()
-            self.velocity *= self.max_speed
+        dims = (
+            max(0, int((bounds_max.x - bounds_min.x) / self.cell_size)),
+            max(0, int((bounds_max.y - bounds_min.y) / self.cell_size)),
+            max(0, int((bounds_max.z - bounds_min.z) / self.cell_size)),
+        )
+        n = dims[0] * dims[1] * dims[2]
+        origin = np.array([bounds_min.x, bounds_min.y, bounds_min.z], dtype=np.float64)
         
-        self.position += self.velocity * dt
-        self.node_path.set_pos(self.position)
+        # Nodes in x-major order, same as the original nested loops
+        cells = np.indices(dims).reshape(3, -1).T
+        self._allocate(n)
+        self.node_count = n
+        self._centers[:] = origin + cells * self.cell_size
+        self._radii[:] = self.cell_size / 2
+        self.grid_origin = origin
+        self.grid_dims = dims
         
-        return NodeStatus.RUNNING
+        # Connect neighbors (6-connectivity), built per offset then CSR-sorted
+        ids = np.arange(n, dtype=np.int32).reshape(dims)
+        sources, targets = [], []
+        for offset in self.GRID_OFFSETS:
+            src = ids[tuple(slice(max(0, -d), s - max(0, d)) for d, s in zip(offset, dims))]
+            dst = ids[tuple(slice(max(0, d), s - max(0, -d)) for d, s in zip(offset, dims))]
+            sources.append(src.ravel())
+            targets.append(dst.ravel())
+        self._set_edges(np.concatenate(sources), np.concatenate(targets))
     
-    def update_perception(self, all_agents: List['AIAgent'], collision_system=None):
-        """Update what the agent can see"""
-        self.visible_agents.clear()
+    def add_node(self, center: Point3, radius: float, walkable: bool = True, cost: float = 1.0) -> int:
+        """Add a free-standing node (irregular meshes); returns its id"""
+        if self.node_count >= len(self._centers):
+            self._allocate(max(16, len(self._centers) * 2))
+        i = self.node_count
+        self._centers[i] = (center.x, center.y, center.z)
+        self._radii[i] = radius
+        self._walkable[i] = 1 if walkable else 0
+        self._static_blocked[i] = 0 if walkable else 1
+        self._costs[i] = cost
+        self.node_count += 1
+        self._mark_changed()
+        return i
+    
+    def connect_nodes(self, a: int, b: int):
+        """Connect two nodes both ways (duplicates are dropped)"""
+        self._pending_edges.append((a, b))
+        self._mark_changed()
+    
+    def _set_edges(self, sources: np.ndarray, targets: np.ndarray):
+        """Build CSR adjacency from directed edges"""
+        n = self.node_count
+        order = np.argsort(sources, kind='stable')
+        self.adjacency = targets[order].astype(np.int32)
+        counts = np.bincount(sources, minlength=n)
+        self.adjacency_offsets = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(counts, out=self.adjacency_offsets[1:])
+        self._mark_changed()
+    
+    def _flush_edges(self):
+        """Fold connect_nodes() edges into the CSR arrays"""
+        if not self._pending_edges:
+            if len(self.adjacency_offsets) != self.node_count + 1:
+                self._set_edges(np.zeros(0, np.int64), np.zeros(0, np.int64))
+            return
         
-        forward = self.node_path.get_quat().get_forward()
+        n = self.node_count
+        pending = np.array(self._pending_edges, dtype=np.int64)
+        self._pending_edges = []
+        old_offsets = np.zeros(n + 1, dtype=np.int64)
+        old_offsets[:len(self.adjacency_offsets)] = self.adjacency_offsets
+        old_offsets[len(self.adjacency_offsets):] = self.adjacency_offsets[-1]
+        old_sources = np.repeat(np.arange(n), np.diff(old_offsets))
         
-        for agent in all_agents:
-            if agent == self:
-                continue
-            
-            to_agent = agent.position - self.position
-            distance = to_agent.length()
-            
-            if distance > self.vision_range:
-                continue
-            
-            to_agent.normalize()
-            angle = np.degrees(np.arccos(np.clip(forward.dot(to_agent), -1, 1)))
-            
-            if angle <= self.vision_angle / 2:
-                self.visible_agents.append(agent)
+        sources = np.concatenate([old_sources, pending[:, 0], pending[:, 1]])
+        targets = np.concatenate([self.adjacency, pending[:, 1], pending[:, 0]])
+        keep = sources != targets
+        keys = np.unique(sources[keep] * n + targets[keep])
+        self._set_edges(keys // n, keys % n)
     
-    def update(self, dt: float):
-        """Update agent"""
-        self.position = self.node_path.get_pos()
+    def neighbor_ids(self, node_id: int) -> np.ndarray:
+        """Ids of the nodes adjacent to node_id"""
+        self._flush_edges()
+        return self.adjacency[self.adjacency_offsets[node_id]:self.adjacency_offsets[node_id + 1]]
+    
+    def set_walkable(self, node_ids, walkable: bool):
+        """Set the walkable flag of several nodes
         
-        if self.behavior_tree:
-            self.behavior_tree.tick(self, dt)
-
-
-# ==================== AI System Manager ====================
-
-class AISystem:
-    """Manages all AI agents and navigation"""
+        Use this (or mark_obstacle) rather than writing the array directly
+        so the nearest-node index and search mirrors stay in sync. Cells
+        blocked here stay blocked when dynamic obstacles over them leave.
+        """
+        node_ids = np.asarray(node_ids, dtype=np.int64).ravel()
+        self._static_blocked[node_ids] = 0 if walkable else 1
+        self._apply_walkable(node_ids, walkable)
     
-    def __init__(self, base):
-        self.base = base
-        self.agents: List[AIAgent] = []
-        self.navmesh: Optional[NavigationMesh] = None
+    def _apply_walkable(self, node_ids: np.ndarray, walkable: bool):
+        """Write walkable flags and update indexes, caches and listeners"""
+        changed = node_ids[self.walkable[node_ids] != (1 if walkable else 0)]
+        if len(changed) == 0:
+            return
+        self.walkable[changed] = 1 if walkable else 0
+        self.version += 1
         
-        # ML integration
-        self.ml_models: Dict[str, any] = {}
+        if self._spatial_index is not None:
+            self._spatial_index.update(changed, walkable)
+        if self._search_cache is not None:
+            flags = self._search_cache[3]
+            for node_id in changed.tolist():
+                flags[node_id] = 1 if walkable else 0
+        if self.path_cache is not None:
+            if walkable:
+                self.path_cache.invalidate_failed()
+            else:
+                self.path_cache.invalidate_nodes(changed)
+        self._notify(changed)
     
-    def create_navmesh(self, grid_size: Tuple[int, int, int] = (20, 20, 10), cell_size: float = 2.0):
-        """Create navigation mesh"""
-        self.navmesh = NavigationMesh(grid_size, cell_size)
-        return self.navmesh
+    def set_cost(self, node_ids, cost: float):
+        """Set the movement cost multiplier of several nodes"""
+        node_ids = np.asarray(node_ids, dtype=np.int64).ravel()
+        self.costs[node_ids] = cost
+        self.version += 1
+        self._jps_step_cost = None
+        if self._search_cache is not None:
+            costs = self._search_cache[4]
+            for node_id in node_ids.tolist():
+                costs[node_id] = float(self.costs[node_id])
+        if self.path_cache is not None:
+            self.path_cache.invalidate_nodes(node_ids)
+        self._notify(node_ids)
     
-    def create_agent(self, name: str, node_path: NodePath) -> AIAgent:
-        """Create new AI agent"""
-        if not self.navmesh:
+    def mark_obstacle(self, position: Point3, radius: float):
+        """Mark area as non-walkable"""
+        if self.node_count == 0:
+            return
+        offset = self.centers - np.array([position.x, position.y, position.z], dtype=np.float32)
+        distance = np.sqrt(np.einsum('ij,ij->i', offset, offset))
+        blocked = np.flatnonzero(distance <= radius + self.radii)
+        if len(blocked):
+            self.set_walkable(blocked, False)
+    
+    # Dynamic obstacles
+    
+    @property
+    def obstacle_count(self) -> int:
+        return len(self._obstacles)
+    
+    @staticmethod
+    def _obstacle_bounds(position: Point3, half_extents) -> Tuple[np.ndarray, np.ndarray]:
+        center = np.array([position.x, position.y, position.z], dtype=np.float64)
+        half = np.abs(np.broadcast_to(np.asarray(half_extents, dtype=np.float64), (3,)))
+        return center - half, center + half
+    
+    def nodes_in_box(self, bounds_min: np.ndarray, bounds_max: np.ndarray) -> np.ndarray:
+        """Ids of the nodes whose extent overlaps the box (touching excluded)
+        
+        Grid meshes compute the covered index range directly; irregular
+        meshes test every node.
+        """
+        bounds_min = np.asarray(bounds_min, dtype=np.float64)
+        bounds_max = np.asarray(bounds_max, dtype=np.float64)
+        if self.is_regular_grid:
+            dims = np.array(self.grid_dims)
+            half = self.cell_size / 2
+            low = np.floor((bounds_min - half - self.grid_origin) / self.cell_size).astype(np.int64) + 1
+            high = np.ceil((bounds_max + half - self.grid_origin) / self.cell_size).astype(np.int64)
+            low, high = np.maximum(low, 0), np.minimum(high, dims)
+            if np.any(high <= low):
+                return np.zeros(0, dtype=np.int64)
+            x, y, z = np.ix_(*(np.arange(a, b) for a, b in zip(low.tolist(), high.tolist())))
+            return ((x * dims[1] + y) * dims[2] + z).ravel()
+        
+        centers = self.centers
+        radii = self.radii[:, None]
+        overlap = np.all((centers - radii < bounds_max) & (centers + radii > bounds_min), axis=1)
+        return np.flatnonzero(overlap)
+    
+    def add_obstacle(self, position: Point3, half_extents) -> int:
+        """Block the cells overlapping a box; returns a handle
+        
+        half_extents is a float (cube) or an (x, y, z) triple.
+        """
+        handle = self._next_obstacle
+        self._next_obstacle += 1
+        bounds_min, bounds_max = self._obstacle_bounds(position, half_extents)
+        covered = self.nodes_in_box(bounds_min, bounds_max)
+        self._obstacles[handle] = (bounds_min, bounds_max, covered)
+        self._update_obstacle_cells(np.zeros(0, dtype=np.int64), covered, bounds_min, bounds_max)
+        return handle
+    
+    def move_obstacle(self, handle: int, position: Point3, half_extents=None):
+        """Move (and optionally resize) an obstacle
+        
+        Only cells covered before or after the move are updated.
+        """
+        old_min, old_max, old_covered = self._obstacles[handle]
+        if half_extents is None:
+            half_extents = (old_max - old_min) / 2
+        bounds_min, bounds_max = self._obstacle_bounds(position, half_extents)
+        covered = self.nodes_in_box(bounds_min, bounds_max)
+        self._obstacles[handle] = (bounds_min, bounds_max, covered)
+        self._update_obstacle_cells(old_covered, covered,
+                                    np.minimum(old_min, bounds_min), np.maximum(old_max, bounds_max))
+    
+    def remove_obstacle(self, handle: int):
+        """Drop an obstacle; cells nothing else covers become walkable"""
+        bounds_min, bounds_max, covered = self._obstacles.pop(handle)
+        self._update_obstacle_cells(covered, np.zeros(0, dtype=np.int64), bounds_min, bounds_max)
+    
+    def _update_obstacle_cells(self, released: np.ndarray, covered: np.ndarray,
+                               bounds_min: np.ndarray, bounds_max: np.ndarray):
+        """Move one reference per cell from released to covered"""
+        touched = np.union1d(released, covered)
+        if len(touched) == 0:
+            return
+        refs = self._obstacle_refs
+        before = refs[touched]
+        refs[released] -= 1
+        refs[covered] += 1
+        after = refs[touched]
+        
+        # Cells blocked by set_walkable/mark_obstacle are never restored
+        newly = touched[(before == 0) & (after > 0)]
+        blocked = newly[self.walkable[newly] == 1]
+        freed = touched[(before > 0) & (after == 0)]
+        cleared = freed[(self.walkable[freed] == 0) & (self._static_blocked[freed] == 0)]
+        
+        previous_version = self.version
+        self._apply_walkable(blocked, False)
+        self._apply_walkable(cleared, True)
+        if len(blocked) or len(cleared):
+            region = NavMeshDirtyRegion(bounds_min, bounds_max, blocked, cleared, previous_version)
+            for callback in self._dirty_region_listeners:
+                callback(region)
+    
+    def nearest_node_id(self, position: Point3) -> int:
+        """Id of the closest walkable node to position, or -1
+        
+        Grid meshes compute the containing cell directly and, if it is
+        blocked, search growing boxes around it; irregular meshes use a
+        spatial hash of walkable nodes.
+        """
+        if self.node_count == 0:
+            return -1
+        point = np.array([position.x, position.y, position.z], dtype=np.float64)
+        
+        if self.is_regular_grid:
+            return self._nearest_grid_node(point)
+        
+        if self._spatial_index is None:
+            self._flush_edges()
+            self._spatial_index = NavMeshSpatialIndex(self.centers.astype(np.float64), self.walkable,
+                                                      self._index_bucket_size())
+        return self._spatial_index.nearest(point)
+    
+    def _index_bucket_size(self) -> float:
+        """Bucket edge giving roughly one node per bucket"""
+        extent = np.ptp(self.centers, axis=0).astype(np.float64)
+        extent = extent[extent > 0]
+        if len(extent) == 0:
+            return self.cell_size
+        return float((np.prod(extent) / self.node_count) ** (1.0 / len(extent)))
+    
+    def _nearest_grid_node(self, point: np.ndarray) -> int:
+        dims = np.array(self.grid_dims)
+        cell = np.clip(np.rint((point - self.grid_origin) / self.cell_size), 0, dims - 1).astype(np.int64)
+        node_id = int((cell[0] * dims[1] + cell[1]) * dims[2] + cell[2])
+        if self.walkable[node_id]:
+            return node_id
+        
+        # The point lies within half a cell of `cell` (or outside the grid,
+        # which only moves it further from unvisited cells), so once the
+        # best candidate is within radius + 0.5 cells it cannot be beaten
+        walkable = self.walkable.reshape(self.grid_dims)
+        radius = 1
+        while True:
+            low = np.maximum(cell - radius, 0)
+            high = np.minimum(cell + radius + 1, dims)
+            block = walkable[low[0]:high[0], low[1]:high[1], low[2]:high[2]]
+            hits = np.argwhere(block) + low
+            if len(hits):
+                centers = self.grid_origin + hits * self.cell_size
+                dist_sq = np.einsum('ij,ij->i', centers - point, centers - point)
+                best = int(np.argmin(dist_sq))
+                covers_grid = np.all(low == 0) and np.all(high == dims)
+                if covers_grid or math.sqrt(dist_sq[best]) <= (radius + 0.5) * self.cell_size:
+                    x, y, z = hits[best].tolist()
+                    return int((x * dims[1] + y) * dims[2] + z)
+            elif np.all(low == 0) and np.all(high == dims):
+                return -1
+            radius *= 2
+    
+    def find_nearest_node(self, position: Point3) -> Optional[NavMeshNode]:
+        """Find closest walkable node to position"""
+        node_id = self.nearest_node_id(position)
+        return NavMeshNode(self, node_id) if node_id >= 0 else None
+    
+    def _search_lists(self):
+        """Plain-list mirrors of the arrays (fast scalar access in A*)"""
+        self._flush_edges()
+        if self._search_cache is None:
+            self._search_cache = (
+                self.centers.astype(np.float64).tolist(),
+                self.adjacency_offsets.tolist(),
+                self.adjacency.tolist(),
+                self.walkable.tolist(),
+                self.costs.astype(np.float64).tolist(),
+            )
+        return self._search_cache
+    
+    def snapshot(self):
+        """Immutable copy of the search lists (for searches off the main thread)
+        
+        Shares the structure lists, which are rebuilt rather than edited,
+        and copies the walkable/cost lists that edits patch in place.
+        """
+        if self._snapshot is None or self._snapshot[0] != self.version:
+            centers, offsets, adjacency, walkable, costs = self._search_lists()
+            self._snapshot = (self.version, (centers, offsets, adjacency, list(walkable), list(costs)))
+        return self._snapshot[1]
+    
+    def jps_step_cost(self) -> Optional[float]:
+        """Cost of one grid step when JPS applies, else None
+        
+        JPS needs a plain generate_grid mesh (no extra edges) whose nodes
+        all share one cost multiplier.
+        """
+        if self._jps_step_cost is None:
+            self._flush_edges()
+            dims = self.grid_dims
+            edges = sum(2 * (dims[a] - 1) * dims[(a + 1) % 3] * dims[(a + 2) % 3] for a in range(3))
+            costs = self.costs
+            if self.is_regular_grid and self.node_count and len(self.adjacency) == edges and np.all(costs == costs[0]):
+                self._jps_step_cost = self.cell_size * float(costs[0])
+            else:
+                self._jps_step_cost = -1.0
+        return self._jps_step_cost if self._jps_step_cost >= 0 else None
+    
+    def create_search(self, start_id: int, goal_id: int, mode: Optional[str] = None, lists=None):
+        """Unstarted PathSearch or JumpPointSearch for mode (default search_mode)
+        
+        lists defaults to the live search lists; pass snapshot() for
+        searches run off the main thread.
+        """
+        mode = mode or self.search_mode
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if lists is None:
+            lists = self._search_lists()
+        
+        step_cost = self.jps_step_cost() if mode == "jps" else None
+        self.last_search_mode = "jps" if step_cost is not None else "astar"
+        if step_cost is None:
+            return PathSearch(lists, start_id, goal_id)
+        if self._jps_tables is None or self._jps_tables[0] != self.version:
+            self._jps_tables = (self.version, JumpPointSearch.build_tables(self.walkable, self.grid_dims))
+        return JumpPointSearch(lists[3], self.grid_dims, start_id, goal_id, step_cost, self._jps_tables[1])
+    
+    def find_path_ids(self, start_id: int, goal_id: int, mode: Optional[str] = None) -> List[int]:
+        """Search over node ids; returns the node ids from start to goal or []
+        
+        mode overrides search_mode. "jps" falls back to A* on meshes it
+        does not apply to; last_search_mode records which one ran, or is
+        "cache" when path_cache answered (cached paths are shared between
+        modes: both return shortest paths).
+        """
+        cache = self.path_cache
+        if cache is not None:
+            cached = cache.get(start_id, goal_id)
+            if cached is not None:
+                self.last_expansions = 0
+                self.last_search_mode = "cache"
+                return list(cached)
+        
+        search = self.create_search(start_id, goal_id, mode)
+        search.step()
+        self.last_expansions = search.expansions
+        if cache is not None:
+            cache.put(start_id, goal_id, search.path)
+        return search.path
+    
+    def find_path(self, start: Point3, goal: Point3, mode: Optional[str] = None) -> List[Point3]:
+        """A* (or JPS, see find_path_ids) pathfinding"""
+        start_id = self.nearest_node_id(start)
+        goal_id = self.nearest_node_id(goal)
+        
+        if start_id < 0 or goal_id < 0:
+            return []
+        
+        ids = self.find_path_ids(start_id, goal_id, mode)
+        if not ids:
+            return []
+        
+        # Start position, node centers after the start node, goal position
+        centers = self.centers
+        return [start] + [Point3(*centers[i]) for i in ids[1:]] + [goal]
+    
+    def enable_hierarchy(self, cluster_size: Tuple[int, int, int] = (8, 8, 4)) -> 'NavMeshHierarchy':
+        """Build an HPA* cluster hierarchy (grid meshes only)"""
+        if self.hierarchy is not None:
+            self.remove_change_listener(self.hierarchy._on_navmesh_changed)
+        self.hierarchy = NavMeshHierarchy(self, cluster_size)
+        return self.hierarchy
+    
+    def find_hierarchical_path(self, start: Point3, goal: Point3) -> Optional['HierarchicalPath']:
+        """Plan with the cluster hierarchy; the path is refined on demand"""
+        hierarchy = self.hierarchy or self.enable_hierarchy()
+        start_id = self.nearest_node_id(start)
+        goal_id = self.nearest_node_id(goal)
+        if start_id < 0 or goal_id < 0:
+            return None
+        return hierarchy.plan(start_id, goal_id, start, goal)
+    
+    def create_debug_visual(self, render: NodePath) -> NodePath:
+        """Create visual representation of navmesh"""
+        if self.debug_visual:
+            self.debug_visual.remove_node()
+        
+        lines = LineSegs()
+        lines.set_thickness(2.0)
+        lines.set_color(0, 1, 0, 0.5)
+        
+        # Draw each connection between walkable nodes once
+        self._flush_edges()
+        sources = np.repeat(np.arange(self.node_count), np.diff(self.adjacency_offsets))
+        targets = self.adjacency
+        keep = (sources < targets) & (self.walkable[sources] > 0) & (self.walkable[targets] > 0)
+        for a, b in zip(self.centers[sources[keep]].tolist(), self.centers[targets[keep]].tolist()):
+            lines.move_to(*a)
+            lines.draw_to(*b)
+        
+        self.debug_visual = render.attach_new_node(lines.create())
+        return self.debug_visual
+
+
+class NavMeshHierarchy:
+    """Cluster abstraction of a grid navmesh for hierarchical A* (HPA*)
+    
+    The grid is cut into cluster_size chunks. Every connected patch of
+    cells open on both sides of a cluster face gives one entrance: the
+    cell pair across the face nearest the patch middle. Queries search the
+    small graph of entrances, whose intra-cluster costs are computed the
+    first time a cluster is crossed, and HierarchicalPath refines the cell
+    path one abstract edge at a time.
+    
+    Walkability and cost edits invalidate only the clusters they touch;
+    structural changes (a regenerated grid) rebuild on the next query.
+    """
+    
+    def __init__(self, navmesh: NavigationMesh, cluster_size: Tuple[int, int, int] = (8, 8, 4)):
+        if not navmesh.is_regular_grid:
+            raise ValueError("Hierarchical pathfinding needs a generate_grid navmesh")
+        # Weak, so the mesh owning the hierarchy (and its listener) is not a cycle
+        self._navmesh = weakref.ref(navmesh)
+        self.cluster_size = tuple(max(1, int(s)) for s in cluster_size)
+        
+        # Bumped on every invalidation so paths know the plan may be stale
+        self.version = 0
+        self.last_expansions = 0
+        self.stats = {
+            "rebuilds": 0,
+            "invalidated_clusters": 0,
+            "abstract_expansions": 0,
+            "refined_segments": 0,
+            "replans": 0,
+        }
+        
+        self._build()
+        navmesh.add_change_listener(self._on_navmesh_changed)
+    
+    @property
+    def navmesh(self) -> NavigationMesh:
+        return self._navmesh()
+    
+    def _build(self):
+        mesh = self.navmesh
+        dims = np.array(mesh.grid_dims)
+        size = np.array(self.cluster_size)
+        self.cluster_dims = tuple(int(d) for d in -(-dims // size))
+        cdx, cdy, cdz = self.cluster_dims
+        self.cluster_count = cdx * cdy * cdz
+        self._strides = (cdy * cdz, cdz, 1)
+        
+        cells = np.indices(mesh.grid_dims).reshape(3, -1).T // size
+        self.node_cluster = ((cells[:, 0] * cdy + cells[:, 1]) * cdz + cells[:, 2]).astype(np.int32)
+        self._clusters = self.node_cluster.tolist()
+        self._grid_ids = np.arange(mesh.node_count).reshape(mesh.grid_dims)
+        
+        # Entrances: (cluster, axis) -> cell pairs across its +axis face
+        self._face_pairs: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        self._partners: Dict[int, set] = {}
+        self._entrances: List[set] = [set() for _ in range(self.cluster_count)]
+        # cluster -> {entrance: [(other entrance, cost), ...]}, filled lazily
+        self._intra: Dict[int, Dict[int, List[Tuple[int, float]]]] = {}
+        
+        for cluster in range(self.cluster_count):
+            for axis in range(3):
+                self._update_face(cluster, axis)
+        
+        self._stale = False
+        self.version += 1
+        self.stats["rebuilds"] += 1
+    
+    def _ensure_current(self):
+        if self._stale:
+            if not self.navmesh.is_regular_grid:
+                raise ValueError("Hierarchical pathfinding needs a generate_grid navmesh")
+            self._build()
+    
+    def _cluster_coord(self, cluster: int) -> Tuple[int, int, int]:
+        _, cdy, cdz = self.cluster_dims
+        return cluster // (cdy * cdz), (cluster // cdz) % cdy, cluster % cdz
+    
+    # Entrances
+    
+    def _compute_face(self, cluster: int, axis: int) -> List[Tuple[int, int]]:
+        coord = self._cluster_coord(cluster)
+        if coord[axis] + 1 >= self.cluster_dims[axis]:
+            return []
+        
+        dims = self.navmesh.grid_dims
+        side_a, side_b = [], []
+        for k in range(3):
+            low = coord[k] * self.cluster_size[k]
+            high = min(low + self.cluster_size[k], dims[k])
+            if k == axis:
+                side_a.append(high - 1)
+                side_b.append(high)
+            else:
+                side_a.append(slice(low, high))
+                side_b.append(slice(low, high))
+        ids_a = self._grid_ids[tuple(side_a)]
+        ids_b = self._grid_ids[tuple(side_b)]
+        walkable = self.navmesh.walkable
+        open_cells = (walkable[ids_a] > 0) & (walkable[ids_b] > 0)
+        
+        pairs = []
+        for patch in self._patches(open_cells):
+            cells = np.array(patch)
+            middle = tuple(cells[np.argmin(np.sum((cells - cells.mean(axis=0)) ** 2, axis=1))])
+            pairs.append((int(ids_a[middle]), int(ids_b[middle])))
+        return pairs
+    
+    @staticmethod
+    def _patches(mask: np.ndarray) -> List[List[Tuple[int, int]]]:
+        """4-connected components of a 2D boolean mask"""
+        rows, cols = mask.shape
+        seen = np.zeros_like(mask)
+        patches = []
+        for r, c in np.argwhere(mask).tolist():
+            if seen[r, c]:
+                continue
+            seen[r, c] = True
+            stack, patch = [(r, c)], []
+            while stack:
+                i, j = stack.pop()
+                patch.append((i, j))
+                for ni, nj in ((i + 1, j), (i - 1, j), (i, j + 1), (i, j - 1)):
+                    if 0 <= ni < rows and 0 <= nj < cols and mask[ni, nj] and not seen[ni, nj]:
+                        seen[ni, nj] = True
+                        stack.append((ni, nj))
+            patches.append(patch)
+        return patches
+    
+    def _update_face(self, cluster: int, axis: int) -> bool:
+        """Recompute the entrances on the +axis face of cluster; True if they changed"""
+        key = (cluster, axis)
+        old = self._face_pairs.get(key, [])
+        new = self._compute_face(cluster, axis)
+        if new == old:
+            return False
+        
+        for a, b in old:
+            self._unlink(a, b)
+            self._unlink(b, a)
+        for a, b in new:
+            self._partners.setdefault(a, set()).add(b)
+            self._partners.setdefault(b, set()).add(a)
+            self._entrances[self._clusters[a]].add(a)
+            self._entrances[self._clusters[b]].add(b)
+        if new:
+            self._face_pairs[key] = new
+        else:
+            self._face_pairs.pop(key, None)
+        return True
+    
+    def _unlink(self, a: int, b: int):
+        partners = self._partners.get(a)
+        if partners is None:
+            return
+        partners.discard(b)
+        if not partners:
+            del self._partners[a]
+            self._entrances[self._clusters[a]].discard(a)
+    
+    def entrance_count(self) -> int:
+        return sum(len(e) for e in self._entrances)
+    
+    # Invalidation
+    
+    def _on_navmesh_changed(self, node_ids: Optional[np.ndarray]):
+        self.version += 1
+        if node_ids is None or self._stale:
+            self._stale = True
+            return
+        for cluster in np.unique(self.node_cluster[node_ids]).tolist():
+            self.invalidate_cluster(cluster)
+    
+    def invalidate_cluster(self, cluster: int):
+        """Recompute one cluster's entrances and drop its cached costs
+        
+        Neighbors lose their cached costs only if a shared face changed.
+        """
+        self._intra.pop(cluster, None)
+        self.stats["invalidated_clusters"] += 1
+        coord = self._cluster_coord(cluster)
+        for axis in range(3):
+            stride = self._strides[axis]
+            if self._update_face(cluster, axis):
+                self._intra.pop(cluster + stride, None)
+            if coord[axis] > 0 and self._update_face(cluster - stride, axis):
+                self._intra.pop(cluster - stride, None)
+    
+    # Searches
+    
+    def _cluster_dijkstra(self, source: int, cluster: int, reverse: bool = False) -> Dict[int, float]:
+        """Costs from source (to source when reverse) without leaving cluster"""
+        centers, offsets, adjacency, walkable, costs = self.navmesh._search_lists()
+        clusters = self._clusters
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        done = set()
+        while heap:
+            d, current = heapq.heappop(heap)
+            if current in done:
+                continue
+            done.add(current)
+            current_center = centers[current]
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = adjacency[k]
+                if neighbor in done or not walkable[neighbor] or clusters[neighbor] != cluster:
+                    continue
+                # Entering a node costs its multiplier, so the reverse search
+                # charges the node being left
+                step = math.dist(current_center, centers[neighbor]) * (costs[current] if reverse else costs[neighbor])
+                if d + step < dist.get(neighbor, math.inf):
+                    dist[neighbor] = d + step
+                    heapq.heappush(heap, (d + step, neighbor))
+        return dist
+    
+    def _cluster_astar(self, start_id: int, goal_id: int, cluster: int) -> List[int]:
+        """A* between two nodes of one cluster; node ids or []"""
+        centers, offsets, adjacency, walkable, costs = self.navmesh._search_lists()
+        clusters = self._clusters
+        goal_center = centers[goal_id]
+        open_set = [(math.dist(centers[start_id], goal_center), start_id)]
+        came_from = {}
+        g_score = {start_id: 0.0}
+        closed = set()
+        
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if current == goal_id:
+                path = [current]
+                while current in came_from:
+                    current = came_from[current]
+                    path.append(current)
+                return path[::-1]
+            if current in closed:
+                continue
+            closed.add(current)
+            
+            current_g = g_score[current]
+            current_center = centers[current]
+            for k in range(offsets[current], offsets[current + 1]):
+                neighbor = adjacency[k]
+                if not walkable[neighbor] or neighbor in closed or clusters[neighbor] != cluster:
+                    continue
+                neighbor_center = centers[neighbor]
+                tentative_g = current_g + math.dist(current_center, neighbor_center) * costs[neighbor]
+                if tentative_g < g_score.get(neighbor, math.inf):
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    heapq.heappush(open_set, (tentative_g + math.dist(neighbor_center, goal_center), neighbor))
+        return []
+    
+    def _intra_edges(self, cluster: int) -> Dict[int, List[Tuple[int, float]]]:
+        edges = self._intra.get(cluster)
+        if edges is None:
+            entrances = self._entrances[cluster]
+            edges = {}
+            for entrance in entrances:
+                dist = self._cluster_dijkstra(entrance, cluster)
+                edges[entrance] = [(other, dist[other]) for other in entrances
+                                   if other != entrance and other in dist]
+            self._intra[cluster] = edges
+        return edges
+    
+    def plan(self, start_id: int, goal_id: int, start_point: Optional[Point3] = None,
+             goal_point: Optional[Point3] = None) -> Optional['HierarchicalPath']:
+        """Search the abstract graph; returns an unrefined path or None"""
+        self._ensure_current()
+        centers, _, _, walkable, costs = self.navmesh._search_lists()
+        if not walkable[start_id] or not walkable[goal_id]:
+            return None
+        if start_id == goal_id:
+            return HierarchicalPath(self, [start_id], start_point, goal_point)
+        
+        clusters = self._clusters
+        start_cluster = clusters[start_id]
+        goal_cluster = clusters[goal_id]
+        # Start and goal join the graph through their own clusters only;
+        # a start cell that already reaches the goal locally gets a direct edge
+        start_edges = self._cluster_dijkstra(start_id, start_cluster)
+        goal_edges = self._cluster_dijkstra(goal_id, goal_cluster, reverse=True)
+        
+        goal_center = centers[goal_id]
+        open_set = [(math.dist(centers[start_id], goal_center), start_id)]
+        came_from = {}
+        g_score = {start_id: 0.0}
+        closed = set()
+        found = False
+        
+        while open_set:
+            _, current = heapq.heappop(open_set)
+            if current == goal_id:
+                found = True
+                break
+            if current in closed:
+                continue
+            closed.add(current)
+            
+            cluster = clusters[current]
+            if current == start_id:
+                edges = [(e, start_edges[e]) for e in self._entrances[start_cluster]
+                         if e != current and e in start_edges]
+            else:
+                edges = list(self._intra_edges(cluster).get(current, ()))
+            for partner in self._partners.get(current, ()):
+                edges.append((partner, math.dist(centers[current], centers[partner]) * costs[partner]))
+            if cluster == goal_cluster and current in goal_edges:
+                edges.append((goal_id, goal_edges[current]))
+            
+            current_g = g_score[current]
+            for neighbor, cost in edges:
+                if neighbor in closed:
+                    continue
+                tentative_g = current_g + cost
+                if tentative_g < g_score.get(neighbor, math.inf):
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    heapq.heappush(open_set, (tentative_g + math.dist(centers[neighbor], goal_center), neighbor))
+        
+        self.last_expansions = len(closed)
+        self.stats["abstract_expansions"] += len(closed)
+        if not found:
+            return None
+        
+        waypoints = [goal_id]
+        while waypoints[-1] in came_from:
+            waypoints.append(came_from[waypoints[-1]])
+        return HierarchicalPath(self, waypoints[::-1], start_point, goal_point)
+    
+    def refine(self, a: int, b: int) -> List[int]:
+        """Node ids for one abstract edge (a and b included), or [] if blocked"""
+        self._ensure_current()
+        self.stats["refined_segments"] += 1
+        if b in self._partners.get(a, ()):
+            return [a, b]
+        if self._clusters[a] == self._clusters[b]:
+            return self._cluster_astar(a, b, self._clusters[a])
+        return []
+    
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats["clusters"] = self.cluster_count
+        stats["entrances"] = self.entrance_count()
+        stats["cached_clusters"] = len(self._intra)
+        return stats
+
+
+class HierarchicalPath:
+    """HPA* path: abstract waypoints refined into node ids on demand
+    
+    Each refine_next() call expands one abstract edge with a search
+    confined to a single cluster. If the mesh changed and the edge is no
+    longer passable, the rest of the route is re-planned from there.
+    """
+    
+    def __init__(self, hierarchy: NavMeshHierarchy, waypoints: List[int],
+                 start_point: Optional[Point3] = None, goal_point: Optional[Point3] = None):
+        self.hierarchy = hierarchy
+        self.waypoints = list(waypoints)
+        self.node_ids = self.waypoints[:1]
+        self.start_point = start_point
+        self.goal_point = goal_point
+        self.failed = False
+        self._next_edge = 0
+        self._emitted_start = False
+        self._emitted_goal = False
+    
+    @property
+    def goal_id(self) -> int:
+        return self.waypoints[-1]
+    
+    @property
+    def complete(self) -> bool:
+        """True once every abstract edge is refined (or refinement failed)"""
+        return self.failed or self._next_edge >= len(self.waypoints) - 1
+    
+    def refine_next(self) -> List[int]:
+        """Refine the next abstract edge; returns the node ids it appends"""
+        if self.complete:
+            return []
+        
+        a = self.waypoints[self._next_edge]
+        segment = self.hierarchy.refine(a, self.waypoints[self._next_edge + 1])
+        if not segment:
+            self.hierarchy.stats["replans"] += 1
+            plan = self.hierarchy.plan(a, self.goal_id)
+            if plan is not None:
+                self.waypoints = self.waypoints[:self._next_edge] + plan.waypoints
+                segment = self.hierarchy.refine(a, self.waypoints[self._next_edge + 1]) if not plan.complete else [a]
+            if not segment:
+                self.failed = True
+                return []
+        
+        self._next_edge += 1
+        self.node_ids.extend(segment[1:])
+        return segment[1:]
+    
+    def refine_all(self) -> List[int]:
+        """Refine every remaining edge; returns the full node id path"""
+        while not self.complete:
+            self.refine_next()
+        return [] if self.failed else self.node_ids
+    
+    def next_points(self) -> List[Point3]:
+        """Points of the next refined segment, in find_path() format
+        
+        The first call starts with start_point; goal_point follows the
+        last segment.
+        """
+        points = []
+        if not self._emitted_start:
+            self._emitted_start = True
+            if self.start_point is not None:
+                points.append(self.start_point)
+        
+        centers = self.hierarchy.navmesh.centers
+        points.extend(Point3(*centers[i]) for i in self.refine_next())
+        if self.complete and not self.failed and not self._emitted_goal:
+            self._emitted_goal = True
+            if self.goal_point is not None:
+                points.append(self.goal_point)
+        return points
+    
+    def to_points(self) -> List[Point3]:
+        """Fully refined path, same format as NavigationMesh.find_path()"""
+        ids = self.refine_all()
+        if not ids:
+            return []
+        centers = self.hierarchy.navmesh.centers
+        return [self.start_point] + [Point3(*centers[i]) for i in ids[1:]] + [self.goal_point]
+
+
+class FlowField:
+    """Shared route to one goal node for every agent on a navmesh
+    
+    integration holds each node's travel cost to the goal (inf when
+    unreachable) and next_node the neighbor to step to (-1 at the goal and
+    on unreachable nodes). Agents sample the field instead of running A*.
+    """
+    
+    def __init__(self, navmesh: NavigationMesh, goal_id: int):
+        self.navmesh = navmesh
+        self.goal_id = goal_id
+        self.version = navmesh.version
+        self.integration, self.next_node = self._compute()
+    
+    def _compute(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Dijkstra from the goal over the reversed CSR edges
+        
+        Uses scipy.sparse.csgraph when available and a binary heap over
+        the reversed adjacency otherwise; either way every node is settled
+        once, so the cost no longer grows with route length.
+        """
+        mesh = self.navmesh
+        mesh._flush_edges()
+        n = mesh.node_count
+        offsets = mesh.adjacency_offsets
+        sources = np.repeat(np.arange(n), np.diff(offsets))
+        targets = mesh.adjacency.astype(np.int64)
+        
+        # Stepping u -> v costs |v - u| * cost(v); blocked targets are never entered
+        centers = mesh.centers.astype(np.float64)
+        step = np.linalg.norm(centers[targets] - centers[sources], axis=1) * mesh.costs[targets]
+        step[mesh.walkable[targets] == 0] = np.inf
+        # Reduce only over nodes with edges: their offsets are distinct and in range
+        rows = np.flatnonzero(np.diff(offsets) > 0)
+        starts = offsets[:-1][rows]
+        
+        integration = np.full(n, np.inf)
+        if mesh.walkable[self.goal_id]:
+            # Only walkable nodes relax, and only into walkable targets
+            usable = np.flatnonzero(np.isfinite(step) & (mesh.walkable[sources] > 0))
+            integration = self._sweep(n, targets[usable], sources[usable], step[usable])
+        
+        # Best neighbor per node (ties go to the first listed edge)
+        totals = integration[targets] + step
+        best = np.full(n, np.inf)
+        if len(targets):
+            best[rows] = np.minimum.reduceat(totals, starts)
+        is_best = totals == np.repeat(best, np.diff(offsets))
+        first = np.full(n, -1, dtype=np.int64)
+        chosen = np.flatnonzero(is_best & np.isfinite(totals))
+        first[sources[chosen[::-1]]] = targets[chosen[::-1]]
+        first[~np.isfinite(integration)] = -1
+        first[self.goal_id] = -1
+        return integration, first.astype(np.int32)
+    
+    def _sweep(self, n: int, heads: np.ndarray, tails: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Shortest distances from the goal along edges heads -> tails"""
+        if SCIPY_AVAILABLE:
+            graph = csr_matrix((weights, (heads, tails)), shape=(n, n))
+            return csgraph_dijkstra(graph, indices=self.goal_id)
+        
+        order = np.argsort(heads, kind='stable')
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=n), out=offsets[1:])
+        offsets, tails, weights = offsets.tolist(), tails[order].tolist(), weights[order].tolist()
+        
+        dist = [math.inf] * n
+        dist[self.goal_id] = 0.0
+        heap = [(0.0, self.goal_id)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            for k in range(offsets[node], offsets[node + 1]):
+                nd = d + weights[k]
+                tail = tails[k]
+                if nd < dist[tail]:
+                    dist[tail] = nd
+                    heapq.heappush(heap, (nd, tail))
+        return np.array(dist)
+    
+    @property
+    def is_stale(self) -> bool:
+        """True once the navmesh changed after the field was computed"""
+        return self.version != self.navmesh.version
+    
+    def reachable(self, node_id: int) -> bool:
+        return node_id >= 0 and bool(np.isfinite(self.integration[node_id]))
+    
+    def node_ids_at(self, positions: np.ndarray) -> np.ndarray:
+        """Walkable node id under each (M, 3) position, -1 where none
+        
+        Grid meshes use index math for the whole batch; points on blocked
+        cells fall back to the nearest walkable node.
+        """
+        mesh = self.navmesh
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        if not mesh.is_regular_grid:
+            return np.array([mesh.nearest_node_id(Point3(*p)) for p in positions.tolist()], dtype=np.int64)
+        
+        dims = np.array(mesh.grid_dims)
+        cells = np.clip(np.rint((positions - mesh.grid_origin) / mesh.cell_size), 0, dims - 1).astype(np.int64)
+        ids = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+        for i in np.flatnonzero(mesh.walkable[ids] == 0).tolist():
+            ids[i] = mesh.nearest_node_id(Point3(*positions[i]))
+        return ids
+    
+    def directions(self, positions: np.ndarray) -> np.ndarray:
+        """Unit vectors from each position toward its next node
+        
+        Zero at the goal node and where the goal cannot be reached.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        ids = self.node_ids_at(positions)
+        next_ids = np.where(ids >= 0, self.next_node[np.maximum(ids, 0)], -1)
+        moving = next_ids >= 0
+        
+        result = np.zeros_like(positions)
+        offset = self.navmesh.centers[next_ids[moving]] - positions[moving]
+        length = np.linalg.norm(offset, axis=1, keepdims=True)
+        result[moving] = offset / np.maximum(length, 1e-9)
+        return result
+
+
+class FlowFieldCache:
+    """Flow fields keyed by goal node, shared by all agents (LRU)
+    
+    Fields computed before a navmesh change are rebuilt on their next use,
+    except after a dynamic obstacle blocks only cells no route steps
+    into: those fields just mark the blocked cells unreachable.
+    """
+    
+    def __init__(self, navmesh: NavigationMesh, max_fields: int = 32):
+        self.navmesh = navmesh
+        self.max_fields = max_fields
+        self._fields: 'OrderedDict[int, FlowField]' = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "rebuilds": 0, "patched": 0}
+        navmesh.add_dirty_region_listener(self._on_dirty_region)
+    
+    def _on_dirty_region(self, region: NavMeshDirtyRegion):
+        # Freed cells can shorten any route; blocked ones only matter if a route enters them
+        if len(region.cleared):
+            return
+        for field in self._fields.values():
+            if field.version != region.previous_version or field.goal_id in region.blocked \
+                    or np.isin(field.next_node, region.blocked).any():
+                continue
+            field.integration[region.blocked] = np.inf
+            field.next_node[region.blocked] = -1
+            field.version = self.navmesh.version
+            self.stats["patched"] += 1
+    
+    def get(self, goal: Point3) -> Optional[FlowField]:
+        """Field leading to the walkable node nearest goal"""
+        goal_id = self.navmesh.nearest_node_id(goal)
+        if goal_id < 0:
+            return None
+        return self.get_by_id(goal_id)
+    
+    def get_by_id(self, goal_id: int) -> FlowField:
+        field = self._fields.get(goal_id)
+        if field is not None and not field.is_stale:
+            self._fields.move_to_end(goal_id)
+            self.stats["hits"] += 1
+            return field
+        
+        self.stats["rebuilds" if field is not None else "misses"] += 1
+        field = FlowField(self.navmesh, goal_id)
+        self._fields[goal_id] = field
+        self._fields.move_to_end(goal_id)
+        while len(self._fields) > self.max_fields:
+            self._fields.popitem(last=False)
+        return field
+    
+    def clear(self):
+        self._fields.clear()
+    
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats["fields"] = len(self._fields)
+        return stats
+
+
+class PathRequestService:
+    """Queued path searches (navmesh.search_mode) answered over several frames
+    
+    request() returns a concurrent.futures.Future resolving to node ids
+    ([] when unreachable). Identical (start, goal) requests share one
+    search and lower priorities are served first. update() spends at most
+    expansion_budget node expansions per call, so many agents retargeting
+    at once do not stall a frame.
+    
+    With use_thread=True searches run on a worker thread against an
+    immutable navmesh snapshot; futures are still resolved in update() so
+    callbacks run on the calling (main) thread.
+    
+    A search that finishes after the navmesh changed is checked first: if
+    it found no path or its path crosses a now-blocked node, it is run
+    again from scratch instead of being resolved.
+    """
+    
+    def __init__(self, navmesh: NavigationMesh, expansion_budget: int = 2000, use_thread: bool = False):
+        self.navmesh = navmesh
+        self.expansion_budget = expansion_budget
+        self.use_thread = use_thread
+        self._pending: Dict[Tuple[int, int], Dict] = {}
+        self._queue: List[Tuple[int, int, Tuple[int, int]]] = []
+        self._sequence = 0
+        self._active: Optional[Dict] = None
+        self.stats = {"requests": 0, "deduplicated": 0, "completed": 0, "restarts": 0,
+                      "expansions": 0, "last_expansions": 0}
+        
+        self._thread: Optional[threading.Thread] = None
+        if use_thread:
+            self._work = queue.PriorityQueue()
+            self._results = queue.Queue()
+            self._thread = threading.Thread(target=self._worker, name="PathRequestWorker", daemon=True)
+            self._thread.start()
+    
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+    
+    def request(self, start_id: int, goal_id: int, priority: int = 1) -> Future:
+        """Queue a search; lower priority values are served first"""
+        self.stats["requests"] += 1
+        key = (start_id, goal_id)
+        entry = self._pending.get(key)
+        if entry is not None:
+            self.stats["deduplicated"] += 1
+            if priority < entry["priority"] and not self.use_thread:
+                entry["priority"] = priority
+                self._push(priority, key)
+            return entry["future"]
+        
+        entry = {"future": Future(), "priority": priority, "search": None, "version": self.navmesh.version}
+        self._pending[key] = entry
+        if self.use_thread:
+            self._submit_threaded(key, entry)
+        else:
+            self._push(priority, key)
+        return entry["future"]
+    
+    def _submit_threaded(self, key: Tuple[int, int], entry: Dict):
+        self._sequence += 1
+        entry["version"] = self.navmesh.version
+        search = self.navmesh.create_search(*key, lists=self.navmesh.snapshot())
+        self._work.put((entry["priority"], self._sequence, key, search))
+    
+    def _outdated(self, entry: Dict, path: List[int]) -> bool:
+        """True when the navmesh changed under the search and broke its answer"""
+        if entry["version"] == self.navmesh.version:
+            return False
+        return not path or not self.navmesh.walkable[path].all()
+    
+    def request_path(self, start: Point3, goal: Point3, priority: int = 1) -> Optional[Future]:
+        """request() for positions; None when either has no walkable node"""
+        start_id = self.navmesh.nearest_node_id(start)
+        goal_id = self.navmesh.nearest_node_id(goal)
+        if start_id < 0 or goal_id < 0:
+            return None
+        return self.request(start_id, goal_id, priority)
+    
+    def _push(self, priority: int, key: Tuple[int, int]):
+        self._sequence += 1
+        heapq.heappush(self._queue, (priority, self._sequence, key))
+    
+    def update(self) -> int:
+        """Advance queued searches within the budget; returns nodes expanded"""
+        if self.use_thread:
+            return self._collect_results()
+        
+        budget = self.expansion_budget
+        used = 0
+        while used < budget:
+            if self._active is None:
+                self._active = self._next_request()
+                if self._active is None:
+                    break
+            key, entry = self._active
+            if entry["search"] is None:
+                entry["search"] = self.navmesh.create_search(*key)
+                entry["version"] = self.navmesh.version
+            used += entry["search"].step(budget - used)
+            if entry["search"].done:
+                if self._outdated(entry, entry["search"].path):
+                    # The live lists were edited mid-search; start over
+                    entry["search"] = None
+                    self.stats["restarts"] += 1
+                    continue
+                self._active = None
+                self._finish(key, entry["search"].path)
+        
+        self.stats["expansions"] += used
+        self.stats["last_expansions"] = used
+        return used
+    
+    def _next_request(self):
+        while self._queue:
+            priority, _, key = heapq.heappop(self._queue)
+            entry = self._pending.get(key)
+            # Skip entries superseded by a priority bump or already served
+            if entry is None or entry["priority"] != priority:
+                continue
+            if entry["future"].cancelled():
+                del self._pending[key]
+                continue
+            return key, entry
+        return None
+    
+    def _finish(self, key: Tuple[int, int], path: List[int]):
+        entry = self._pending.pop(key, None)
+        self.stats["completed"] += 1
+        if entry is not None and not entry["future"].cancelled():
+            entry["future"].set_result(path)
+    
+    def _worker(self):
+        while True:
+            _, _, key, search = self._work.get()
+            if key is None:
+                return
+            entry = self._pending.get(key)
+            if entry is None or entry["future"].cancelled():
+                self._results.put((key, [], 0))
+                continue
+            search.step()
+            self._results.put((key, search.path, search.expansions))
+    
+    def _collect_results(self) -> int:
+        used = 0
+        while True:
+            try:
+                key, path, expansions = self._results.get_nowait()
+            except queue.Empty:
+                break
+            used += expansions
+            entry = self._pending.get(key)
+            if entry is not None and not entry["future"].cancelled() and self._outdated(entry, path):
+                # Searched a snapshot older than the navmesh; search the current one
+                self.stats["restarts"] += 1
+                self._submit_threaded(key, entry)
+                continue
+            self._finish(key, path)
+        self.stats["expansions"] += used
+        self.stats["last_expansions"] = used
+        return used
+    
+    def wait(self, timeout: Optional[float] = None):
+        """Finish every queued request (tests, loading screens)"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self._pending:
+            if self.use_thread:
+                self._collect_results()
+                time.sleep(0.001)
+            else:
+                self.update()
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+    
+    def shutdown(self):
+        """Stop the worker thread, if any"""
+        if self._thread is not None:
+            self._work.put((-math.inf, 0, None, None))
+            self._thread.join(timeout=1.0)
+            self._thread = None
+    
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats["pending"] = len(self._pending)
+        return stats
+
+
+# ==================== AI Agent ====================
+
+class AIAgent:
+    """AI-controlled agent with behavior tree and pathfinding"""
+    
+    def __init__(self, name: str, node_path: NodePath, navmesh: NavigationMesh):
+        self.name = name
+        self.node_path = node_path
+        self.navmesh = navmesh
+        self.behavior_tree: Optional[BehaviorTree] = None
+        self.behavior_state: Optional[BehaviorState] = None  # for compiled trees
+        
+        # State
+        self.position = Point3(0, 0, 0)
+        self.velocity = Vec3(0, 0, 0)
+        self.target_position: Optional[Point3] = None
+        self.path: List[Point3] = []
+        self.current_path_index = 0
+        # Set when the navmesh has a hierarchy; self.path grows segment by segment
+        self.hierarchical_path: Optional[HierarchicalPath] = None
+        
+        # Set by AISystem.enable_path_requests(); paths then arrive asynchronously
+        self.path_service: Optional[PathRequestService] = None
+        self.path_pending = False
+        self._path_future: Optional[Future] = None
+        self._path_goal_id = -1
+        self.on_screen = True
+        
+        # Set by AISystem.enable_crowd(); moves are then batched per frame
+        self.crowd: Optional['CrowdMovement'] = None
+        
+        # AILODScheduler state: bucket, dt since the last tick, stagger phase
+        self.lod_bucket = 0
+        self.lod_accumulator = 0.0
+        self.lod_lead = 0.0
+        self.lod_phase: Optional[float] = None
+        
+        # Properties
+        self.max_speed = 5.0
+        self.acceleration = 10.0
+        self.stopping_distance = 0.5
+        
+        # Perception
+        self.visible_agents: List['AIAgent'] = []
+        self.visible_objects: List[NodePath] = []
+        self.vision_range = 20.0
+        self.vision_angle = 120.0  # degrees
+        self._cached_vision_angle = None
+        self._cos_half_angle = 0.0
+        
+        # Custom data for behaviors
+        self.blackboard: Dict = {}
+    
+    def set_behavior_tree(self, tree: BehaviorTree):
+        """Set the behavior tree (or compiled tree) for this agent"""
+        self.behavior_tree = tree
+        self.behavior_state = tree.new_state() if isinstance(tree, CompiledBehaviorTree) else None
+    
+    def set_target(self, target: Point3):
+        """Set movement target and calculate path"""
+        self.target_position = target
+        if self.path_service is not None:
+            self._request_path(target)
+            return
+        
+        self.current_path_index = 0
+        self.hierarchical_path = None
+        if self.navmesh.hierarchy is not None:
+            self.hierarchical_path = self.navmesh.find_hierarchical_path(self.position, target)
+            self.path = self.hierarchical_path.next_points() if self.hierarchical_path else []
+        else:
+            self.path = self.navmesh.find_path(self.position, target)
+    
+    def _request_path(self, target: Point3):
+        """Queue a search; the current path is kept until the result arrives"""
+        goal_id = self.navmesh.nearest_node_id(target)
+        if goal_id == self._path_goal_id and (self.path_pending or self.current_path_index < len(self.path)):
+            # Same goal node: just move the final point
+            if self.path:
+                self.path[-1] = target
+            return
+        
+        start_id = self.navmesh.nearest_node_id(self.position)
+        self._path_goal_id = goal_id
+        if start_id < 0 or goal_id < 0:
+            self.path = []
+            self.path_pending = False
+            return
+        
+        self.path_pending = True
+        priority = 0 if self.on_screen else 1  # player-visible agents first
+        future = self.path_service.request(start_id, goal_id, priority)
+        self._path_future = future
+        future.add_done_callback(self._on_path_ready)
+    
+    def _on_path_ready(self, future: Future):
+        if future is not self._path_future or future.cancelled():
+            return  # Superseded by a newer target
+        self._path_future = None
+        self.path_pending = False
+        ids = future.result()
+        centers = self.navmesh.centers
+        target = self.target_position
+        self.path = [Point3(self.position)] + [Point3(*centers[i]) for i in ids[1:]] + [target] if ids else []
+        self.current_path_index = 0
+    
+    def move_to_next_waypoint(self, dt: float) -> NodeStatus:
+        """Move along calculated path"""
+        if self.path_pending and not self.path:
+            return NodeStatus.RUNNING
+        
+        # Refine the next hierarchical segment before the current one runs out
+        hierarchical = self.hierarchical_path
+        while hierarchical is not None and not hierarchical.complete and \
+                self.current_path_index >= len(self.path) - 1:
+            self.path.extend(hierarchical.next_points())
+        
+        if not self.path or self.current_path_index >= len(self.path):
+            return NodeStatus.SUCCESS
+        
+        waypoint = self.path[self.current_path_index]
+        if self.crowd is not None:
+            self.crowd.submit(self, dt, waypoint, follows_path=True)
+            return NodeStatus.RUNNING
+        
+        direction = waypoint - self.position
+        distance = direction.length()
+        
+        if distance < self.stopping_distance:
+            self.current_path_index += 1
+            if self.current_path_index >= len(self.path):
+                self.velocity = Vec3(0, 0, 0)
+                return NodeStatus.SUCCESS
+            return NodeStatus.RUNNING
+        
+        self._steer(direction, dt)
+        return NodeStatus.RUNNING
+    
+    def follow_flow_field(self, field: 'FlowField', dt: float, target: Optional[Point3] = None) -> NodeStatus:
+        """Move one step along a shared flow field
+        
+        Inside the goal node the agent heads for target (or the node
+        center); FAILURE when the goal cannot be reached from here.
+        """
+        node_id = int(field.node_ids_at(np.array(self.position))[0])
+        if not field.reachable(node_id):
+            self.velocity = Vec3(0, 0, 0)
+            return NodeStatus.FAILURE
+        
+        if node_id == field.goal_id:
+            goal = target if target is not None else Point3(*field.navmesh.centers[node_id])
+            direction = goal - self.position
+            if direction.length() < self.stopping_distance:
+                self.velocity = Vec3(0, 0, 0)
+                return NodeStatus.SUCCESS
+        else:
+            direction = Point3(*field.navmesh.centers[field.next_node[node_id]]) - self.position
+        
+        if self.crowd is not None:
+            self.crowd.submit(self, dt, self.position + direction)
+        else:
+            self._steer(direction, dt)
+        return NodeStatus.RUNNING
+    
+    def _steer(self, direction: Vec3, dt: float):
+        """Accelerate toward direction at max speed and move"""
+        direction = Vec3(direction)
+        direction.normalize()
+        desired_velocity = direction * self.max_speed
+        steering = desired_velocity - self.velocity
+        
+        self.velocity += steering * self.acceleration * dt
+        if self.velocity.length() > self.max_speed:
+            self.velocity.normalize()
+            self.velocity *= self.max_speed
+        
+        self.position += self.velocity * dt
+        self.node_path.set_pos(self.position)
+    
+    @property
+    def cos_half_vision_angle(self) -> float:
+        """cos(vision_angle / 2), recomputed only when the angle changes"""
+        if self._cached_vision_angle != self.vision_angle:
+            self._cached_vision_angle = self.vision_angle
+            self._cos_half_angle = math.cos(math.radians(self.vision_angle / 2))
+        return self._cos_half_angle
+    
+    def update_perception(self, all_agents: List['AIAgent'], collision_system=None,
+                          spatial_index: Optional['AgentSpatialHash'] = None):
+        """Update what the agent can see
+        
+        With a spatial_index only agents in cells within vision_range are
+        tested; otherwise every agent in all_agents is.
+        """
+        self.visible_agents.clear()
+        
+        forward = self.node_path.get_quat().get_forward()
+        fx, fy, fz = forward.x, forward.y, forward.z
+        px, py, pz = self.position.x, self.position.y, self.position.z
+        range_sq = self.vision_range * self.vision_range
+        cos_half = self.cos_half_vision_angle
+        
+        candidates = spatial_index.query(self.position, self.vision_range) if spatial_index else all_agents
+        for agent in candidates:
+            if agent is self:
+                continue
+            
+            position = agent.position
+            dx, dy, dz = position.x - px, position.y - py, position.z - pz
+            distance_sq = dx * dx + dy * dy + dz * dz
+            if distance_sq > range_sq:
+                continue
+            
+            # Inside the cone when the angle to forward is at most half the
+            # vision angle: forward . offset >= cos(half) * |offset|
+            if fx * dx + fy * dy + fz * dz >= cos_half * math.sqrt(distance_sq):
+                self.visible_agents.append(agent)
+    
+    def update(self, dt: float):
+        """Update agent"""
+        self.position = self.node_path.get_pos()
+        
+        if self.behavior_tree:
+            self.behavior_tree.tick(self, dt)
+
+
+class AgentSpatialHash:
+    """Uniform grid of agent positions, rebuilt once per frame
+    
+    Cells default to the largest vision range, so a perception query
+    touches at most 3 cells per axis.
+    """
+    
+    def __init__(self, cell_size: Optional[float] = None):
+        self.cell_size = cell_size
+        self._cell = 1.0
+        self._buckets: Dict[Tuple[int, int, int], List[AIAgent]] = {}
+    
+    def rebuild(self, agents: List[AIAgent]):
+        """Re-bucket every agent at its current position"""
+        self._buckets = {}
+        if not agents:
+            return
+        cell = self.cell_size or max(agent.vision_range for agent in agents)
+        self._cell = cell if cell > 0 else 1.0
+        inverse = 1.0 / self._cell
+        buckets = self._buckets
+        for agent in agents:
+            p = agent.position
+            key = (math.floor(p.x * inverse), math.floor(p.y * inverse), math.floor(p.z * inverse))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [agent]
+            else:
+                bucket.append(agent)
+    
+    def query(self, position: Point3, radius: float) -> List[AIAgent]:
+        """Agents in the cells overlapping the sphere (a superset of the hits)"""
+        inverse = 1.0 / self._cell
+        low = [math.floor((c - radius) * inverse) for c in (position.x, position.y, position.z)]
+        high = [math.floor((c + radius) * inverse) for c in (position.x, position.y, position.z)]
+        buckets = self._buckets
+        
+        # Few agents spread over a large query: scan buckets instead of cells
+        cells = (high[0] - low[0] + 1) * (high[1] - low[1] + 1) * (high[2] - low[2] + 1)
+        result = []
+        if cells > len(buckets):
+            for (x, y, z), bucket in buckets.items():
+                if low[0] <= x <= high[0] and low[1] <= y <= high[1] and low[2] <= z <= high[2]:
+                    result.extend(bucket)
+            return result
+        
+        for x in range(low[0], high[0] + 1):
+            for y in range(low[1], high[1] + 1):
+                for z in range(low[2], high[2] + 1):
+                    bucket = buckets.get((x, y, z))
+                    if bucket:
+                        result.extend(bucket)
+        return result
+
+
+class AILODScheduler:
+    """Distance/visibility tick-rate buckets for agents
+    
+    Each frame `schedule` puts agents in a bucket by distance to the viewer:
+    within `lod_distances[0]` ticks every frame, then `lod_rates` (Hz) per
+    band. Off-screen agents drop one band. Skipped frames accumulate dt,
+    so a 2 Hz agent ticks with dt ~0.5 s, and each agent's first tick in a
+    bucket is offset by a fixed per-agent phase so a bucket is spread over
+    frames instead of ticking all at once.
+    """
+    
+    BUCKET_NAMES = ("full", "medium", "low")
+    
+    def __init__(self):
+        self.lod_distances = (30.0, 80.0)
+        self.lod_rates = (None, 10.0, 2.0)  # Hz per bucket; None = every frame
+        self.bucket_counts = [0] * len(self.BUCKET_NAMES)
+        self.ticked = 0
+        self._next_phase = 0
+    
+    def bucket_for(self, distance: float, on_screen: bool) -> int:
+        bucket = sum(1 for limit in self.lod_distances if distance > limit)
+        if not on_screen:
+            bucket += 1
+        return min(bucket, len(self.BUCKET_NAMES) - 1)
+    
+    def schedule(self, agents: List['AIAgent'], dt: float,
+                 viewer_pos: Optional[Point3] = None) -> List[Tuple['AIAgent', float]]:
+        """Agents due this frame, each with its accumulated dt"""
+        counts = [0] * len(self.BUCKET_NAMES)
+        due = []
+        for agent in agents:
+            distance = (agent.position - viewer_pos).length() if viewer_pos is not None else 0.0
+            bucket = self.bucket_for(distance, agent.on_screen)
+            counts[bucket] += 1
+            
+            if agent.lod_phase is None:
+                # Golden-ratio sequence: successive agents land far apart
+                agent.lod_phase = (self._next_phase * 0.6180339887) % 1.0
+                self._next_phase += 1
+            rate = self.lod_rates[bucket]
+            if bucket != agent.lod_bucket:
+                agent.lod_bucket = bucket
+                # First tick in the bucket comes early by the agent's phase
+                agent.lod_lead = agent.lod_phase / rate if rate else 0.0
+            
+            agent.lod_accumulator += dt
+            # Small slack so 6 x (1/60) counts as 0.1 s despite rounding
+            if rate is None or agent.lod_accumulator + agent.lod_lead >= 1.0 / rate - 1e-6:
+                due.append((agent, agent.lod_accumulator))
+                agent.lod_accumulator = 0.0
+                agent.lod_lead = 0.0
+        
+        self.bucket_counts = counts
+        self.ticked = len(due)
+        return due
+    
+    def get_stats(self) -> Dict[str, int]:
+        stats = {name: count for name, count in zip(self.BUCKET_NAMES, self.bucket_counts)}
+        stats["ticked"] = self.ticked
+        return stats
+
+
+class CrowdMovement:
+    """Batched steering and integration for every moving agent
+    
+    With AISystem.enable_crowd(), move_to_next_waypoint and
+    follow_flow_field queue the agent here instead of moving it (one move
+    per agent per frame; a later one replaces an earlier one). update()
+    then steers, clamps speed, advances reached waypoints and integrates
+    all queued agents as arrays, the same way AIAgent._steer does, and
+    writes the results back in one loop. An agent whose last waypoint was
+    reached reports SUCCESS on its next tick.
+    
+    separation_radius > 0 pushes agents away from any agent closer than
+    that, moving or not, adding up to separation_weight (m/s, at contact)
+    to the desired velocity. Neighbors come from the same cell hash pair
+    generator batch perception uses, with cells of separation_radius.
+    """
+    
+    def __init__(self, separation_radius: float = 0.0, separation_weight: float = 2.0):
+        self.separation_radius = separation_radius
+        self.separation_weight = separation_weight
+        self._queued: Dict['AIAgent', Tuple[float, Tuple[float, float, float], bool]] = {}
+        self.stats = {"moved": 0, "arrived": 0, "separation_pairs": 0}
+    
+    @property
+    def pending(self) -> int:
+        return len(self._queued)
+    
+    def submit(self, agent: 'AIAgent', dt: float, target: Point3, follows_path: bool = False):
+        """Queue a step toward target; follows_path advances agent.path on arrival"""
+        self._queued[agent] = (dt, (target.x, target.y, target.z), follows_path)
+    
+    def update(self, all_agents: Optional[List['AIAgent']] = None) -> int:
+        """Move every queued agent; returns how many were queued
+        
+        all_agents are the separation neighbors (default: the queued ones).
+        """
+        queued, self._queued = self._queued, {}
+        self.stats = {"moved": 0, "arrived": 0, "separation_pairs": 0}
+        if not queued:
+            return 0
+        
+        agents = list(queued)
+        entries = list(queued.values())
+        positions = np.array([(a.position.x, a.position.y, a.position.z) for a in agents])
+        velocities = np.array([(a.velocity.x, a.velocity.y, a.velocity.z) for a in agents])
+        targets = np.array([target for _, target, _ in entries])
+        dt = np.array([step for step, _, _ in entries])
+        follows = np.array([follows_path for _, _, follows_path in entries])
+        max_speed = np.array([a.max_speed for a in agents], dtype=np.float64)
+        acceleration = np.array([a.acceleration for a in agents], dtype=np.float64)
+        stopping = np.array([a.stopping_distance for a in agents], dtype=np.float64)
+        
+        # Waypoints within stopping distance advance instead of moving
+        offset = targets - positions
+        distance = np.sqrt(np.einsum('ij,ij->i', offset, offset))
+        arrived = follows & (distance < stopping)
+        
+        direction = np.divide(offset, distance[:, None], out=np.zeros_like(offset), where=distance[:, None] > 0)
+        desired = direction * max_speed[:, None]
+        if self.separation_radius > 0:
+            desired += self._separation(agents, positions, all_agents or agents)
+        velocities += (desired - velocities) * (acceleration * dt)[:, None]
+        speed = np.sqrt(np.einsum('ij,ij->i', velocities, velocities))
+        over = speed > max_speed
+        velocities[over] *= (max_speed[over] / speed[over])[:, None]
+        positions += velocities * dt[:, None]
+        
+        for agent, stop, position, velocity in zip(agents, arrived.tolist(), positions.tolist(), velocities.tolist()):
+            if stop:
+                agent.current_path_index += 1
+                if agent.current_path_index >= len(agent.path):
+                    agent.velocity = Vec3(0, 0, 0)
+                continue
+            agent.velocity = Vec3(*velocity)
+            agent.position = Point3(*position)
+            agent.node_path.set_pos(agent.position)
+        
+        self.stats["moved"] = len(agents) - int(arrived.sum())
+        self.stats["arrived"] = int(arrived.sum())
+        return len(agents)
+    
+    def _separation(self, agents: List['AIAgent'], positions: np.ndarray,
+                    all_agents: List['AIAgent']) -> np.ndarray:
+        """Summed push (n, 3) on each queued agent from its close neighbors"""
+        n = len(agents)
+        queued = set(agents)
+        others = [a for a in all_agents if a not in queued]
+        if others:
+            positions = np.vstack([positions, [(a.position.x, a.position.y, a.position.z) for a in others]])
+        
+        radius = self.separation_radius
+        i, j = AISystem._perception_candidates(positions, radius)
+        keep = i < n
+        i, j = i[keep], j[keep]
+        offset = positions[i] - positions[j]
+        distance = np.sqrt(np.einsum('ij,ij->i', offset, offset))
+        close = (distance < radius) & (distance > 1e-9)
+        i, offset, distance = i[close], offset[close], distance[close]
+        self.stats["separation_pairs"] = len(i)
+        
+        # Linear falloff: full weight at contact, zero at the radius
+        push = offset * ((radius - distance) / (radius * distance) * self.separation_weight)[:, None]
+        return np.stack([np.bincount(i, weights=push[:, axis], minlength=n) for axis in range(3)], axis=1)
+    
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+# ==================== ML Inference ====================
+
+# ONNX input element types -> NumPy dtypes for stacked batches
+ONNX_INPUT_DTYPES = {
+    'tensor(float)': np.float32,
+    'tensor(double)': np.float64,
+    'tensor(float16)': np.float16,
+    'tensor(int32)': np.int32,
+    'tensor(int64)': np.int64,
+}
+
+
+class BatchInferenceService:
+    """Stacks per-agent feature vectors into one model call
+    
+    Agents submit() a (F,) feature vector during their tick and get a
+    Future. update() (called by AISystem after the agent ticks) stacks
+    each model's queue into an (N, F) array, runs it once through
+    AISystem.run_inference and resolves every future with its output row.
+    
+    With max_latency_ms set, a model's queue is only flushed once its
+    oldest request is that old or max_batch rows are waiting; otherwise
+    every update flushes.
+    """
+    
+    def __init__(self, ai_system: 'AISystem', max_batch: int = 1024, max_latency_ms: Optional[float] = None):
+        self.ai_system = ai_system
+        self.max_batch = max_batch
+        self.max_latency_ms = max_latency_ms
+        self._queues: Dict[str, List[Tuple[np.ndarray, Future, float]]] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+    
+    def submit(self, model_name: str, features, callback: Optional[Callable] = None) -> Future:
+        """Queue one feature vector; the future resolves to its output row
+        
+        Vectors must match the shape of those already queued for the model.
+        """
+        if model_name not in self.ai_system.ml_models:
+            raise ValueError(f"Model {model_name} not loaded")
+        features = np.asarray(features)
+        queue_ = self._queues.setdefault(model_name, [])
+        if queue_ and features.shape != queue_[0][0].shape:
+            raise ValueError(f"Features for {model_name} have shape {features.shape}, "
+                             f"expected {queue_[0][0].shape}")
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(lambda f: callback(f.result()))
+        queue_.append((features, future, time.perf_counter()))
+        if len(queue_) >= self.max_batch:
+            self.flush(model_name)
+        return future
+    
+    def pending(self, model_name: Optional[str] = None) -> int:
+        if model_name is not None:
+            return len(self._queues.get(model_name, ()))
+        return sum(len(q) for q in self._queues.values())
+    
+    def update(self) -> int:
+        """Flush the queues that are due; returns rows run"""
+        rows = 0
+        now = time.perf_counter()
+        for name, queue_ in list(self._queues.items()):
+            if not queue_:
+                continue
+            if self.max_latency_ms is not None and (now - queue_[0][2]) * 1000 < self.max_latency_ms:
+                continue
+            rows += self.flush(name)
+        return rows
+    
+    def flush(self, model_name: Optional[str] = None) -> int:
+        """Run queued requests now (all models when model_name is None)"""
+        if model_name is None:
+            return sum(self.flush(name) for name in list(self._queues))
+        
+        queue_ = self._queues.get(model_name)
+        if not queue_:
+            return 0
+        self._queues[model_name] = []
+        
+        rows = 0
+        for start in range(0, len(queue_), self.max_batch):
+            rows += self._run_batch(model_name, queue_[start:start + self.max_batch])
+        return rows
+    
+    def _run_batch(self, model_name: str, batch: List[Tuple[np.ndarray, Future, float]]) -> int:
+        dtype = self.ai_system.ml_models[model_name].get('input_dtype', np.float32)
+        
+        start = time.perf_counter()
+        try:
+            # Inside the try: the queue is already gone, so every future must resolve
+            inputs = np.stack([features for features, _, _ in batch]).astype(dtype, copy=False)
+            outputs = self.ai_system.run_inference(model_name, inputs)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return 0
+        done = time.perf_counter()
+        
+        stats = self._stats.setdefault(model_name, {"batches": 0, "rows": 0, "inference_ms": 0.0, "latency_ms": 0.0})
+        stats["batches"] += 1
+        stats["rows"] += len(batch)
+        stats["inference_ms"] += (done - start) * 1000
+        stats["latency_ms"] += sum(done - submitted for _, _, submitted in batch) * 1000
+        
+        for row, (_, future, _) in zip(outputs, batch):
+            future.set_result(row)
+        return len(batch)
+    
+    def get_report(self) -> Dict[str, Dict[str, float]]:
+        """Per-model batch sizes, latency (submit to result) and throughput"""
+        report = {}
+        for name, stats in self._stats.items():
+            seconds = stats["inference_ms"] / 1000
+            report[name] = {
+                "batches": stats["batches"],
+                "rows": stats["rows"],
+                "mean_batch": stats["rows"] / stats["batches"],
+                "inference_ms": stats["inference_ms"],
+                "mean_latency_ms": stats["latency_ms"] / stats["rows"],
+                "rows_per_second": stats["rows"] / seconds if seconds > 0 else 0.0,
+            }
+        return report
+
+
+# ==================== AI System Manager ====================
+
+class AISystem:
+    """Manages all AI agents and navigation"""
+    
+    def __init__(self, base):
+        self.base = base
+        self.agents: List[AIAgent] = []
+        self.navmesh: Optional[NavigationMesh] = None
+        self.flow_fields: Optional[FlowFieldCache] = None
+        self.path_requests: Optional[PathRequestService] = None
+        self.agent_index = AgentSpatialHash()
+        
+        # Vectorized perception (update_perception_batch) and its optional
+        # line-of-sight test against a PhysicsManager
+        self.batch_perception = False
+        self.perception_physics = None
+        self.perception_eye_height = 0.0
+        self.perception_mask = None
+        self.perception_stats = {"candidates": 0, "in_cone": 0, "rays": 0}
+        
+        # Tick scheduling; viewer_position (e.g. the player) overrides the camera
+        self.lod_scheduler: Optional[AILODScheduler] = None
+        self.viewer_position: Optional[Point3] = None
+        self.update_ms = 0.0
+        self.peak_update_ms = 0.0
+        
+        # Batched movement for all agents (enable_crowd)
+        self.crowd: Optional[CrowdMovement] = None
+        
+        # ML integration
+        self.ml_models: Dict[str, any] = {}
+        self.inference: Optional[BatchInferenceService] = None
+    
+    def create_navmesh(self, grid_size: Tuple[int, int, int] = (20, 20, 10), cell_size: float = 2.0):
+        """Create navigation mesh"""
+        self.navmesh = NavigationMesh(grid_size, cell_size)
+        self.flow_fields = None
+        return self.navmesh
+    
+    def get_flow_field(self, goal: Point3) -> Optional[FlowField]:
+        """Shared flow field toward goal (cached by goal node)"""
+        if not self.navmesh:
+            return None
+        if self.flow_fields is None or self.flow_fields.navmesh is not self.navmesh:
+            self.flow_fields = FlowFieldCache(self.navmesh)
+        return self.flow_fields.get(goal)
+    
+    def create_agent(self, name: str, node_path: NodePath) -> AIAgent:
+        """Create new AI agent"""
+        if not self.navmesh:
             self.create_navmesh()
         
         agent = AIAgent(name, node_path, self.navmesh)
+        agent.path_service = self.path_requests
+        agent.crowd = self.crowd
         self.agents.append(agent)
         return agent
     
+    def enable_path_requests(self, expansion_budget: int = 2000, use_thread: bool = False) -> PathRequestService:
+        """Route agent set_target() calls through a time-sliced request queue"""
+        if not self.navmesh:
+            self.create_navmesh()
+        if self.path_requests is not None:
+            self.path_requests.shutdown()
+        self.path_requests = PathRequestService(self.navmesh, expansion_budget, use_thread)
+        for agent in self.agents:
+            agent.path_service = self.path_requests
+        return self.path_requests
+    
+    def enable_crowd(self, separation_radius: float = 0.0, separation_weight: float = 2.0) -> CrowdMovement:
+        """Move all agents in one batched stage after the behavior ticks"""
+        self.crowd = CrowdMovement(separation_radius, separation_weight)
+        for agent in self.agents:
+            agent.crowd = self.crowd
+        return self.crowd
+    
+    def enable_lod(self) -> AILODScheduler:
+        """Tick distant and off-screen agents at reduced rates"""
+        if self.lod_scheduler is None:
+            self.lod_scheduler = AILODScheduler()
+        return self.lod_scheduler
+    
     def remove_agent(self, agent: AIAgent):
         """Remove agent from system"""
         if agent in self.agents:
@@ -534,34 +3124,64 @@ class AISystem:
                 "exists": self.navmesh is not None,
                 "grid_size": getattr(self.navmesh, "grid_size", None),
                 "cell_size": getattr(self.navmesh, "cell_size", None),
-                "nodes": len(self.navmesh.nodes) if self.navmesh else 0,
-            }
+                "nodes": self.navmesh.node_count if self.navmesh else 0,
+                "obstacles": self.navmesh.obstacle_count if self.navmesh else 0,
+                "path_cache": self.navmesh.path_cache.get_stats()
+                if self.navmesh and self.navmesh.path_cache else None,
+                "hierarchy": self.navmesh.hierarchy.get_stats()
+                if self.navmesh and self.navmesh.hierarchy else None,
+            },
+            "flow_fields": self.flow_fields.get_stats() if self.flow_fields else None,
+            "path_requests": self.path_requests.get_stats() if self.path_requests else None,
+            "lod": self.lod_scheduler.get_stats() if self.lod_scheduler else None,
+            "crowd": self.crowd.get_stats() if self.crowd else None,
+            "inference": self.inference.get_report() if self.inference else None,
+            "update_ms": self.update_ms,
+            "peak_update_ms": self.peak_update_ms,
         }
     
-    def load_ml_model(self, name: str, model_path: str, backend: str = "onnx"):
-        """Load ML model for inference (ONNX or TensorFlow Lite)"""
+    def load_ml_model(self, name: str, model_path: str, backend: str = "onnx",
+                      intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None,
+                      use_io_binding: bool = False):
+        """Load ML model for inference (ONNX or TensorFlow Lite)
+        
+        intra_op_threads/inter_op_threads size the runtime thread pools
+        (TFLite uses intra_op_threads only); use_io_binding makes ONNX runs
+        bind the input array directly instead of copying it per call.
+        """
         try:
             if backend == "onnx":
                 import onnxruntime as ort
-                session = ort.InferenceSession(model_path)
+                options = ort.SessionOptions()
+                if intra_op_threads is not None:
+                    options.intra_op_num_threads = intra_op_threads
+                if inter_op_threads is not None:
+                    options.inter_op_num_threads = inter_op_threads
+                session = ort.InferenceSession(model_path, sess_options=options,
+                                               providers=['CPUExecutionProvider'])
                 self.ml_models[name] = {
                     'type': 'onnx',
                     'session': session,
                     'inputs': [inp.name for inp in session.get_inputs()],
-                    'outputs': [out.name for out in session.get_outputs()]
+                    'outputs': [out.name for out in session.get_outputs()],
+                    'input_dtype': ONNX_INPUT_DTYPES.get(session.get_inputs()[0].type, np.float32),
+                    'io_binding': use_io_binding,
                 }
                 print(f"Loaded ONNX model: {name}")
             elif backend == "tflite":
                 import tensorflow as tf
-                interpreter = tf.lite.Interpreter(model_path=model_path)
+                interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=intra_op_threads)
                 interpreter.allocate_tensors()
                 self.ml_models[name] = {
                     'type': 'tflite',
                     'interpreter': interpreter,
                     'inputs': interpreter.get_input_details(),
-                    'outputs': interpreter.get_output_details()
+                    'outputs': interpreter.get_output_details(),
+                    'input_dtype': interpreter.get_input_details()[0]['dtype'],
                 }
                 print(f"Loaded TFLite model: {name}")
+            else:
+                raise ValueError(f"Unknown ML backend: {backend}")
         except ImportError as e:
             print(f"ML backend not available: {e}")
     
@@ -575,23 +3195,170 @@ class AISystem:
         if model['type'] == 'onnx':
             session = model['session']
             input_name = model['inputs'][0]
+            if model['io_binding']:
+                binding = session.io_binding()
+                binding.bind_cpu_input(input_name, np.ascontiguousarray(input_data))
+                binding.bind_output(model['outputs'][0])
+                session.run_with_iobinding(binding)
+                return binding.copy_outputs_to_cpu()[0]
             result = session.run(None, {input_name: input_data})
             return result[0]
         elif model['type'] == 'tflite':
             interpreter = model['interpreter']
-            interpreter.set_tensor(model['inputs'][0]['index'], input_data)
+            details = model['inputs'][0]
+            if tuple(details['shape']) != input_data.shape:
+                # Batches vary in size: resize the input and re-plan
+                interpreter.resize_tensor_input(details['index'], input_data.shape)
+                interpreter.allocate_tensors()
+                model['inputs'] = interpreter.get_input_details()
+                model['outputs'] = interpreter.get_output_details()
+            interpreter.set_tensor(details['index'], input_data)
             interpreter.invoke()
             return interpreter.get_tensor(model['outputs'][0]['index'])
     
+    def enable_batch_inference(self, max_batch: int = 1024,
+                               max_latency_ms: Optional[float] = None) -> 'BatchInferenceService':
+        """Batch per-agent submit() calls into one run per model"""
+        if self.inference is None:
+            self.inference = BatchInferenceService(self, max_batch, max_latency_ms)
+        return self.inference
+    
+    def _update_visibility(self):
+        """Flag agents inside the camera frustum (path request priority)"""
+        camera = getattr(self.base, 'cam', None)
+        if camera is None or not self.agents:
+            return
+        lens_bounds = camera.node().get_lens().make_bounds()
+        for agent in self.agents:
+            agent.on_screen = lens_bounds.contains(camera.get_relative_point(camera.get_top(), agent.position)) != 0
+    
+    def update_perception_batch(self, physics=None, eye_height: float = 0.0, mask=None,
+                                observers: Optional[List['AIAgent']] = None):
+        """Perception for every agent (or just observers) at once with NumPy
+        
+        Candidate pairs come from a cell-sorted sweep (cells the size of the
+        largest vision range), then range and cone tests run on the pair
+        arrays. With physics (a PhysicsManager) each mutually visible pair is
+        ray cast once, from eye_height above each agent, and pairs whose ray
+        hits anything in mask are dropped; keep agent bodies out of mask.
+        
+        observers limits which agents look (every agent can still be seen);
+        the others keep their previous visible_agents.
+        """
+        agents = self.agents
+        n = len(agents)
+        if observers is None:
+            observers = agents
+        for agent in observers:
+            agent.visible_agents.clear()
+        if n < 2 or not observers:
+            return
+        
+        positions = np.array([(a.position.x, a.position.y, a.position.z) for a in agents], dtype=np.float64)
+        forwards = np.array([tuple(a.node_path.get_quat().get_forward()) for a in agents], dtype=np.float64)
+        ranges = np.array([a.vision_range for a in agents], dtype=np.float64)
+        cos_half = np.array([a.cos_half_vision_angle for a in agents], dtype=np.float64)
+        
+        i, j = self._perception_candidates(positions, max(float(ranges.max()), 1e-6))
+        if observers is not agents:
+            index = {id(agent): k for k, agent in enumerate(agents)}
+            looking = np.zeros(n, dtype=bool)
+            looking[[index[id(agent)] for agent in observers]] = True
+            keep = looking[i]
+            i, j = i[keep], j[keep]
+        offsets = positions[j] - positions[i]
+        distance = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
+        seen = (distance <= ranges[i]) & (np.einsum('ij,ij->i', forwards[i], offsets) >= cos_half[i] * distance)
+        i, j = i[seen], j[seen]
+        self.perception_stats = {"candidates": len(distance), "in_cone": len(i), "rays": 0}
+        
+        if physics is not None and len(i):
+            # a->b and b->a share one ray
+            keys, inverse = np.unique(np.minimum(i, j) * n + np.maximum(i, j), return_inverse=True)
+            eyes = positions + np.array([0.0, 0.0, eye_height])
+            blocked = physics.raycast_batch(eyes[keys // n], eyes[keys % n], mask)
+            clear = ~blocked[inverse]
+            i, j = i[clear], j[clear]
+            self.perception_stats["rays"] = len(keys)
+        
+        for a, b in zip(i.tolist(), j.tolist()):
+            agents[a].visible_agents.append(agents[b])
+    
+    @staticmethod
+    def _perception_candidates(positions: np.ndarray, cell_size: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Ordered (i, j) pairs, i != j, of agents in the same or adjacent cells"""
+        n = len(positions)
+        cells = np.floor(positions / cell_size).astype(np.int64)
+        cells -= cells.min(axis=0) - 1  # one empty cell of padding below
+        dims = cells.max(axis=0) + 2  # and above
+        keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        
+        sources, targets = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    neighbor = keys + (dx * dims[1] + dy) * dims[2] + dz
+                    low = np.searchsorted(sorted_keys, neighbor, 'left')
+                    counts = np.searchsorted(sorted_keys, neighbor, 'right') - low
+                    total = int(counts.sum())
+                    if total == 0:
+                        continue
+                    starts = np.repeat(low - np.cumsum(counts) + counts, counts)
+                    sources.append(np.repeat(np.arange(n), counts))
+                    targets.append(order[starts + np.arange(total)])
+        
+        i = np.concatenate(sources)
+        j = np.concatenate(targets)
+        keep = i != j
+        i, j = i[keep], j[keep]
+        # Group by viewer, keeping agent order within each list
+        pair_order = np.lexsort((j, i))
+        return i[pair_order], j[pair_order]
+    
+    def _viewer_position(self) -> Optional[Point3]:
+        if self.viewer_position is not None:
+            return self.viewer_position
+        camera = getattr(self.base, 'cam', None)
+        return camera.get_pos(camera.get_top()) if camera is not None else None
+    
     def update(self, dt: float):
         """Update all agents"""
-        # Update perception for all agents
-        for agent in self.agents:
-            agent.update_perception(self.agents)
+        start = time.perf_counter()
+        self._update_visibility()
+        if self.path_requests is not None:
+            self.path_requests.update()
+        
+        if self.lod_scheduler is not None:
+            due = self.lod_scheduler.schedule(self.agents, dt, self._viewer_position())
+        else:
+            due = [(agent, dt) for agent in self.agents]
+        
+        # Update perception for the agents due this frame (one index build per frame)
+        if self.batch_perception:
+            observers = [agent for agent, _ in due] if self.lod_scheduler is not None else None
+            self.update_perception_batch(self.perception_physics, self.perception_eye_height, self.perception_mask,
+                                         observers)
+        else:
+            self.agent_index.rebuild(self.agents)
+            for agent, _ in due:
+                agent.update_perception(self.agents, spatial_index=self.agent_index)
         
         # Update agent behaviors
-        for agent in self.agents:
-            agent.update(dt)
+        for agent, agent_dt in due:
+            agent.update(agent_dt)
+        
+        # Apply the moves the behaviors queued
+        if self.crowd is not None:
+            self.crowd.update(self.agents)
+        
+        # Run the inference requests the behaviors just submitted
+        if self.inference is not None:
+            self.inference.update()
+        
+        self.update_ms = (time.perf_counter() - start) * 1000
+        self.peak_update_ms = max(self.peak_update_ms, self.update_ms)
 
 
 # ==================== Helper Functions ====================
@@ -606,6 +3373,8 @@ def create_patrol_behavior(waypoints: List[Point3]) -> BehaviorTree:
         return NodeStatus.SUCCESS
     
     def at_waypoint(agent):
+        if agent.path_pending:
+            return False
         if not agent.path:
             return True
         return agent.current_path_index >= len(agent.path)
@@ -639,6 +3408,21 @@ def create_chase_behavior(target_getter: Callable) -> BehaviorTree:
     return BehaviorTree(RepeaterNode("Forever", root, count=-1))
 
 
+def create_flow_chase_behavior(target_getter: Callable, ai_system: AISystem) -> BehaviorTree:
+    """Chase behavior for crowds: agents sharing a target share one flow field"""
+    
+    def chase(agent, dt):
+        target = target_getter(agent)
+        if not target:
+            return NodeStatus.FAILURE
+        field = ai_system.get_flow_field(target)
+        if field is None:
+            return NodeStatus.FAILURE
+        return agent.follow_flow_field(field, dt, target)
+    
+    return BehaviorTree(RepeaterNode("Forever", ActionNode("FlowChase", chase), count=-1))
+
+
 def create_ai_system(base) -> AISystem:
     """Factory function to create AI system"""
     return AISystem(base)
@@ -0,0 +1,104 @@
+"""
+CFT-ENGINE0 Benchmark Results
+Results documents shared by the headless benchmarks
+
+A results document is a dict with "environment", "settings" and a list of
+per-case "results". Documents are written as stable, sorted JSON so two
+runs can be diffed, and compare_results() flags per-case slowdowns beyond
+a tolerance. finish() is the common tail of each benchmark's command line:
+write --output, compare against --baseline and pick the exit code.
+"""
+
+import argparse
+import json
+import os
+import platform
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def environment() -> Dict:
+    """Interpreter and machine details recorded with every run"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_results(document: Dict, path: str):
+    """Write results as sorted, indented JSON (diff friendly)"""
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_results(path: str) -> Dict:
+    """Read results written by save_results()"""
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compare_results(baseline: Dict, current: Dict, keys: Sequence[str], metric: str,
+                    fingerprint: Optional[str] = None, tolerance: float = 0.10) -> List[Dict]:
+    """Cases whose metric (milliseconds) grew by more than tolerance (fractional)
+
+    Cases are matched on the keys fields; skipped cases are ignored. A
+    changed fingerprint field (e.g. a pair or expansion count) is reported
+    too, since it means the workload changed and the timings are not
+    comparable; such entries carry ``<fingerprint>_changed``.
+    """
+    def key(result):
+        return tuple(result[k] for k in keys)
+
+    previous = {key(r): r for r in baseline.get("results", []) if not r.get("skipped")}
+    regressions = []
+    for result in current.get("results", []):
+        before = previous.get(key(result))
+        if before is None or result.get("skipped"):
+            continue
+
+        ratio = result[metric] / before[metric] if before[metric] > 0 else 1.0
+        changed = fingerprint is not None and result[fingerprint] != before[fingerprint]
+        if ratio > 1.0 + tolerance or changed:
+            regression = {k: result[k] for k in keys}
+            regression.update({"baseline_ms": before[metric], "current_ms": result[metric], "ratio": ratio})
+            if fingerprint is not None:
+                regression[f"{fingerprint}_changed"] = changed
+            regressions.append(regression)
+    return regressions
+
+
+def add_result_arguments(parser: argparse.ArgumentParser):
+    """--output, --baseline and --tolerance, as used by finish()"""
+    parser.add_argument("--output", "-o", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed slowdown before a case counts as a regression")
+
+
+def finish(document: Dict, args: argparse.Namespace,
+           compare: Callable[[Dict, Dict, float], List[Dict]], describe: Callable[[Dict], str]) -> int:
+    """Save and compare a finished run; returns 1 when regressions are found
+
+    compare is the benchmark's compare_results(baseline, current,
+    tolerance); describe names a regression's case for the report.
+    """
+    if args.output:
+        save_results(document, args.output)
+        print(f"Results written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    regressions = compare(load_results(args.baseline), document, args.tolerance)
+    for r in regressions:
+        changed = [name[:-len("_changed")] for name, value in r.items() if name.endswith("_changed") and value]
+        note = f" ({changed[0]} changed)" if changed else ""
+        print(f"REGRESSION {describe(r)}: "
+              f"{r['baseline_ms']:.2f} -> {r['current_ms']:.2f} ms ({r['ratio']:.2f}x){note}")
+    if regressions:
+        return 1
+    print("No regressions")
+    return 0
@@ -0,0 +1,195 @@
+"""
+CFT-ENGINE0 Fluid Benchmark
+Headless scaling benchmark for the fluid_system SPH backends
+
+Runs each backend on a block of particles at several sizes and records
+milliseconds per step, neighbor-pair counts and peak Python/NumPy memory.
+Results are saved and compared with benchmark_results.
+
+Usage:
+    python -m engine_modules.fluid_benchmark --output bench.json
+    python -m engine_modules.fluid_benchmark --baseline bench.json --sizes 1000 5000
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from engine_modules import benchmark_results
+from engine_modules.fluid_system import (
+    SPHFluidSimulation,
+    VectorizedSPHFluidSimulation,
+    ParallelSPHFluidSimulation,
+    PBFFluidSimulation,
+)
+
+
+BENCHMARK_SIZES = (1000, 5000, 20000, 50000)
+BENCHMARK_BACKENDS = ("python", "numpy", "parallel", "pbf")
+
+# Largest size worth running per backend (the object solver needs minutes
+# per step beyond this); larger cases are recorded as skipped
+BACKEND_SIZE_LIMITS = {"python": 5000}
+
+# Particle spacing relative to the smoothing radius; 0.5 gives ~30
+# neighbors per interior particle, a typical production density
+SPACING_FACTOR = 0.5
+
+# Pressure stiffness that stays stable at the default 0.01 s step
+BENCHMARK_GAS_CONSTANT = 20.0
+
+
+def create_simulation(backend: str, particle_count: int, workers: Optional[int] = None) -> SPHFluidSimulation:
+    """Create a solver for the given backend name"""
+    if backend == "python":
+        return SPHFluidSimulation(particle_count)
+    if backend == "numpy":
+        return VectorizedSPHFluidSimulation(particle_count)
+    if backend == "parallel":
+        return ParallelSPHFluidSimulation(particle_count, workers=workers)
+    if backend == "pbf":
+        return PBFFluidSimulation(particle_count)
+    raise ValueError(f"Unknown fluid backend: {backend}")
+
+
+def populate(sim: SPHFluidSimulation, particle_count: int, seed: int = 0):
+    """Fill sim with a jittered cubic block of exactly particle_count particles"""
+    spacing = sim.smoothing_radius * SPACING_FACTOR
+    per_axis = int(np.ceil(particle_count ** (1.0 / 3.0)))
+    idx = np.indices((per_axis,) * 3).reshape(3, -1).T[:particle_count]
+
+    rng = np.random.default_rng(seed)
+    positions = (idx - per_axis / 2.0) * spacing
+    positions += rng.uniform(-0.05, 0.05, size=positions.shape) * spacing
+
+    if hasattr(sim, "add_particles"):
+        sim.add_particles(positions)
+    else:
+        from panda3d.core import Point3
+        for x, y, z in positions:
+            sim.add_particle(Point3(x, y, z))
+
+    # A block at rest (no gravity, rest density from the packing, soft
+    # pressure) keeps the neighbor count steady over the timed steps, so
+    # results at different sizes and between runs are comparable
+    sim.gravity[:] = 0.0
+    sim.gas_constant = BENCHMARK_GAS_CONSTANT
+    if sim.rest_density is not None:
+        sim._build_neighbor_list()
+        sim._compute_density_pressure()
+        if hasattr(sim, "densities"):
+            sim.rest_density = float(np.max(sim.densities))
+        else:
+            sim.rest_density = max(p.density for p in sim.particles)
+
+
+def benchmark_case(backend: str, particle_count: int, steps: int = 5, warmup: int = 1,
+                   seed: int = 0, workers: Optional[int] = None) -> Dict:
+    """Time one backend at one size
+
+    Timed steps run without tracemalloc; one extra traced step measures
+    the peak allocation. Worker processes of the parallel backend are not
+    included in the memory figure.
+    """
+    sim = create_simulation(backend, particle_count, workers)
+    try:
+        populate(sim, particle_count, seed)
+        dt = sim.time_step  # exactly one substep per update
+
+        for _ in range(warmup):
+            sim.update(dt)
+
+        timings = []
+        for _ in range(steps):
+            start = time.perf_counter()
+            sim.update(dt)
+            timings.append((time.perf_counter() - start) * 1000)
+        pairs = sim.neighbor_list.pair_count
+        if getattr(sim, "worker_timings", None):
+            # Per-slab lists; pairs near slab edges count once per worker
+            pairs = sum(t["pairs"] for t in sim.worker_timings)
+
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        sim.update(dt)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        if hasattr(sim, "close"):
+            sim.close()
+
+    return {
+        "backend": backend,
+        "particles": particle_count,
+        "steps": steps,
+        "ms_per_step": statistics.median(timings),
+        "ms_min": min(timings),
+        "ms_max": max(timings),
+        "pairs": int(pairs),
+        "pairs_per_particle": pairs / particle_count if particle_count else 0.0,
+        "peak_memory_mb": peak / (1024 * 1024),
+    }
+
+
+def run_fluid_benchmark(sizes: Sequence[int] = BENCHMARK_SIZES,
+                        backends: Sequence[str] = BENCHMARK_BACKENDS,
+                        steps: int = 5, warmup: int = 1, seed: int = 0,
+                        workers: Optional[int] = None, verbose: bool = False) -> Dict:
+    """Run every backend at every size and return the results document"""
+    results = []
+    for backend in backends:
+        limit = BACKEND_SIZE_LIMITS.get(backend)
+        for size in sizes:
+            if limit is not None and size > limit:
+                results.append({"backend": backend, "particles": size, "skipped": True})
+                continue
+
+            case = benchmark_case(backend, size, steps, warmup, seed, workers)
+            results.append(case)
+            if verbose:
+                print(f"{backend:>8} {size:>6}: {case['ms_per_step']:9.2f} ms/step  "
+                      f"{case['pairs']:>9} pairs  {case['peak_memory_mb']:7.1f} MB")
+
+    return {
+        "environment": benchmark_results.environment(),
+        "settings": {"steps": steps, "warmup": warmup, "seed": seed, "workers": workers},
+        "results": sorted(results, key=lambda r: (r["backend"], r["particles"])),
+    }
+
+
+def compare_results(baseline: Dict, current: Dict, tolerance: float = 0.10) -> List[Dict]:
+    """Cases whose ms per step grew by more than tolerance (fractional)
+
+    Pair count changes are reported too: they mean the scene or neighbor
+    search changed, so the timings are not comparable.
+    """
+    return benchmark_results.compare_results(baseline, current, ("backend", "particles"),
+                                             "ms_per_step", "pairs", tolerance)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Command line entry point; returns 1 when regressions are found"""
+    parser = argparse.ArgumentParser(description="Fluid system scaling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(BENCHMARK_SIZES),
+                        help="Particle counts to run")
+    parser.add_argument("--backends", nargs="+", default=list(BENCHMARK_BACKENDS),
+                        choices=list(BENCHMARK_BACKENDS), help="Backends to run")
+    parser.add_argument("--steps", type=int, default=5, help="Timed steps per case")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed steps per case")
+    parser.add_argument("--workers", type=int, help="Worker processes for the parallel backend")
+    benchmark_results.add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    document = run_fluid_benchmark(args.sizes, args.backends, args.steps, args.warmup,
+                                   workers=args.workers, verbose=True)
+    return benchmark_results.finish(document, args, compare_results,
+                                    lambda r: f"{r['backend']} {r['particles']}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
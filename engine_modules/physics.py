@@ -10,7 +10,8 @@ Supports:
 """
 import logging
 from typing import Optional, Tuple, List, Dict
-from panda3d.core import Vec3, BitMask32, NodePath, TransformState
+import numpy as np
+from panda3d.core import Vec3, Point3, BitMask32, NodePath, TransformState
 from panda3d.bullet import (
     BulletWorld,
     BulletRigidBodyNode,
@@ -198,6 +199,29 @@ class PhysicsManager:
             return result
         return None
     
+    def raycast_batch(self, starts: np.ndarray, ends: np.ndarray,
+                      mask: Optional[BitMask32] = None) -> np.ndarray:
+        """Perform many ray casts in one call.
+        
+        Args:
+            starts: (N, 3) ray start positions
+            ends: (N, 3) ray end positions
+            mask: Collide mask the rays test against (default: everything)
+            
+        Returns:
+            (N,) bool array, True where a ray hit something
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 3)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 3)
+        if mask is None:
+            mask = BitMask32.all_on()
+        
+        ray_test = self.world.ray_test_closest
+        hits = np.zeros(len(starts), dtype=bool)
+        for i, (a, b) in enumerate(zip(starts.tolist(), ends.tolist())):
+            hits[i] = ray_test(Point3(*a), Point3(*b), mask).has_hit()
+        return hits
+    
     def set_gravity(self, gravity: float) -> None:
         """Change gravity.
         
@@ -48,6 +48,9 @@ class PerformanceMetrics:
         
         # Timing zones
         self.zone_times: Dict[str, deque] = {}
+        
+        # Arbitrary per-frame values (step sizes, counts, ...)
+        self.counters: Dict[str, deque] = {}
     
     def add_frame_time(self, dt: float):
         """Record frame time"""
@@ -61,6 +64,12 @@ class PerformanceMetrics:
             self.zone_times[zone_name] = deque(maxlen=self.history_size)
         self.zone_times[zone_name].append(duration)
     
+    def add_counter(self, name: str, value: float):
+        """Record a sampled value"""
+        if name not in self.counters:
+            self.counters[name] = deque(maxlen=self.history_size)
+        self.counters[name].append(value)
+    
     def get_average_fps(self) -> float:
         """Get average FPS"""
         if not self.fps_history:
@@ -348,6 +357,10 @@ class EngineProfiler:
         """Record zone timing"""
         self.metrics.add_zone_time(zone_name, duration)
     
+    def record_counter(self, name: str, value: float):
+        """Record a sampled value (e.g. a chosen timestep)"""
+        self.metrics.add_counter(name, value)
+    
     def update(self, dt: float):
         """Update profiler (call every frame)"""
         if not self.enabled:
@@ -443,7 +456,8 @@ class EngineProfiler:
                 'min_max_fps': self.metrics.get_min_max_fps(),
                 'frame_time_percentiles': self.metrics.get_frame_time_percentiles(),
                 'avg_cpu': sum(self.metrics.cpu_usage) / len(self.metrics.cpu_usage) if self.metrics.cpu_usage else 0,
-                'peak_memory_mb': max(self.metrics.memory_usage_mb) if self.metrics.memory_usage_mb else 0
+                'peak_memory_mb': max(self.metrics.memory_usage_mb) if self.metrics.memory_usage_mb else 0,
+                'counters': {name: list(values)[-1] for name, values in self.metrics.counters.items() if values}
             },
             'memory_leaks': self.detect_memory_leaks(),
             'benchmarks': self.benchmark_results,
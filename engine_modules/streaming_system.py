@@ -4,6 +4,7 @@ Manages loading/unloading of world chunks, level-of-detail transitions, and memo
 """
 
 import asyncio
+import math
 from typing import Dict, List, Optional, Tuple, Set
 from panda3d.core import Point3, Vec3, NodePath, LODNode, BoundingSphere, PandaNode
 from panda3d.core import ModelNode, TextureStage, Texture
@@ -92,6 +93,45 @@ class StreamingZone:
         return (self.center - point).length()
 
 
+class ZoneSpatialIndex:
+    """Uniform XY grid over zone bounds
+    
+    Each zone is listed in every cell its bounding square overlaps, so a
+    query visits only the cells around a point instead of every zone.
+    """
+    
+    def __init__(self, cell_size: float):
+        self.cell_size = float(cell_size)
+        self.cells: Dict[Tuple[int, int], List[StreamingZone]] = {}
+        self.count = 0
+    
+    def cell_of(self, point: Point3) -> Tuple[int, int]:
+        return (math.floor(point.x / self.cell_size), math.floor(point.y / self.cell_size))
+    
+    def _cell_range(self, point: Point3, reach: float):
+        low_x, low_y = math.floor((point.x - reach) / self.cell_size), math.floor((point.y - reach) / self.cell_size)
+        high_x, high_y = math.floor((point.x + reach) / self.cell_size), math.floor((point.y + reach) / self.cell_size)
+        for x in range(low_x, high_x + 1):
+            for y in range(low_y, high_y + 1):
+                yield (x, y)
+    
+    def insert(self, zone: StreamingZone):
+        for key in self._cell_range(zone.center, zone.radius):
+            self.cells.setdefault(key, []).append(zone)
+        self.count += 1
+    
+    def query(self, point: Point3, reach: float) -> List[StreamingZone]:
+        """Zones whose bounds may lie within reach of point (a superset)"""
+        seen: Set[str] = set()
+        found: List[StreamingZone] = []
+        for key in self._cell_range(point, reach):
+            for zone in self.cells.get(key, ()):
+                if zone.zone_id not in seen:
+                    seen.add(zone.zone_id)
+                    found.append(zone)
+        return found
+
+
 class StreamingPriority(Enum):
     """Priority levels for streaming"""
     CRITICAL = 0  # Player is in zone
@@ -104,7 +144,13 @@ class StreamingPriority(Enum):
 # ==================== Streaming Manager ====================
 
 class StreamingManager:
-    """Manages world streaming and asset loading"""
+    """Manages world streaming and asset loading
+    
+    Zones are found through a ZoneSpatialIndex, so an update only ranks
+    the zones within unload_distance of the player (plus the loaded ones).
+    The ranking is reused until the player enters another index cell or
+    moves more than priority_update_distance.
+    """
     
     def __init__(self, base, asset_pipeline=None):
         self.base = base
@@ -131,6 +177,16 @@ class StreamingManager:
         self.max_concurrent_loads = 2
         self.allow_sync_load = True  # fallback when no loop present
         
+        # Zone index, rebuilt lazily after zones are added
+        self.zone_index: Optional[ZoneSpatialIndex] = None
+        self.zone_cell_size: Optional[float] = None  # None: twice the largest zone radius
+        self.priority_update_distance = 5.0
+        self._zone_priorities: Optional[List[Tuple[StreamingZone, StreamingPriority]]] = None
+        self._priority_key = None  # (index cell, view_distance, unload_distance) of the ranking
+        self._priority_origin = Point3(0, 0, 0)
+        self.priority_updates = 0
+        self.zones_evaluated = 0
+        
         # Root node for streamed content
         self.streaming_root = base.render.attach_new_node("streaming_root")
 
@@ -144,8 +200,60 @@ class StreamingManager:
         """Create new streaming zone"""
         zone = StreamingZone(zone_id, center, radius)
         self.zones[zone_id] = zone
+        self.zone_index = None
         return zone
     
+    def _ensure_zone_index(self) -> ZoneSpatialIndex:
+        """Index every zone; zones start (and stay, while far away) at UNLOAD"""
+        if self.zone_index is None or self.zone_index.count != len(self.zones):
+            cell_size = self.zone_cell_size
+            if not cell_size:
+                cell_size = 2 * max((zone.radius for zone in self.zones.values()), default=0.0) or 1.0
+            self.zone_index = ZoneSpatialIndex(cell_size)
+            for zone in self.zones.values():
+                self.zone_index.insert(zone)
+                zone.priority = StreamingPriority.UNLOAD.value
+            self._zone_priorities = None
+        return self.zone_index
+    
+    def _rank_zones(self) -> List[Tuple[StreamingZone, StreamingPriority]]:
+        """Priorities of nearby and loaded zones, most urgent first
+        
+        Recomputed only when the index, the player's index cell or the
+        distances changed, or the player moved priority_update_distance.
+        """
+        index = self._ensure_zone_index()
+        key = (index.cell_of(self.player_position), self.view_distance, self.unload_distance)
+        if self._zone_priorities is not None and key == self._priority_key and \
+                (self.player_position - self._priority_origin).length() <= self.priority_update_distance:
+            return self._zone_priorities
+        
+        candidates = index.query(self.player_position, max(self.view_distance, self.unload_distance))
+        seen = {zone.zone_id for zone in candidates}
+        for zone_id in self.loaded_zones | self.loading_zones:
+            if zone_id not in seen and zone_id in self.zones:
+                candidates.append(self.zones[zone_id])
+                seen.add(zone_id)
+        
+        # Zones that dropped out of range report UNLOAD like the rest of the far field
+        for zone, _ in self._zone_priorities or ():
+            if zone.zone_id not in seen:
+                zone.priority = StreamingPriority.UNLOAD.value
+        
+        zone_priorities: List[Tuple[StreamingZone, StreamingPriority]] = []
+        for zone in candidates:
+            priority = self._calculate_priority(zone)
+            zone.priority = priority.value
+            zone_priorities.append((zone, priority))
+        zone_priorities.sort(key=lambda x: x[1].value)
+        
+        self._zone_priorities = zone_priorities
+        self._priority_key = key
+        self._priority_origin = Point3(self.player_position)
+        self.priority_updates += 1
+        self.zones_evaluated = len(zone_priorities)
+        return zone_priorities
+    
     def create_grid_zones(self, grid_size: Tuple[int, int], zone_size: float, height: float = 0.0):
         """Create grid of zones for an open world"""
         for x in range(grid_size[0]):
@@ -244,15 +352,8 @@ class StreamingManager:
         if not self.streaming_enabled:
             return
         
-        # Calculate priorities
-        zone_priorities: List[Tuple[StreamingZone, StreamingPriority]] = []
-        for zone in self.zones.values():
-            priority = self._calculate_priority(zone)
-            zone.priority = priority.value
-            zone_priorities.append((zone, priority))
-        
-        # Sort by priority
-        zone_priorities.sort(key=lambda x: x[1].value)
+        # Priorities of the zones around the player, sorted
+        zone_priorities = self._rank_zones()
         
         # Unload far zones
         for zone, priority in zone_priorities:
@@ -321,6 +422,8 @@ class StreamingManager:
             "memory_budget_mb": self.memory_budget_mb,
             "view_distance": self.view_distance,
             "streaming_enabled": self.streaming_enabled,
+            "zones_evaluated": self.zones_evaluated,
+            "priority_updates": self.priority_updates,
         }
 
 
@@ -0,0 +1,1560 @@
+"""Unit tests for the AI system module.
+
+Tests cover:
+- Array-backed navigation mesh construction
+- Integer-id A* pathfinding
+- Irregular meshes built from add_node/connect_nodes
+- Nearest-node lookup (grid math and spatial hash)
+- Hierarchical (HPA*) planning, lazy refinement and cluster invalidation
+- Flow fields shared by agents chasing one goal
+- Time-sliced, deduplicated path requests (in-frame and worker thread)
+- Agent perception through a per-frame spatial hash
+- Vectorized batch perception with batched line-of-sight rays
+- LOD tick scheduling by distance and visibility
+- Batched ONNX inference (tiny linear model written by the tests)
+- Compiled behavior trees matching the object trees
+- LRU path cache with per-node invalidation
+- Jump Point Search on uniform-cost grids
+- Dynamic obstacles with per-cell reference counts and dirty regions
+- Batched crowd steering with separation
+"""
+
+import math
+import random
+import threading
+
+import numpy as np
+import pytest
+from panda3d.core import Point3, NodePath
+
+from engine_modules import ai_system
+from engine_modules.physics import PhysicsManager
+from engine_modules.ai_system import (
+    NavigationMesh,
+    NavMeshNode,
+    NavMeshSpatialIndex,
+    NavMeshHierarchy,
+    NavMeshDirtyRegion,
+    PathCache,
+    JumpPointSearch,
+    FlowField,
+    FlowFieldCache,
+    PathSearch,
+    PathRequestService,
+    AgentSpatialHash,
+    AILODScheduler,
+    CrowdMovement,
+    ActionNode,
+    BehaviorTree,
+    ConditionNode,
+    SequenceNode,
+    SelectorNode,
+    ParallelNode,
+    InverterNode,
+    RepeaterNode,
+    compile_behavior_tree,
+    AIAgent,
+    AISystem,
+    NodeStatus,
+    create_flow_chase_behavior,
+)
+
+
+def _grid(dims=(10, 10, 1), cell_size=1.0):
+    """Grid navmesh with its first cell at the origin."""
+    navmesh = NavigationMesh(cell_size=cell_size)
+    navmesh.generate_grid(Point3(0, 0, 0), Point3(*(d * cell_size for d in dims)))
+    return navmesh
+
+
+class TestNavigationMesh:
+    """Test navigation mesh storage."""
+    
+    def test_grid_arrays(self):
+        """Test grid nodes are stored as arrays in x-major order."""
+        navmesh = _grid((4, 3, 2))
+        
+        assert navmesh.node_count == len(navmesh.nodes) == 24
+        assert navmesh.centers.dtype == np.float32
+        assert navmesh.walkable.dtype == np.uint8
+        np.testing.assert_allclose(navmesh.centers[1], [0, 0, 1])
+        np.testing.assert_allclose(navmesh.centers[2], [0, 1, 0])
+        np.testing.assert_allclose(navmesh.centers[6], [1, 0, 0])
+    
+    def test_csr_adjacency(self):
+        """Test 6-connected neighbors are listed once per direction."""
+        navmesh = _grid((3, 3, 3))
+        degrees = np.diff(navmesh.adjacency_offsets)
+        
+        assert degrees[0] == 3  # corner
+        assert degrees[13] == 6  # center
+        assert len(navmesh.adjacency) == 2 * 3 * (2 * 3 * 3)
+        assert sorted(navmesh.neighbor_ids(13).tolist()) == [4, 10, 12, 14, 16, 22]
+    
+    def test_node_views(self):
+        """Test node views read and write the mesh arrays."""
+        navmesh = _grid((3, 3, 1))
+        node = navmesh.nodes[4]
+        
+        assert node == NavMeshNode(navmesh, 4)
+        assert node.center == Point3(1, 1, 0)
+        assert node.radius == pytest.approx(0.5)
+        assert len(node.neighbors) == 4
+        
+        node.walkable = False
+        assert navmesh.walkable[4] == 0
+        assert navmesh.find_nearest_node(Point3(1, 1, 0)) != node
+    
+    def test_mark_obstacle(self):
+        """Test nodes overlapping the obstacle sphere become non-walkable."""
+        navmesh = _grid((5, 5, 1))
+        navmesh.mark_obstacle(Point3(2, 2, 0), 0.6)
+        
+        blocked = np.flatnonzero(navmesh.walkable == 0)
+        np.testing.assert_allclose(navmesh.centers[blocked], [[1, 2, 0], [2, 1, 0], [2, 2, 0], [2, 3, 0], [3, 2, 0]])
+    
+    def test_irregular_mesh(self):
+        """Test free-standing nodes and deduplicated connections."""
+        navmesh = NavigationMesh()
+        a = navmesh.add_node(Point3(0, 0, 0), 1.0)
+        b = navmesh.add_node(Point3(3, 0, 0), 1.0)
+        c = navmesh.add_node(Point3(3, 4, 0), 1.0)
+        navmesh.connect_nodes(a, b)
+        navmesh.connect_nodes(b, a)
+        navmesh.nodes[b].add_neighbor(navmesh.nodes[c])
+        
+        assert navmesh.neighbor_ids(b).tolist() == [a, c]
+        assert navmesh.neighbor_ids(a).tolist() == [b]
+        assert navmesh.find_path_ids(a, c) == [a, b, c]
+    
+    def test_debug_visual(self):
+        """Test the debug visual is built from walkable edges."""
+        navmesh = _grid((3, 3, 1))
+        visual = navmesh.create_debug_visual(NodePath('render'))
+        assert not visual.is_empty()
+
+
+def _brute_nearest(navmesh, point):
+    """Reference nearest walkable node by linear scan."""
+    walkable = np.flatnonzero(navmesh.walkable)
+    offset = navmesh.centers[walkable] - np.asarray(point, dtype=np.float32)
+    return int(walkable[np.argmin(np.einsum('ij,ij->i', offset, offset))])
+
+
+def _nearest_distance(navmesh, node_id, point):
+    return float(np.linalg.norm(navmesh.centers[node_id] - np.asarray(point, dtype=np.float32)))
+
+
+class TestNearestNode:
+    """Test nearest walkable node lookup."""
+    
+    def test_grid_matches_linear_scan(self):
+        """Test grid lookup agrees with a scan, around obstacles and off-grid."""
+        navmesh = _grid((20, 20, 4))
+        rng = np.random.default_rng(1)
+        for _ in range(10):
+            navmesh.mark_obstacle(Point3(*rng.uniform(0, 20, 3)), rng.uniform(0.5, 4))
+        
+        for point in rng.uniform(-5, 25, (200, 3)):
+            found = navmesh.nearest_node_id(Point3(*point))
+            expected = _brute_nearest(navmesh, point)
+            assert navmesh.walkable[found]
+            assert _nearest_distance(navmesh, found, point) == pytest.approx(
+                _nearest_distance(navmesh, expected, point))
+    
+    def test_irregular_matches_linear_scan(self):
+        """Test the spatial hash agrees with a scan and tracks walkability."""
+        navmesh = NavigationMesh()
+        rng = np.random.default_rng(2)
+        for center in rng.uniform(-30, 30, (400, 3)):
+            navmesh.add_node(Point3(*center), 0.5)
+        points = rng.uniform(-40, 40, (100, 3))
+        
+        for point in points:
+            assert navmesh.nearest_node_id(Point3(*point)) == _brute_nearest(navmesh, point)
+        index = navmesh._spatial_index
+        assert isinstance(index, NavMeshSpatialIndex)
+        
+        # Incremental updates keep the same index object
+        navmesh.set_walkable(rng.choice(400, 150, replace=False), False)
+        navmesh.mark_obstacle(Point3(0, 0, 0), 10.0)
+        navmesh.set_walkable([0, 1, 2], True)
+        assert navmesh._spatial_index is index
+        assert index.count == int(navmesh.walkable.sum())
+        for point in points:
+            assert navmesh.nearest_node_id(Point3(*point)) == _brute_nearest(navmesh, point)
+    
+    def test_blocked_cell_falls_back_to_neighbors(self):
+        """Test a position inside an obstacle snaps to the closest open cell."""
+        navmesh = _grid((5, 5, 1))
+        navmesh.mark_obstacle(Point3(2, 2, 0), 0.6)
+        node = navmesh.find_nearest_node(Point3(2.1, 2.4, 0))
+        assert node.center == Point3(3, 3, 0)
+    
+    def test_no_walkable_nodes(self):
+        """Test lookups fail cleanly when everything is blocked."""
+        navmesh = _grid((3, 3, 1))
+        navmesh.set_walkable(np.arange(9), False)
+        assert navmesh.find_nearest_node(Point3(1, 1, 0)) is None
+        assert navmesh.find_path(Point3(0, 0, 0), Point3(2, 2, 0)) == []
+
+
+class TestPathfinding:
+    """Test A* over node ids."""
+    
+    def test_path_format(self):
+        """Test paths run start, node centers after the start node, goal."""
+        navmesh = _grid()
+        path = navmesh.find_path(Point3(0.1, 0, 0), Point3(3, 0.1, 0))
+        
+        assert path[0] == Point3(0.1, 0, 0)
+        assert path[-1] == Point3(3, 0.1, 0)
+        assert path[1:-1] == [Point3(1, 0, 0), Point3(2, 0, 0), Point3(3, 0, 0)]
+    
+    def test_routes_around_walls(self):
+        """Test the path detours through the gap in a wall."""
+        navmesh = _grid()
+        for y in range(9):
+            navmesh.mark_obstacle(Point3(5, y, 0), 0.1)
+        
+        path = navmesh.find_path(Point3(0, 0, 0), Point3(9, 0, 0))
+        assert Point3(5, 9, 0) in path
+        for point in path[1:-1]:
+            node_id = navmesh.nearest_node_id(point)
+            assert navmesh.walkable[node_id]
+    
+    def test_unreachable_goal(self):
+        """Test a sealed-off goal yields no path."""
+        navmesh = _grid()
+        for y in range(10):
+            navmesh.mark_obstacle(Point3(5, y, 0), 0.1)
+        assert navmesh.find_path(Point3(0, 0, 0), Point3(9, 0, 0)) == []
+    
+    def test_costs_steer_path(self):
+        """Test expensive nodes are avoided when a cheaper detour exists."""
+        navmesh = _grid((3, 3, 1))
+        navmesh.set_cost([navmesh.nearest_node_id(Point3(1, 0, 0))], 10.0)
+        
+        path = navmesh.find_path(Point3(0, 0, 0), Point3(2, 0, 0))
+        assert Point3(1, 0, 0) not in path
+
+
+def _path_cost(navmesh, ids):
+    centers = navmesh.centers.astype(np.float64)
+    return sum(math.dist(centers[a], centers[b]) * navmesh.costs[b] for a, b in zip(ids, ids[1:]))
+
+
+def _walled_grid():
+    """48x48 grid with a wall at x=24 open only near both ends."""
+    navmesh = _grid((48, 48, 1))
+    wall = [navmesh.nearest_node_id(Point3(24, y, 0)) for y in range(3, 45)]
+    navmesh.set_walkable(wall, False)
+    return navmesh
+
+
+class TestHierarchicalPathfinding:
+    """Test HPA* over grid clusters."""
+    
+    def test_requires_grid(self):
+        """Test irregular meshes are rejected."""
+        navmesh = NavigationMesh()
+        navmesh.add_node(Point3(0, 0, 0), 1.0)
+        with pytest.raises(ValueError):
+            NavMeshHierarchy(navmesh)
+    
+    def test_entrances_follow_open_patches(self):
+        """Test one entrance per open run of a cluster face."""
+        navmesh = _grid((8, 4, 1))
+        navmesh.set_walkable([navmesh.nearest_node_id(Point3(3, 1, 0))], False)
+        hierarchy = NavMeshHierarchy(navmesh, (4, 4, 1))
+        
+        # Face x=3|4 has open cells at y=0 and y=2..3: two patches
+        assert hierarchy.get_stats()["entrances"] == 4
+    
+    def test_near_optimal_with_fewer_expansions(self):
+        """Test abstract search expands far fewer nodes than flat A*."""
+        navmesh = _walled_grid()
+        hierarchy = navmesh.enable_hierarchy((8, 8, 1))
+        start = navmesh.nearest_node_id(Point3(2, 24, 0))
+        goal = navmesh.nearest_node_id(Point3(46, 24, 0))
+        
+        flat = navmesh.find_path_ids(start, goal)
+        ids = hierarchy.plan(start, goal).refine_all()
+        
+        assert ids[0] == start and ids[-1] == goal
+        assert all(navmesh.walkable[ids])
+        assert all(b in navmesh.neighbor_ids(a) for a, b in zip(ids, ids[1:]))
+        assert _path_cost(navmesh, ids) <= 1.1 * _path_cost(navmesh, flat)
+        assert hierarchy.last_expansions * 5 < navmesh.last_expansions
+    
+    def test_unreachable_goal(self):
+        """Test a sealed goal cluster yields no plan."""
+        navmesh = _grid((16, 16, 1))
+        navmesh.set_walkable([navmesh.nearest_node_id(Point3(8, y, 0)) for y in range(16)], False)
+        hierarchy = navmesh.enable_hierarchy((4, 4, 1))
+        assert hierarchy.plan(0, navmesh.nearest_node_id(Point3(15, 15, 0))) is None
+    
+    def test_same_cluster_path(self):
+        """Test start and goal in one cluster use the direct local route."""
+        navmesh = _grid((16, 16, 1))
+        navmesh.enable_hierarchy((8, 8, 1))
+        plan = navmesh.find_hierarchical_path(Point3(1, 1, 0), Point3(4, 1, 0))
+        
+        assert plan.waypoints == [navmesh.nearest_node_id(Point3(1, 1, 0)), navmesh.nearest_node_id(Point3(4, 1, 0))]
+        assert plan.to_points() == navmesh.find_path(Point3(1, 1, 0), Point3(4, 1, 0))
+    
+    def test_invalidation_is_per_cluster(self):
+        """Test obstacles drop only the touched clusters' cached costs."""
+        navmesh = _grid((32, 32, 1))
+        hierarchy = navmesh.enable_hierarchy((8, 8, 1))
+        hierarchy.plan(0, navmesh.node_count - 1).refine_all()
+        cached = hierarchy.get_stats()["cached_clusters"]
+        assert cached > 2
+        
+        # Interior of one cluster: its faces are unchanged
+        navmesh.mark_obstacle(Point3(12, 12, 0), 0.1)
+        stats = hierarchy.get_stats()
+        assert stats["invalidated_clusters"] == 1
+        assert stats["cached_clusters"] >= cached - 1
+        assert stats["rebuilds"] == 1
+    
+    def test_refinement_replans_after_change(self):
+        """Test a blocked abstract edge is re-planned when refined."""
+        navmesh = _grid((24, 8, 1))
+        hierarchy = navmesh.enable_hierarchy((8, 8, 1))
+        start = navmesh.nearest_node_id(Point3(0, 4, 0))
+        goal = navmesh.nearest_node_id(Point3(23, 4, 0))
+        plan = hierarchy.plan(start, goal)
+        plan.refine_next()
+        
+        # Wall off the middle cluster except its top row
+        navmesh.set_walkable([navmesh.nearest_node_id(Point3(12, y, 0)) for y in range(7)], False)
+        ids = plan.refine_all()
+        
+        assert ids[-1] == goal
+        assert all(navmesh.walkable[ids])
+        assert navmesh.nearest_node_id(Point3(12, 7, 0)) in ids
+    
+    def test_regenerated_grid_rebuilds(self):
+        """Test structural changes rebuild the hierarchy lazily."""
+        navmesh = _grid((16, 16, 1))
+        hierarchy = navmesh.enable_hierarchy((8, 8, 1))
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(24, 16, 1))
+        
+        assert hierarchy.plan(0, navmesh.node_count - 1).refine_all()[-1] == navmesh.node_count - 1
+        assert hierarchy.get_stats()["rebuilds"] == 2
+        assert hierarchy.cluster_count == 6
+    
+    def test_agent_refines_lazily(self):
+        """Test agents extend their path a segment at a time."""
+        navmesh = _walled_grid()
+        navmesh.enable_hierarchy((8, 8, 1))
+        agent = AIAgent("walker", NodePath("walker"), navmesh)
+        agent.max_speed = agent.acceleration = 20.0
+        agent.stopping_distance = 0.6
+        agent.position = Point3(2, 24, 0)
+        agent.set_target(Point3(46, 24, 0))
+        
+        assert not agent.hierarchical_path.complete
+        initial = len(agent.path)
+        
+        for _ in range(5000):
+            agent.move_to_next_waypoint(1 / 30)
+            if agent.current_path_index >= len(agent.path):
+                break
+        assert len(agent.path) > initial
+        assert agent.hierarchical_path.complete
+        assert agent.path[-1] == Point3(46, 24, 0)
+        assert (agent.position - Point3(46, 24, 0)).length() < 1.0
+
+
+class TestFlowField:
+    """Test shared flow fields."""
+    
+    def test_integration_matches_astar(self):
+        """Test field costs and next-node chains equal A* routes."""
+        navmesh = _walled_grid()
+        rng = np.random.default_rng(3)
+        navmesh.set_cost(rng.choice(navmesh.node_count, 200), 4.0)
+        goal = navmesh.nearest_node_id(Point3(40, 10, 0))
+        field = FlowField(navmesh, goal)
+        
+        for start in rng.choice(np.flatnonzero(navmesh.walkable), 10).tolist():
+            expected = _path_cost(navmesh, navmesh.find_path_ids(start, goal))
+            assert field.integration[start] == pytest.approx(expected, abs=1e-4)
+            
+            chain = [start]
+            while chain[-1] != goal:
+                chain.append(int(field.next_node[chain[-1]]))
+            assert _path_cost(navmesh, chain) == pytest.approx(expected, abs=1e-4)
+    
+    def test_heap_fallback_matches_scipy(self, monkeypatch):
+        """Test the heap sweep used without scipy gives the same field."""
+        pytest.importorskip("scipy")
+        navmesh = _walled_grid()
+        rng = np.random.default_rng(5)
+        navmesh.set_cost(rng.choice(navmesh.node_count, 200), 3.0)
+        goal = navmesh.nearest_node_id(Point3(40, 10, 0))
+        reference = FlowField(navmesh, goal)
+        
+        monkeypatch.setattr(ai_system, "SCIPY_AVAILABLE", False)
+        field = FlowField(navmesh, goal)
+        np.testing.assert_allclose(field.integration, reference.integration)
+        np.testing.assert_array_equal(field.next_node, reference.next_node)
+    
+    def test_unreachable_nodes(self):
+        """Test sealed-off nodes have no direction."""
+        navmesh = _grid()
+        for y in range(10):
+            navmesh.mark_obstacle(Point3(5, y, 0), 0.1)
+        field = FlowField(navmesh, navmesh.nearest_node_id(Point3(9, 0, 0)))
+        
+        far = navmesh.nearest_node_id(Point3(0, 0, 0))
+        assert not field.reachable(far)
+        assert field.next_node[far] == -1
+        np.testing.assert_array_equal(field.directions(np.array([[0, 0, 0]])), [[0, 0, 0]])
+    
+    def test_irregular_mesh(self):
+        """Test fields work on add_node/connect_nodes meshes."""
+        navmesh = NavigationMesh()
+        ids = [navmesh.add_node(Point3(x, 0, 0), 0.5) for x in range(4)]
+        for a, b in zip(ids, ids[1:]):
+            navmesh.connect_nodes(a, b)
+        field = FlowField(navmesh, ids[-1])
+        
+        np.testing.assert_allclose(field.integration, [3, 2, 1, 0])
+        np.testing.assert_allclose(field.directions(np.array([[0.2, 0, 0]])), [[1, 0, 0]])
+    
+    def test_isolated_last_node(self):
+        """Test edgeless nodes at the end of the mesh leave other rows intact."""
+        navmesh = NavigationMesh()
+        a, x, d, c = [navmesh.add_node(Point3(i, 0, 0), 0.5) for i in range(4)]
+        navmesh.connect_nodes(x, d)
+        navmesh.connect_nodes(a, d)
+        field = FlowField(navmesh, x)
+        
+        np.testing.assert_allclose(field.integration, [3, 0, 1, np.inf])
+        assert field.next_node.tolist() == [d, -1, x, -1]
+        assert navmesh.find_path_ids(d, x) == [d, x]
+    
+    def test_cache_by_goal_node(self):
+        """Test goals in one node share a field until the mesh changes."""
+        navmesh = _grid()
+        cache = FlowFieldCache(navmesh, max_fields=2)
+        field = cache.get(Point3(5, 5, 0))
+        
+        assert cache.get(Point3(5.2, 4.9, 0)) is field
+        navmesh.mark_obstacle(Point3(2, 2, 0), 0.1)
+        assert cache.get(Point3(5, 5, 0)) is not field
+        cache.get(Point3(1, 1, 0))
+        cache.get(Point3(8, 8, 0))
+        assert cache.get_stats() == {"hits": 1, "misses": 3, "rebuilds": 1, "patched": 0, "fields": 2}
+    
+    def test_crowd_shares_one_field(self):
+        """Test many chasing agents reach the target from one field."""
+        system = AISystem(None)
+        navmesh = system.create_navmesh(cell_size=1.0)
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(16, 16, 1))
+        for y in range(12):
+            navmesh.mark_obstacle(Point3(8, y, 0), 0.1)
+        target = Point3(14, 2, 0)
+        tree = create_flow_chase_behavior(lambda agent: target, system)
+        
+        agents = []
+        for i in range(20):
+            agent = system.create_agent(f"zombie{i}", NodePath(f"zombie{i}"))
+            agent.node_path.set_pos(i % 4, i // 4, 0)
+            agent.max_speed = agent.acceleration = 10.0
+            agent.set_behavior_tree(tree)
+            agents.append(agent)
+        
+        for _ in range(300):
+            system.update(1 / 30)
+        
+        assert system.get_state()["flow_fields"]["misses"] == 1
+        for agent in agents:
+            assert (agent.position - target).length() < 1.0
+    
+    def test_follow_reports_failure(self):
+        """Test agents fail to follow toward an unreachable goal."""
+        navmesh = _grid()
+        for y in range(10):
+            navmesh.mark_obstacle(Point3(5, y, 0), 0.1)
+        field = FlowField(navmesh, navmesh.nearest_node_id(Point3(9, 0, 0)))
+        agent = AIAgent("walker", NodePath("walker"), navmesh)
+        assert agent.follow_flow_field(field, 0.1) == NodeStatus.FAILURE
+
+
+class TestPathRequests:
+    """Test the asynchronous path request service."""
+    
+    def test_resumable_search_matches_astar(self):
+        """Test a search split into small steps finds the A* path."""
+        navmesh = _walled_grid()
+        start, goal = 0, navmesh.node_count - 1
+        search = PathSearch(navmesh._search_lists(), start, goal)
+        steps = 0
+        while not search.done:
+            assert search.step(50) <= 50
+            steps += 1
+        
+        assert steps > 1
+        assert search.path == navmesh.find_path_ids(start, goal)
+    
+    def test_budget_keeps_frames_flat(self):
+        """Test 200 simultaneous requests never exceed the frame budget."""
+        navmesh = _walled_grid()
+        service = PathRequestService(navmesh, expansion_budget=500)
+        rng = np.random.default_rng(0)
+        walkable = np.flatnonzero(navmesh.walkable)
+        futures = [service.request(int(a), int(b)) for a, b in rng.choice(walkable, (200, 2))]
+        
+        frames = 0
+        while service.pending_count:
+            assert service.update() <= 500
+            frames += 1
+        assert frames > 1
+        assert all(f.done() for f in futures)
+    
+    def test_deduplication(self):
+        """Test identical requests share one search and one future."""
+        navmesh = _grid()
+        service = PathRequestService(navmesh)
+        first = service.request(0, 99)
+        assert service.request(0, 99) is first
+        service.update()
+        
+        assert first.result() == navmesh.find_path_ids(0, 99)
+        assert service.get_stats()["deduplicated"] == 1
+        assert service.get_stats()["completed"] == 1
+    
+    def test_priority_order(self):
+        """Test lower priority values are served first."""
+        navmesh = _walled_grid()
+        service = PathRequestService(navmesh, expansion_budget=1)
+        finished = []
+        background = service.request(0, navmesh.node_count - 1, priority=1)
+        visible = service.request(1, navmesh.node_count - 2, priority=0)
+        background.add_done_callback(lambda f: finished.append("background"))
+        visible.add_done_callback(lambda f: finished.append("visible"))
+        service.wait()
+        
+        assert finished == ["visible", "background"]
+    
+    def test_worker_thread(self):
+        """Test thread searches use a snapshot and resolve on update()."""
+        navmesh = _walled_grid()
+        service = PathRequestService(navmesh, use_thread=True)
+        threads = []
+        try:
+            future = service.request(0, navmesh.node_count - 1)
+            future.add_done_callback(lambda f: threads.append(threading.current_thread()))
+            service.wait(timeout=10.0)
+        finally:
+            service.shutdown()
+        
+        assert future.result() == navmesh.find_path_ids(0, navmesh.node_count - 1)
+        assert threads == [threading.main_thread()]
+    
+    @pytest.mark.parametrize("use_thread", [False, True])
+    def test_restarts_after_navmesh_edit(self, use_thread):
+        """Test searches overtaken by walkability edits never resolve blocked paths."""
+        navmesh = _grid((30, 30, 1))
+        navmesh.path_cache = None
+        service = PathRequestService(navmesh, expansion_budget=10, use_thread=use_thread)
+        try:
+            future = service.request(navmesh.nearest_node_id(Point3(0, 15, 0)),
+                                     navmesh.nearest_node_id(Point3(29, 15, 0)))
+            service.update()
+            assert not future.done()
+            # Wall across the cells already expanded (x = 3..7), with a gap at y = 0
+            navmesh.set_walkable([navmesh.nearest_node_id(Point3(x, y, 0)) for x in range(3, 8)
+                                  for y in range(1, 30)], False)
+            service.wait(timeout=10.0)
+        finally:
+            service.shutdown()
+        
+        path = future.result()
+        assert path and navmesh.walkable[path].all()
+        assert navmesh.nearest_node_id(Point3(5, 0, 0)) in path
+        assert service.get_stats()["restarts"] >= 1
+    
+    def test_snapshot_is_immutable(self):
+        """Test snapshots keep the walkability they were taken with."""
+        navmesh = _grid()
+        snapshot = navmesh.snapshot()
+        navmesh.set_walkable([5], False)
+        
+        assert snapshot[3][5] == 1
+        assert navmesh.snapshot()[3][5] == 0
+    
+    def test_agents_receive_paths(self):
+        """Test agents wait for queued paths, then follow them."""
+        system = AISystem(None)
+        navmesh = system.create_navmesh(cell_size=1.0)
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(10, 10, 1))
+        system.enable_path_requests(expansion_budget=5)
+        agent = system.create_agent("walker", NodePath("walker"))
+        agent.set_target(Point3(9, 9, 0))
+        
+        assert agent.path_pending and agent.path == []
+        assert agent.move_to_next_waypoint(0.1) == NodeStatus.RUNNING
+        for _ in range(20):
+            system.update(0.0)
+        
+        assert not agent.path_pending
+        assert agent.path[-1] == Point3(9, 9, 0)
+        assert len(agent.path) == len(navmesh.find_path(Point3(0, 0, 0), Point3(9, 9, 0)))
+        assert system.get_state()["path_requests"]["completed"] == 1
+
+
+def _perception_crowd(count=120, extent=80.0, seed=0):
+    system = AISystem(None)
+    system.create_navmesh()
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        agent = system.create_agent(f"agent{i}", NodePath(f"agent{i}"))
+        x, y = rng.uniform(0, extent, 2)
+        agent.position = Point3(x, y, 0)
+        agent.node_path.set_h(rng.uniform(0, 360))
+        agent.vision_range = rng.uniform(5, 25)
+    return system
+
+
+def _visible_reference(agent, agents):
+    """The original arccos-based cone test."""
+    forward = agent.node_path.get_quat().get_forward()
+    visible = []
+    for other in agents:
+        if other is agent:
+            continue
+        offset = other.position - agent.position
+        if offset.length() > agent.vision_range:
+            continue
+        offset.normalize()
+        if np.degrees(np.arccos(np.clip(forward.dot(offset), -1, 1))) <= agent.vision_angle / 2:
+            visible.append(other)
+    return visible
+
+
+class TestPerception:
+    """Test perception queries through the agent spatial hash."""
+    
+    def test_matches_all_pairs_scan(self):
+        """Test hashed perception sees exactly what the full scan sees."""
+        system = _perception_crowd()
+        system.agent_index.rebuild(system.agents)
+        for agent in system.agents:
+            agent.update_perception(system.agents, spatial_index=system.agent_index)
+            assert set(agent.visible_agents) == set(_visible_reference(agent, system.agents))
+    
+    def test_query_is_local(self):
+        """Test queries return only agents from nearby cells."""
+        system = _perception_crowd(count=200, extent=200.0)
+        index = AgentSpatialHash(cell_size=10.0)
+        index.rebuild(system.agents)
+        center = Point3(100, 100, 0)
+        candidates = index.query(center, 10.0)
+        
+        assert len(candidates) < len(system.agents) // 4
+        for agent in system.agents:
+            if (agent.position - center).length() <= 10.0:
+                assert agent in candidates
+    
+    def test_vision_angle_changes(self):
+        """Test the cached cone cosine follows vision_angle."""
+        system = _perception_crowd(count=2)
+        viewer, other = system.agents
+        viewer.position = Point3(0, 0, 0)
+        viewer.node_path.set_h(0)  # facing +y
+        other.position = Point3(5, 5, 0)  # 45 degrees off forward
+        viewer.vision_range = 20.0
+        
+        viewer.vision_angle = 80.0
+        viewer.update_perception(system.agents)
+        assert viewer.visible_agents == []
+        viewer.vision_angle = 100.0
+        viewer.update_perception(system.agents)
+        assert viewer.visible_agents == [other]
+    
+    def test_system_update_uses_index(self):
+        """Test AISystem.update rebuilds the index once per frame."""
+        system = _perception_crowd(count=30, extent=30.0)
+        for agent in system.agents:
+            agent.node_path.set_pos(agent.position)
+        system.update(0.0)
+        
+        for agent in system.agents:
+            assert set(agent.visible_agents) == set(_visible_reference(agent, system.agents))
+
+
+class TestBatchPerception:
+    """Test the vectorized perception kernel."""
+    
+    def test_matches_per_agent_perception(self):
+        """Test batch results equal the per-agent reference, in order."""
+        system = _perception_crowd(count=150)
+        system.update_perception_batch()
+        
+        for agent in system.agents:
+            reference = _visible_reference(agent, system.agents)
+            assert agent.visible_agents == reference
+        assert system.perception_stats["in_cone"] == sum(len(a.visible_agents) for a in system.agents)
+    
+    def test_line_of_sight_blocks_pairs(self):
+        """Test walls drop pairs and each symmetric pair costs one ray."""
+        system = _perception_crowd(count=3)
+        left, right, beside = system.agents
+        left.position, right.position, beside.position = Point3(-5, 0, 0), Point3(5, 0, 0), Point3(-5, 3, 0)
+        left.node_path.set_h(-90)  # facing +x
+        right.node_path.set_h(90)  # facing -x
+        beside.node_path.set_h(180)  # facing -y
+        for agent in system.agents:
+            agent.vision_range = 20.0
+        
+        physics = PhysicsManager()
+        wall = NodePath(physics.create_box("wall", (0.5, 2, 5), mass=0))
+        wall.set_pos(0, 0, 0)
+        
+        system.update_perception_batch()
+        assert right in left.visible_agents and left in right.visible_agents
+        
+        system.update_perception_batch(physics)
+        assert left.visible_agents == [] and right.visible_agents == []
+        assert beside.visible_agents == [left]
+        # left<->right share a ray; beside->left and right->beside add one each
+        assert system.perception_stats["in_cone"] == 4
+        assert system.perception_stats["rays"] == 3
+    
+    def test_raycast_batch(self):
+        """Test PhysicsManager.raycast_batch reports hits per ray."""
+        physics = PhysicsManager()
+        physics.create_box("wall", (0.5, 2, 5), mass=0)
+        hits = physics.raycast_batch(np.array([[-5, 0, 0], [-5, 10, 0]]), np.array([[5, 0, 0], [5, 10, 0]]))
+        np.testing.assert_array_equal(hits, [True, False])
+    
+    def test_system_update_uses_batch(self):
+        """Test AISystem.update runs the kernel when enabled."""
+        system = _perception_crowd(count=40, extent=30.0)
+        for agent in system.agents:
+            agent.node_path.set_pos(agent.position)
+        system.batch_perception = True
+        system.update(0.0)
+        
+        assert system.perception_stats["candidates"] > 0
+        for agent in system.agents:
+            assert agent.visible_agents == _visible_reference(agent, system.agents)
+
+
+def _lod_system(distances):
+    """System whose agents stand at the given distances from the viewer."""
+    system = AISystem(None)
+    system.create_navmesh()
+    system.enable_lod()
+    system.viewer_position = Point3(0, 0, 0)
+    for i, distance in enumerate(distances):
+        agent = system.create_agent(f"agent{i}", NodePath(f"agent{i}"))
+        agent.node_path.set_pos(distance, 0, 0)
+        agent.position = agent.node_path.get_pos()
+    return system
+
+
+class TestLODScheduler:
+    """Test AI level-of-detail tick scheduling."""
+    
+    def test_buckets(self):
+        """Test distance bands, with off-screen agents one band lower."""
+        scheduler = AILODScheduler()
+        assert scheduler.bucket_for(10, True) == 0
+        assert scheduler.bucket_for(50, True) == 1
+        assert scheduler.bucket_for(200, True) == 2
+        assert scheduler.bucket_for(10, False) == 1
+        assert scheduler.bucket_for(50, False) == 2
+    
+    def test_tick_rates_and_dt_accumulation(self):
+        """Test far agents tick less often with the skipped time as dt."""
+        system = _lod_system([5, 50, 200])
+        ticks = {agent.name: [] for agent in system.agents}
+        for agent in system.agents:
+            agent.update = lambda dt, name=agent.name: ticks[name].append(dt)
+        
+        for _ in range(120):
+            system.update(1 / 60)
+        
+        assert len(ticks["agent0"]) == 120
+        assert 19 <= len(ticks["agent1"]) <= 21
+        assert 4 <= len(ticks["agent2"]) <= 5
+        for name, dts in ticks.items():
+            assert sum(dts) == pytest.approx(2.0, abs=0.55)
+        assert max(ticks["agent2"]) == pytest.approx(0.5, abs=0.02)
+    
+    def test_ticks_are_staggered(self):
+        """Test a bucket of agents spreads its ticks across frames."""
+        system = _lod_system([200] * 60)
+        per_frame = []
+        for _ in range(60):
+            system.update(1 / 60)
+            per_frame.append(system.lod_scheduler.ticked)
+        
+        assert sum(per_frame) >= 60
+        assert max(per_frame) <= 6
+    
+    def test_batch_perception_follows_schedule(self):
+        """Test batch perception only runs for the agents due this frame."""
+        system = _lod_system([5, 6, 200])
+        system.batch_perception = True
+        near, beside, far = system.agents
+        near.node_path.set_h(-90)  # facing +x, toward beside
+        looked = {agent.name: 0 for agent in system.agents}
+        
+        for _ in range(120):
+            for agent in system.agents:
+                agent.visible_agents[:] = ["stale"]
+            system.update(1 / 60)
+            for agent in system.agents:
+                looked[agent.name] += "stale" not in agent.visible_agents
+            assert near.visible_agents == [beside]
+        
+        assert looked["agent0"] == looked["agent1"] == 120
+        assert 4 <= looked["agent2"] <= 5
+    
+    def test_state_reports_buckets_and_time(self):
+        """Test bucket counts and AI time are exposed."""
+        system = _lod_system([5, 5, 50, 200])
+        system.update(1 / 60)
+        state = system.get_state()
+        
+        assert state["lod"] == {"full": 2, "medium": 1, "low": 1, "ticked": 2}
+        assert state["update_ms"] > 0
+        assert state["peak_update_ms"] >= state["update_ms"]
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if not value:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def _field(number, payload):
+    """Length-delimited protobuf field."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _int_field(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _value_info(name, dims):
+    shape = b"".join(_field(1, _field(2, d) if isinstance(d, str) else _int_field(1, d)) for d in dims)
+    return _field(1, name) + _field(2, _field(1, _int_field(1, 1) + _field(2, shape)))
+
+
+def _initializer(name, array):
+    array = np.asarray(array, dtype=np.float32)
+    return (b"".join(_int_field(1, d) for d in array.shape) + _int_field(2, 1)
+            + _field(8, name) + _field(9, array.tobytes()))
+
+
+def _write_linear_model(path, weights, bias):
+    """ONNX model y = x @ weights + bias with a dynamic batch dimension.
+    
+    Encoded by hand (protobuf wire format) so only onnxruntime is needed.
+    """
+    features, outputs = np.shape(weights)
+    nodes = (_field(1, _field(1, "x") + _field(1, "W") + _field(2, "xw") + _field(4, "MatMul"))
+             + _field(1, _field(1, "xw") + _field(1, "b") + _field(2, "y") + _field(4, "Add")))
+    graph = (nodes + _field(2, "linear")
+             + _field(5, _initializer("W", weights)) + _field(5, _initializer("b", bias))
+             + _field(11, _value_info("x", ["N", features])) + _field(12, _value_info("y", ["N", outputs])))
+    with open(path, "wb") as f:
+        f.write(_int_field(1, 7) + _field(7, graph) + _field(8, _field(1, "") + _int_field(2, 13)))
+
+
+WEIGHTS = np.arange(8, dtype=np.float32).reshape(4, 2) / 10
+BIAS = np.array([1.0, -1.0], dtype=np.float32)
+
+
+@pytest.fixture
+def linear_system(tmp_path):
+    pytest.importorskip("onnxruntime")
+    path = tmp_path / "linear.onnx"
+    _write_linear_model(path, WEIGHTS, BIAS)
+    system = AISystem(None)
+    system.load_ml_model("policy", str(path))
+    return system, path
+
+
+class TestBatchInference:
+    """Test the batching inference service."""
+    
+    def test_one_run_per_frame(self, linear_system):
+        """Test submissions are stacked into one run and scattered back."""
+        system, _ = linear_system
+        service = system.enable_batch_inference()
+        features = np.random.default_rng(0).random((50, 4), dtype=np.float32)
+        futures = [service.submit("policy", row) for row in features]
+        assert not any(f.done() for f in futures)
+        
+        assert service.update() == 50
+        expected = features @ WEIGHTS + BIAS
+        for future, row in zip(futures, expected):
+            np.testing.assert_allclose(future.result(), row, rtol=1e-5)
+        assert service.get_report()["policy"]["batches"] == 1
+    
+    def test_max_batch_splits(self, linear_system):
+        """Test queues longer than max_batch run in several batches."""
+        system, _ = linear_system
+        service = system.enable_batch_inference(max_batch=16)
+        for row in np.zeros((40, 4), dtype=np.float32):
+            service.submit("policy", row)
+        service.flush()
+        
+        report = service.get_report()["policy"]
+        assert report["batches"] == 3 and report["rows"] == 40
+        assert report["mean_batch"] == pytest.approx(40 / 3)
+        assert report["rows_per_second"] > 0
+    
+    def test_latency_window(self, linear_system):
+        """Test queues wait for max_latency_ms before running."""
+        system, _ = linear_system
+        service = system.enable_batch_inference(max_latency_ms=10_000)
+        service.submit("policy", np.zeros(4, dtype=np.float32))
+        assert service.update() == 0 and service.pending() == 1
+        
+        service.max_latency_ms = 0
+        assert service.update() == 1
+    
+    def test_session_options(self, linear_system):
+        """Test thread counts and IO binding give identical results."""
+        system, path = linear_system
+        system.load_ml_model("bound", str(path), intra_op_threads=1, inter_op_threads=1, use_io_binding=True)
+        x = np.random.default_rng(1).random((8, 4), dtype=np.float32)
+        
+        np.testing.assert_allclose(system.run_inference("bound", x), system.run_inference("policy", x), rtol=1e-6)
+        assert system.ml_models["bound"]["session"].get_session_options().intra_op_num_threads == 1
+    
+    def test_agents_submit_during_tick(self, linear_system):
+        """Test behaviors submit in their tick and AISystem.update flushes."""
+        system, _ = linear_system
+        system.enable_batch_inference()
+        results = {}
+        
+        def decide(agent, dt):
+            features = np.full(4, len(agent.name), dtype=np.float32)
+            system.inference.submit("policy", features, lambda out, name=agent.name: results.update({name: out}))
+            return NodeStatus.SUCCESS
+        
+        tree = BehaviorTree(ActionNode("Decide", decide))
+        for name in ("a", "bb", "ccc"):
+            system.create_agent(name, NodePath(name)).set_behavior_tree(tree)
+        system.update(0.0)
+        
+        assert sorted(results) == ["a", "bb", "ccc"]
+        np.testing.assert_allclose(results["bb"], np.full(4, 2.0) @ WEIGHTS + BIAS, rtol=1e-5)
+        assert system.get_state()["inference"]["policy"]["batches"] == 1
+    
+    def test_bad_features(self, linear_system):
+        """Test mismatched vectors are rejected and failed batches resolve every future."""
+        system, _ = linear_system
+        service = system.enable_batch_inference()
+        good = service.submit("policy", np.zeros(4, dtype=np.float32))
+        with pytest.raises(ValueError):
+            service.submit("policy", np.zeros(3, dtype=np.float32))
+        assert service.update() == 1 and good.result().shape == (2,)
+        
+        # Stacking fails after the queue was taken: every future still gets the error
+        futures = [service.submit("policy", np.zeros(4, dtype=np.float32)) for _ in range(2)]
+        futures.append(service.submit("policy", np.array(["a", "b", "c", "d"])))
+        system.update(0.0)
+        assert all(isinstance(f.exception(timeout=0), Exception) for f in futures)
+        assert service.pending() == 0
+    
+    def test_unknown_model(self, linear_system):
+        """Test submitting to an unloaded model raises."""
+        system, _ = linear_system
+        with pytest.raises(ValueError):
+            system.enable_batch_inference().submit("missing", np.zeros(4))
+
+
+def _random_tree(rng, depth=0):
+    """Random tree whose leaves log their calls and replay a fixed script."""
+    kind = rng.choice(["seq", "sel", "par", "inv", "rep", "cond", "act"] if depth < 4 else ["cond", "act"])
+    name = f"{kind}{rng.randrange(10 ** 6)}"
+    if kind in ("seq", "sel"):
+        children = [_random_tree(rng, depth + 1) for _ in range(rng.randrange(4))]
+        return (SequenceNode if kind == "seq" else SelectorNode)(name, children)
+    if kind == "par":
+        return ParallelNode(name, rng.random() < 0.5, [_random_tree(rng, depth + 1) for _ in range(rng.randrange(4))])
+    if kind == "inv":
+        return InverterNode(name, _random_tree(rng, depth + 1))
+    if kind == "rep":
+        return RepeaterNode(name, _random_tree(rng, depth + 1), count=rng.choice([-1, 1, 2, 3]))
+    
+    script = [rng.random() for _ in range(64)]
+    
+    def outcome(log):
+        calls = log.count(name)
+        log.append(name)
+        return script[calls % len(script)]
+    
+    if kind == "cond":
+        return ConditionNode(name, lambda log: outcome(log) < 0.5)
+    statuses = (NodeStatus.SUCCESS, NodeStatus.FAILURE, NodeStatus.RUNNING)
+    return ActionNode(name, lambda log, dt: statuses[int(outcome(log) * 3)])
+
+
+class TestCompiledBehaviorTree:
+    """Test flattened behavior tree execution."""
+    
+    def test_matches_object_tree(self):
+        """Test statuses and leaf call order match on random trees."""
+        for seed in range(100):
+            tree = BehaviorTree(_random_tree(random.Random(seed)))
+            compiled = compile_behavior_tree(tree)
+            state = compiled.new_state()
+            object_log, compiled_log = [], []
+            for _ in range(30):
+                assert tree.tick(object_log, 0.1) == compiled.tick(compiled_log, 0.1, state)
+                assert object_log == compiled_log
+    
+    def test_resumes_at_running_leaf(self):
+        """Test a running action is re-entered without re-checking conditions."""
+        checks = []
+        ticks = []
+        
+        def walk(agent, dt):
+            ticks.append(dt)
+            return NodeStatus.RUNNING if len(ticks) < 3 else NodeStatus.SUCCESS
+        
+        compiled = compile_behavior_tree(SequenceNode("Root", [
+            ConditionNode("Ready", lambda agent: checks.append(1) or True),
+            ActionNode("Walk", walk),
+        ]))
+        state = compiled.new_state()
+        
+        assert compiled.tick(None, 0.1, state) == NodeStatus.RUNNING
+        assert state.resume == 2
+        assert compiled.tick(None, 0.1, state) == NodeStatus.RUNNING
+        assert compiled.tick(None, 0.1, state) == NodeStatus.SUCCESS
+        assert len(checks) == 1 and len(ticks) == 3
+        assert state.resume == -1
+    
+    def test_parallel_is_not_resumed(self):
+        """Test leaves under a Parallel are ticked from the root."""
+        compiled = compile_behavior_tree(ParallelNode("Both", True, [
+            ActionNode("A", lambda agent, dt: NodeStatus.RUNNING),
+            ActionNode("B", lambda agent, dt: NodeStatus.SUCCESS),
+        ]))
+        state = compiled.new_state()
+        assert compiled.tick(None, 0.1, state) == NodeStatus.RUNNING
+        assert state.resume == -1
+    
+    def test_agents_have_independent_state(self):
+        """Test one template drives many agents with separate progress."""
+        system = AISystem(None)
+        system.create_navmesh()
+        
+        def step(agent, dt):
+            agent.blackboard["steps"] = agent.blackboard.get("steps", 0) + 1
+            return NodeStatus.SUCCESS if agent.blackboard["steps"] >= agent.blackboard["needed"] else NodeStatus.RUNNING
+        
+        compiled = compile_behavior_tree(SequenceNode("Job", [
+            ActionNode("Work", step),
+            ActionNode("Done", lambda agent, dt: agent.blackboard.update(done=True) or NodeStatus.SUCCESS),
+        ]))
+        agents = []
+        for needed in (1, 3, 5):
+            agent = system.create_agent(f"worker{needed}", NodePath(f"worker{needed}"))
+            agent.blackboard["needed"] = needed
+            agent.set_behavior_tree(compiled)
+            agents.append(agent)
+        
+        for _ in range(3):
+            system.update(0.1)
+        assert [agent.blackboard.get("done", False) for agent in agents] == [True, True, False]
+        assert agents[2].behavior_state.resume >= 0
+    
+    def test_reset(self):
+        """Test reset rewinds composites and the resume point."""
+        compiled = compile_behavior_tree(SequenceNode("Root", [
+            ActionNode("First", lambda agent, dt: NodeStatus.SUCCESS),
+            ActionNode("Wait", lambda agent, dt: NodeStatus.RUNNING),
+        ]))
+        state = compiled.new_state()
+        compiled.tick(None, 0.1, state)
+        compiled.reset(state)
+        
+        assert state.cursor == [0, 0, 0] and state.resume == -1
+
+
+class TestPathCache:
+    """Test the navmesh path cache."""
+    
+    def test_repeat_lookups_hit(self):
+        """Test the same start and goal nodes reuse the cached path."""
+        navmesh = _walled_grid()
+        first = navmesh.find_path(Point3(2, 2, 0), Point3(40, 40, 0))
+        assert navmesh.last_expansions > 0
+        
+        again = navmesh.find_path(Point3(2.2, 1.9, 0), Point3(40, 40, 0))
+        assert navmesh.last_expansions == 0
+        assert again[1:] == first[1:] and again[0] == Point3(2.2, 1.9, 0)
+        assert navmesh.path_cache.get_stats()["hits"] == 1
+    
+    def test_hits_report_cache_mode(self):
+        """Test a cache hit is reported as such, not as the last search mode."""
+        navmesh = _grid((10, 10, 1))
+        navmesh.find_path_ids(0, 99, mode="jps")
+        assert navmesh.last_search_mode == "jps"
+        
+        assert navmesh.find_path_ids(0, 99, mode="astar")
+        assert navmesh.last_search_mode == "cache"
+        assert navmesh.last_expansions == 0
+        
+        navmesh.find_path_ids(0, 98, mode="astar")
+        assert navmesh.last_search_mode == "astar"
+    
+    def test_obstacle_invalidates_crossing_paths_only(self):
+        """Test mark_obstacle drops only the paths through blocked cells."""
+        navmesh = _grid((20, 20, 1))
+        low = navmesh.find_path_ids(navmesh.nearest_node_id(Point3(0, 2, 0)), navmesh.nearest_node_id(Point3(19, 2, 0)))
+        high = navmesh.find_path_ids(navmesh.nearest_node_id(Point3(0, 15, 0)), navmesh.nearest_node_id(Point3(19, 15, 0)))
+        assert len(navmesh.path_cache) == 2
+        
+        navmesh.mark_obstacle(Point3(*navmesh.centers[low[10]]), 0.1)
+        assert len(navmesh.path_cache) == 1
+        assert navmesh.path_cache.get(high[0], high[-1]) == tuple(high)
+        
+        rerouted = navmesh.find_path_ids(low[0], low[-1])
+        assert low[10] not in rerouted
+    
+    def test_unblocking_drops_failures(self):
+        """Test cached 'no path' results are retried after unblocking."""
+        navmesh = _grid()
+        wall = [navmesh.nearest_node_id(Point3(5, y, 0)) for y in range(10)]
+        navmesh.set_walkable(wall, False)
+        assert navmesh.find_path_ids(0, 99) == []
+        assert navmesh.path_cache.get_stats()["entries"] == 1
+        
+        navmesh.set_walkable(wall[:1], True)
+        assert navmesh.find_path_ids(0, 99)[-1] == 99
+    
+    def test_cost_change_invalidates(self):
+        """Test raising a crossed node's cost drops the path."""
+        navmesh = _grid((3, 3, 1))
+        ids = navmesh.find_path_ids(0, 6)
+        navmesh.set_cost([ids[1]], 10.0)
+        assert ids[1] not in navmesh.find_path_ids(0, 6)
+    
+    def test_lru_and_node_cap(self):
+        """Test eviction by entry count and stored node total."""
+        cache = PathCache(max_entries=2, max_nodes=10)
+        cache.put(0, 1, [0, 1])
+        cache.put(0, 2, [0, 5, 2])
+        cache.get(0, 1)
+        cache.put(0, 3, [0, 3])
+        assert cache.get(0, 2) is None and cache.get(0, 1) == (0, 1)
+        
+        cache.put(0, 4, list(range(9)))
+        assert len(cache) == 1 and cache.node_total == 9
+        assert cache.get_stats()["evictions"] == 3
+    
+    def test_regenerate_clears(self):
+        """Test structural changes empty the cache."""
+        navmesh = _grid()
+        navmesh.find_path_ids(0, 99)
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(5, 5, 1))
+        assert len(navmesh.path_cache) == 0
+    
+    def test_patrol_reuses_paths(self):
+        """Test patrol loops hit the cache and stats reach get_state."""
+        system = AISystem(None)
+        navmesh = system.create_navmesh(cell_size=1.0)
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(10, 10, 1))
+        agent = system.create_agent("guard", NodePath("guard"))
+        for _ in range(3):
+            for waypoint in (Point3(8, 8, 0), Point3(0, 0, 0)):
+                agent.position = Point3(8, 8, 0) if waypoint == Point3(0, 0, 0) else Point3(0, 0, 0)
+                agent.set_target(waypoint)
+        
+        stats = system.get_state()["navmesh"]["path_cache"]
+        assert stats["misses"] == 2 and stats["hits"] == 4
+
+
+class TestJumpPointSearch:
+    """Test the JPS search mode."""
+    
+    def _random_grid(self, rng, dims, density):
+        navmesh = NavigationMesh(cell_size=1.0)
+        navmesh.path_cache = None
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(*dims))
+        navmesh.set_walkable([i for i in range(navmesh.node_count) if rng.random() < density], False)
+        return navmesh
+    
+    def test_matches_astar_cost(self):
+        """Test JPS paths are valid and as short as A* on random 2D and 3D grids."""
+        rng = random.Random(7)
+        for _ in range(60):
+            dims = (rng.randint(2, 12), rng.randint(2, 12), rng.choice((1, 1, 3)))
+            navmesh = self._random_grid(rng, dims, rng.choice((0.1, 0.3)))
+            open_ids = np.flatnonzero(navmesh.walkable).tolist()
+            for _ in range(5):
+                start, goal = rng.choice(open_ids), rng.choice(open_ids)
+                reference = navmesh.find_path_ids(start, goal, mode="astar")
+                ids = navmesh.find_path_ids(start, goal, mode="jps")
+                assert navmesh.last_search_mode == "jps"
+                
+                assert bool(ids) == bool(reference)
+                if ids:
+                    assert ids[0] == start and ids[-1] == goal
+                    assert all(b in navmesh.neighbor_ids(a) and navmesh.walkable[b] for a, b in zip(ids, ids[1:]))
+                    assert _path_cost(navmesh, ids) == pytest.approx(_path_cost(navmesh, reference))
+    
+    def test_expands_fewer_nodes(self):
+        """Test open grids need far fewer expansions than A*."""
+        navmesh = _walled_grid()
+        navmesh.path_cache = None
+        start = navmesh.nearest_node_id(Point3(2, 40, 0))
+        goal = navmesh.nearest_node_id(Point3(45, 5, 0))
+        
+        astar = navmesh.find_path_ids(start, goal, mode="astar")
+        astar_expansions = navmesh.last_expansions
+        jps = navmesh.find_path_ids(start, goal, mode="jps")
+        
+        assert _path_cost(navmesh, jps) == pytest.approx(_path_cost(navmesh, astar))
+        assert navmesh.last_expansions * 4 < astar_expansions
+    
+    def test_open_grid_ties_head_for_goal(self):
+        """Test equal-f ties on an empty grid do not flood the rectangle."""
+        navmesh = _grid((64, 64, 1))
+        navmesh.path_cache = None
+        
+        ids = navmesh.find_path_ids(0, navmesh.node_count - 1, mode="jps")
+        assert len(ids) == 127
+        assert navmesh.last_expansions <= 3
+    
+    def test_tables_follow_walkability(self):
+        """Test blocking cells after a search rebuilds the jump tables."""
+        navmesh = _grid((10, 10, 1))
+        navmesh.search_mode = "jps"
+        assert len(navmesh.find_path(Point3(0, 5, 0), Point3(9, 5, 0))) == 11
+        
+        navmesh.set_walkable([navmesh.nearest_node_id(Point3(5, y, 0)) for y in range(1, 10)], False)
+        ids = navmesh.find_path_ids(navmesh.nearest_node_id(Point3(0, 5, 0)), navmesh.nearest_node_id(Point3(9, 5, 0)))
+        assert navmesh.nearest_node_id(Point3(5, 0, 0)) in ids
+    
+    def test_falls_back_to_astar(self):
+        """Test non-uniform costs and extra edges use A*."""
+        navmesh = _grid((6, 6, 1))
+        navmesh.path_cache = None
+        navmesh.find_path_ids(0, 35, mode="jps")
+        assert navmesh.last_search_mode == "jps"
+        
+        navmesh.set_cost([7], 3.0)
+        navmesh.find_path_ids(0, 35, mode="jps")
+        assert navmesh.last_search_mode == "astar"
+        
+        navmesh.set_cost([7], 1.0)
+        navmesh.connect_nodes(0, 35)
+        assert navmesh.find_path_ids(0, 35, mode="jps") == [0, 35]
+        assert navmesh.last_search_mode == "astar"
+    
+    @pytest.mark.parametrize("use_thread", [False, True])
+    def test_path_requests_use_mode(self, use_thread):
+        """Test queued requests run JPS when the navmesh asks for it."""
+        navmesh = _walled_grid()
+        navmesh.search_mode = "jps"
+        start = navmesh.nearest_node_id(Point3(2, 40, 0))
+        goal = navmesh.nearest_node_id(Point3(45, 5, 0))
+        reference = navmesh.find_path_ids(start, goal, mode="astar")
+        
+        service = PathRequestService(navmesh, use_thread=use_thread)
+        future = service.request(start, goal)
+        service.wait(timeout=5.0)
+        service.shutdown()
+        
+        assert navmesh.last_search_mode == "jps"
+        assert _path_cost(navmesh, future.result()) == pytest.approx(_path_cost(navmesh, reference))
+    
+    def test_unknown_mode(self):
+        """Test unknown search modes are rejected."""
+        with pytest.raises(ValueError):
+            _grid().find_path_ids(0, 1, mode="dijkstra")
+    
+    def test_build_tables(self):
+        """Test table entries encode jump points and blocked runs."""
+        walkable = np.ones((3, 5, 1), dtype=np.uint8)
+        walkable[0, 2, 0] = 0  # Wall beside column x=1 ends at y=3 going +y
+        tables = JumpPointSearch.build_tables(walkable.ravel(), (3, 5, 1))
+        
+        assert tables[1][1][5] == 3  # (1, 0) -> forced at (1, 3)
+        assert tables[1][1][0] == -2  # (0, 0) -> wall at (0, 2)
+        assert tables[1][-1][14] == -5  # (2, 4) -> edge
+        assert tables[0][1][3] == 1  # (0, 3) -> (1, 3), which has a jump point along y
+        assert tables[0][-1][11] == 1  # (2, 1) -> (1, 1), from which +y reaches (1, 3)
+        assert JumpPointSearch.build_tables(np.ones(15), (3, 5, 1))[0][-1][11] == -3  # Open: edge
+        assert tables[2][1][0] == -1  # Single-cell axis: edge straight away
+
+
+class TestDynamicObstacles:
+    """Test obstacle handles and dirty-region events."""
+    
+    def _blocked(self, navmesh):
+        return set(np.flatnonzero(navmesh.walkable == 0).tolist())
+    
+    def _cell(self, x, y):
+        """Node id of cell (x, y) on a 10x10x1 grid."""
+        return x * 10 + y
+    
+    def test_box_covers_overlapping_cells(self):
+        """Test grid boxes block the cells they overlap, not the ones they touch."""
+        navmesh = _grid((10, 10, 1))
+        handle = navmesh.add_obstacle(Point3(3, 3, 0), (1.0, 0.5, 0.5))
+        
+        assert self._blocked(navmesh) == {self._cell(x, 3) for x in (2, 3, 4)}
+        assert navmesh.obstacle_count == 1
+        
+        navmesh.remove_obstacle(handle)
+        assert self._blocked(navmesh) == set()
+        assert navmesh.obstacle_count == 0
+    
+    def test_grid_math_matches_scan(self):
+        """Test grid index math agrees with the per-node overlap test."""
+        rng = random.Random(5)
+        navmesh = _grid((8, 6, 3), cell_size=1.5)
+        navmesh.grid_origin = navmesh.grid_origin + 0.25
+        navmesh._centers[:navmesh.node_count] += 0.25
+        for _ in range(50):
+            low = np.array([rng.uniform(-2, 12), rng.uniform(-2, 9), rng.uniform(-2, 4)])
+            high = low + np.array([rng.uniform(0, 4), rng.uniform(0, 4), rng.uniform(0, 4)])
+            radii = navmesh.radii[:, None]
+            scan = np.all((navmesh.centers - radii < high) & (navmesh.centers + radii > low), axis=1)
+            assert navmesh.nodes_in_box(low, high).tolist() == np.flatnonzero(scan).tolist()
+    
+    def test_reference_counts(self):
+        """Test overlapping obstacles free shared cells only when both leave."""
+        navmesh = _grid((10, 10, 1))
+        a = navmesh.add_obstacle(Point3(3, 3, 0), 0.5)
+        b = navmesh.add_obstacle(Point3(3.5, 3, 0), 0.5)
+        shared = self._cell(3, 3)
+        assert navmesh._obstacle_refs[shared] == 2
+        
+        navmesh.remove_obstacle(a)
+        assert navmesh.walkable[shared] == 0
+        navmesh.remove_obstacle(b)
+        assert self._blocked(navmesh) == set()
+    
+    def test_keeps_static_walls(self):
+        """Test obstacles never reopen cells they did not block."""
+        navmesh = _grid((10, 10, 1))
+        wall = self._cell(3, 3)
+        navmesh.set_walkable([wall], False)
+        
+        handle = navmesh.add_obstacle(Point3(3, 3, 0), 0.5)
+        navmesh.move_obstacle(handle, Point3(6, 6, 0))
+        assert self._blocked(navmesh) == {wall, self._cell(6, 6)}
+        navmesh.remove_obstacle(handle)
+        assert self._blocked(navmesh) == {wall}
+    
+    def test_keeps_walls_marked_under_obstacle(self):
+        """Test walls marked while an obstacle covers the cell outlive it."""
+        navmesh = _grid((10, 10, 1))
+        handle = navmesh.add_obstacle(Point3(5, 5, 0.5), (0.4, 0.4, 0.4))
+        assert self._blocked(navmesh) == {self._cell(5, 5)}
+        
+        navmesh.mark_obstacle(Point3(5, 5, 0), 0.1)
+        navmesh.set_walkable([self._cell(5, 6)], False)
+        navmesh.move_obstacle(handle, Point3(5, 6, 0.5))
+        assert self._blocked(navmesh) >= {self._cell(5, 5), self._cell(5, 6)}
+        
+        navmesh.remove_obstacle(handle)
+        assert {self._cell(5, 5), self._cell(5, 6)} <= self._blocked(navmesh)
+        
+        navmesh.set_walkable([self._cell(5, 6)], True)
+        handle = navmesh.add_obstacle(Point3(5, 6, 0.5), (0.4, 0.4, 0.4))
+        navmesh.remove_obstacle(handle)
+        assert self._cell(5, 6) not in self._blocked(navmesh)
+    
+    def test_move_touches_old_and_new_cells(self):
+        """Test moves report one dirty region over both positions."""
+        navmesh = _grid((10, 10, 1))
+        handle = navmesh.add_obstacle(Point3(2, 2, 0), 0.5)
+        regions = []
+        changed = []
+        navmesh.add_dirty_region_listener(regions.append)
+        navmesh.add_change_listener(lambda ids: changed.extend(ids.tolist()))
+        
+        navmesh.move_obstacle(handle, Point3(2, 2, 0), half_extents=0.3)  # same cell
+        assert regions == [] and changed == []
+        
+        navmesh.move_obstacle(handle, Point3(3, 2, 0), half_extents=(0.5, 1.0, 0.5))
+        assert len(regions) == 1
+        region = regions[0]
+        assert isinstance(region, NavMeshDirtyRegion)
+        np.testing.assert_allclose(region.bounds_min, [1.7, 1.0, -0.5])
+        np.testing.assert_allclose(region.bounds_max, [3.5, 3.0, 0.5])
+        assert sorted(region.blocked.tolist()) == [self._cell(3, y) for y in (1, 2, 3)]
+        assert region.cleared.tolist() == [self._cell(2, 2)]
+        assert sorted(changed) == sorted(region.node_ids.tolist())
+    
+    def test_caches_follow_obstacles(self):
+        """Test path cache, hierarchy and flow fields see obstacle edits."""
+        navmesh = _grid((16, 16, 1))
+        navmesh.enable_hierarchy((8, 8, 1))
+        start, goal = navmesh.nearest_node_id(Point3(0, 4, 0)), navmesh.nearest_node_id(Point3(15, 4, 0))
+        straight = navmesh.find_path_ids(start, goal)
+        door = navmesh.add_obstacle(Point3(7.5, 4, 0), (0.5, 0.5, 0.5))
+        
+        rerouted = navmesh.find_path_ids(start, goal)
+        assert len(rerouted) > len(straight)
+        assert navmesh.hierarchy.get_stats()["invalidated_clusters"] >= 2
+        
+        # Freed cells keep cached detours (still valid); fresh searches go through
+        navmesh.remove_obstacle(door)
+        assert navmesh.find_path_ids(start, goal) == rerouted
+        assert len(navmesh.find_path_ids(goal, start)) == len(straight)
+    
+    def test_flow_fields_patch_off_route_blocks(self):
+        """Test blocking cells no route enters keeps the cached field."""
+        navmesh = _grid((10, 10, 1))
+        cache = FlowFieldCache(navmesh)
+        field = cache.get(Point3(0, 0, 0))
+        
+        corner = self._cell(9, 9)
+        handle = navmesh.add_obstacle(Point3(9, 9, 0), 0.4)
+        assert cache.get(Point3(0, 0, 0)) is field
+        assert not field.reachable(corner)
+        assert cache.get_stats()["patched"] == 1
+        
+        navmesh.move_obstacle(handle, Point3(5, 5, 0))
+        rebuilt = cache.get(Point3(0, 0, 0))
+        assert rebuilt is not field
+        assert rebuilt.reachable(corner)
+        reference = FlowField(navmesh, field.goal_id)
+        np.testing.assert_allclose(rebuilt.integration, reference.integration)
+    
+    def test_regenerate_drops_obstacles(self):
+        """Test generate_grid starts with no obstacles."""
+        navmesh = _grid((6, 6, 1))
+        navmesh.add_obstacle(Point3(2, 2, 0), 1.0)
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(6, 6, 1))
+        assert navmesh.obstacle_count == 0
+        assert self._blocked(navmesh) == set()
+
+
+class TestCrowdMovement:
+    """Test the batched crowd movement stage."""
+    
+    def _walkers(self, system, count, rng):
+        agents = []
+        for i in range(count):
+            agent = system.create_agent(f"walker{i}", NodePath(f"walker{i}"))
+            agent.position = Point3(rng.uniform(0, 10), rng.uniform(0, 10), 0)
+            agent.node_path.set_pos(agent.position)
+            agent.max_speed = rng.uniform(2, 6)
+            agent.acceleration = rng.uniform(1, 5)
+            agent.path = [Point3(rng.uniform(0, 10), rng.uniform(0, 10), 0) for _ in range(3)]
+            agents.append(agent)
+        return agents
+    
+    def test_matches_per_agent_steering(self):
+        """Test batched moves follow the same trajectories as _steer."""
+        reference = self._walkers(AISystem(None), 30, random.Random(3))
+        system = AISystem(None)
+        crowd = system.enable_crowd()
+        agents = self._walkers(system, 30, random.Random(3))
+        
+        for _ in range(60):
+            statuses = [agent.move_to_next_waypoint(1 / 30) for agent in reference]
+            for agent in agents:
+                agent.move_to_next_waypoint(1 / 30)
+            crowd.update(agents)
+            
+            for agent, expected, status in zip(agents, reference, statuses):
+                assert agent.current_path_index == expected.current_path_index
+                assert (agent.position - expected.position).length() < 1e-4
+                assert agent.node_path.get_pos() == agent.position
+                if status == NodeStatus.SUCCESS:
+                    assert agent.move_to_next_waypoint(1 / 30) == NodeStatus.SUCCESS
+    
+    def test_last_submit_wins(self):
+        """Test each agent moves once per frame."""
+        crowd = CrowdMovement()
+        agent = AIAgent("mover", NodePath("mover"), None)
+        agent.max_speed = agent.acceleration = 10.0
+        crowd.submit(agent, 0.1, Point3(-5, 0, 0))
+        crowd.submit(agent, 0.1, Point3(5, 0, 0))
+        
+        assert crowd.pending == 1
+        assert crowd.update() == 1
+        assert agent.position.x == pytest.approx(1.0)
+        assert crowd.pending == 0
+    
+    def test_separation_pushes_apart(self):
+        """Test close agents spread out and idle agents still repel."""
+        crowd = CrowdMovement(separation_radius=2.0, separation_weight=4.0)
+        left = AIAgent("left", NodePath("left"), None)
+        right = AIAgent("right", NodePath("right"), None)
+        idle = AIAgent("idle", NodePath("idle"), None)
+        left.position, right.position = Point3(0, -0.25, 0), Point3(0, 0.25, 0)
+        idle.position = Point3(-1, 0, 0)
+        for agent in (left, right):
+            agent.max_speed = agent.acceleration = 10.0
+        
+        crowd.submit(left, 0.1, Point3(10, -0.25, 0))
+        crowd.submit(right, 0.1, Point3(10, 0.25, 0))
+        crowd.update([left, right, idle])
+        
+        assert left.velocity.y < 0 < right.velocity.y
+        assert crowd.get_stats()["separation_pairs"] == 4
+        assert idle.position == Point3(-1, 0, 0)
+    
+    def test_flow_crowd_reaches_target(self):
+        """Test flow field chasers move through the crowd stage."""
+        system = AISystem(None)
+        navmesh = system.create_navmesh(cell_size=1.0)
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(16, 16, 1))
+        system.enable_crowd(separation_radius=0.5, separation_weight=1.0)
+        target = Point3(14, 2, 0)
+        tree = create_flow_chase_behavior(lambda agent: target, system)
+        
+        for i in range(12):
+            agent = system.create_agent(f"zombie{i}", NodePath(f"zombie{i}"))
+            agent.node_path.set_pos(i % 4, i // 4, 0)
+            agent.max_speed = agent.acceleration = 10.0
+            agent.set_behavior_tree(tree)
+        
+        for _ in range(300):
+            system.update(1 / 30)
+        
+        assert system.get_state()["crowd"]["moved"] <= 12
+        for agent in system.agents:
+            assert (agent.position - target).length() < 1.5
+
+
+class TestAISystem:
+    """Test AI system telemetry."""
+    
+    def test_state_reports_node_count(self):
+        """Test get_state counts navmesh nodes without building views."""
+        system = AISystem(None)
+        navmesh = system.create_navmesh(cell_size=1.0)
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(4, 4, 1))
+        assert system.get_state()["navmesh"]["nodes"] == 16
+    
+    def test_state_reports_hierarchy(self):
+        """Test get_state includes hierarchy stats once enabled."""
+        system = AISystem(None)
+        navmesh = system.create_navmesh(cell_size=1.0)
+        navmesh.generate_grid(Point3(0, 0, 0), Point3(16, 16, 1))
+        assert system.get_state()["navmesh"]["hierarchy"] is None
+        
+        navmesh.enable_hierarchy((8, 8, 1))
+        assert system.get_state()["navmesh"]["hierarchy"]["clusters"] == 4
@@ -0,0 +1,97 @@
+"""Unit tests for the shared benchmark results module.
+
+Tests cover:
+- JSON round trip
+- Regression comparison (slowdowns, fingerprint changes, skipped cases)
+- Command line tail and exit code
+"""
+
+import argparse
+import json
+
+import pytest
+
+from engine_modules.benchmark_results import (
+    environment,
+    save_results,
+    load_results,
+    compare_results,
+    add_result_arguments,
+    finish,
+)
+
+
+def _document(ms, count=1000):
+    return {"results": [
+        {"name": "a", "size": 10, "ms": ms, "count": count},
+        {"name": "b", "size": 10, "skipped": True},
+    ]}
+
+
+def _compare(baseline, current, tolerance=0.10):
+    return compare_results(baseline, current, ("name", "size"), "ms", "count", tolerance)
+
+
+class TestResults:
+    """Test saving and comparing results."""
+    
+    def test_round_trip(self, tmp_path):
+        """Test results survive save/load as sorted JSON."""
+        path = tmp_path / "bench.json"
+        document = dict(_document(10.0), environment=environment())
+        save_results(document, str(path))
+        
+        assert load_results(str(path)) == document
+        assert json.loads(path.read_text()) == document
+        assert path.read_text().index('"environment"') < path.read_text().index('"results"')
+    
+    def test_compare_flags_slowdowns(self):
+        """Test slowdowns beyond the tolerance are reported."""
+        baseline = _document(10.0)
+        
+        assert _compare(baseline, _document(10.5)) == []
+        regressions = _compare(baseline, _document(12.0))
+        assert len(regressions) == 1
+        assert regressions[0]["name"] == "a"
+        assert regressions[0]["ratio"] == pytest.approx(1.2)
+        assert not regressions[0]["count_changed"]
+        assert _compare(baseline, _document(12.0), tolerance=0.5) == []
+    
+    def test_compare_flags_fingerprint_changes(self):
+        """Test a changed workload is reported even when faster."""
+        regressions = _compare(_document(10.0), _document(5.0, count=900))
+        assert regressions[0]["count_changed"]
+        assert compare_results(_document(10.0), _document(5.0, count=900), ("name",), "ms") == []
+    
+    def test_compare_ignores_unmatched_cases(self):
+        """Test cases missing from the baseline are not compared."""
+        current = {"results": [{"name": "c", "size": 10, "ms": 99.0, "count": 1}]}
+        assert _compare(_document(1.0), current) == []
+
+
+class TestFinish:
+    """Test the shared command line tail."""
+    
+    def _args(self, *argv):
+        parser = argparse.ArgumentParser()
+        add_result_arguments(parser)
+        return parser.parse_args(argv)
+    
+    def test_exit_code(self, tmp_path, capsys):
+        """Test finish writes results and fails on regressions."""
+        baseline = tmp_path / "baseline.json"
+        output = tmp_path / "out.json"
+        save_results(_document(10.0), str(baseline))
+        
+        args = self._args("--output", str(output), "--baseline", str(baseline))
+        assert finish(_document(12.0, count=900), args, _compare, lambda r: r["name"]) == 1
+        assert load_results(str(output)) == _document(12.0, count=900)
+        assert "REGRESSION a: 10.00 -> 12.00 ms (1.20x) (count changed)" in capsys.readouterr().out
+        
+        args = self._args("--baseline", str(baseline), "--tolerance", "0.5")
+        assert finish(_document(12.0), args, _compare, lambda r: r["name"]) == 0
+        assert "No regressions" in capsys.readouterr().out
+    
+    def test_no_baseline(self):
+        """Test a run without --baseline always succeeds."""
+        assert finish(_document(10.0), self._args(), _compare, lambda r: r["name"]) == 0
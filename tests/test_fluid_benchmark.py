@@ -0,0 +1,62 @@
+"""Unit tests for the fluid benchmark module.
+
+Tests cover:
+- Benchmark case records
+- Backend size limits
+- Command line results and exit code
+"""
+
+
+from engine_modules.benchmark_results import save_results, load_results
+from engine_modules.fluid_benchmark import (
+    benchmark_case,
+    run_fluid_benchmark,
+    compare_results,
+    main,
+)
+
+
+class TestBenchmarkRun:
+    """Test running benchmark cases."""
+    
+    def test_case_records_metrics(self):
+        """Test a case reports timing, pair count and peak memory."""
+        case = benchmark_case("numpy", 300, steps=2)
+        
+        assert case["backend"] == "numpy"
+        assert case["particles"] == 300
+        assert case["ms_min"] <= case["ms_per_step"] <= case["ms_max"]
+        assert case["pairs"] > 0
+        assert case["peak_memory_mb"] > 0
+    
+    def test_backends_agree_on_pairs(self):
+        """Test object and vectorized solvers see the same scene."""
+        python = benchmark_case("python", 150, steps=1)
+        numpy = benchmark_case("numpy", 150, steps=1)
+        assert python["pairs"] == numpy["pairs"]
+    
+    def test_size_limit_skips(self):
+        """Test oversize cases for slow backends are recorded as skipped."""
+        document = run_fluid_benchmark(sizes=(100, 10**6), backends=("python",), steps=1)
+        
+        assert [r.get("skipped", False) for r in document["results"]] == [False, True]
+        assert "cpu_count" in document["environment"]
+
+
+class TestCommandLine:
+    """Test the CLI wiring to the shared result helpers."""
+    
+    def test_cli_exit_code(self, tmp_path):
+        """Test the CLI writes results and fails on a regressed case."""
+        baseline = tmp_path / "baseline.json"
+        save_results({"results": [
+            {"backend": "numpy", "particles": 100, "ms_per_step": 1e-6, "pairs": -1},
+        ]}, str(baseline))
+        output = tmp_path / "out.json"
+        
+        code = main(["--sizes", "100", "--backends", "numpy", "--steps", "1",
+                     "--output", str(output), "--baseline", str(baseline)])
+        
+        assert code == 1
+        assert load_results(str(output))["results"][0]["particles"] == 100
+        assert compare_results(load_results(str(baseline)), load_results(str(output)))[0]["pairs_changed"]
@@ -0,0 +1,662 @@
+"""Unit tests for the fluid, cloth and destruction module.
+
+Tests cover:
+- Cell-sorted neighbor list construction
+- Structure-of-arrays SPH backend storage
+- Equivalence between the object and vectorized SPH solvers
+- Multi-process tiled SPH solver
+- Particle visual upload
+- Adaptive CFL substepping and frame budgets
+- Position-Based Fluids solver stability
+- Rigid body boundary coupling
+- Voronoi fracture baking, caching and fragment pooling
+- Soft body sleep, solver LOD and geom sync
+- Backend selection through FluidSystem
+"""
+
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from panda3d.core import Point3, Vec3, NodePath, GeomVertexReader, CardMaker, Camera, PerspectiveLens
+from panda3d.bullet import BulletWorld, BulletRigidBodyNode, BulletBoxShape, BulletPlaneShape
+
+from engine_modules.fluid_system import (
+    NeighborList,
+    RigidBodyColliders,
+    SPHFluidSimulation,
+    VectorizedSPHFluidSimulation,
+    ParallelSPHFluidSimulation,
+    PBFFluidSimulation,
+    FluidSystem,
+    BakedFracture,
+    FractureBaker,
+    DestructibleObject,
+)
+from engine_modules import fluid_system
+from engine_modules.asset_pipeline import AssetCache
+
+
+def _gentle(sim):
+    """Configure a sim with mild pressure so trajectories stay comparable."""
+    sim.gas_constant = 1.0
+    sim.rest_density = 20.0
+    sim.spawn_cube(Point3(0.1, 0.1, 1.0), 1.2, 0.2)
+    return sim
+
+
+def _brute_force_pairs(positions, radius):
+    """Reference set of unordered pairs closer than radius."""
+    diff = positions[:, None, :] - positions[None, :, :]
+    dist = np.sqrt((diff ** 2).sum(axis=2))
+    i, j = np.nonzero((dist < radius) & np.triu(np.ones_like(dist, dtype=bool), k=1))
+    return set(zip(i.tolist(), j.tolist()))
+
+
+class TestNeighborList:
+    """Test the cell-sorted neighbor list."""
+    
+    def test_pairs_match_brute_force(self):
+        """Test every pair within the radius is found exactly once."""
+        rng = np.random.default_rng(7)
+        positions = (rng.random((300, 3)) * 3.0 - 1.5).astype(np.float32)
+        
+        nl = NeighborList().build(positions, 0.5)
+        found = {tuple(sorted(p)) for p in zip(nl.pair_i.tolist(), nl.pair_j.tolist())}
+        
+        assert len(found) == len(nl.pair_i)
+        assert found == _brute_force_pairs(positions, 0.5)
+        np.testing.assert_allclose(nl.pair_r_vec, positions[nl.pair_i] - positions[nl.pair_j], atol=1e-6)
+    
+    def test_csr_lists_both_directions(self):
+        """Test the CSR view lists each neighbor from both sides."""
+        positions = np.array([[0, 0, 0], [0.3, 0, 0], [0.6, 0, 0], [5, 5, 5]], dtype=np.float32)
+        nl = NeighborList().build(positions, 0.5)
+        
+        assert nl.pair_count == 4
+        assert sorted(nl.neighbors(1).tolist()) == [0, 2]
+        assert nl.neighbors(0).tolist() == [1]
+        assert nl.neighbors(3).tolist() == []
+        assert nl.offsets[-1] == len(nl.indices)
+    
+    def test_sparse_fallback(self):
+        """Test widely spread particles use the compacted cell index."""
+        rng = np.random.default_rng(3)
+        positions = (rng.random((200, 3)) * 1000.0).astype(np.float32)
+        positions[1] = positions[0] + 0.1
+        
+        nl = NeighborList()
+        nl.MAX_DENSE_CELLS = 16
+        nl.build(positions, 0.5)
+        
+        assert _brute_force_pairs(positions, 0.5) == {
+            tuple(sorted(p)) for p in zip(nl.pair_i.tolist(), nl.pair_j.tolist())
+        }
+
+
+class TestVectorizedSPH:
+    """Test the structure-of-arrays SPH backend."""
+    
+    def test_arrays_grow_with_particles(self):
+        """Test particle arrays are contiguous float32 and grow on demand."""
+        sim = VectorizedSPHFluidSimulation(particle_count=4)
+        for i in range(40):
+            sim.add_particle(Point3(i * 0.1, 0, 0), Vec3(1, 0, 0))
+        
+        assert sim.particle_count == 40
+        assert sim.positions.shape == (40, 3)
+        assert sim.positions.dtype == np.float32
+        assert sim.positions.flags['C_CONTIGUOUS']
+        assert sim.velocities[39, 0] == pytest.approx(1.0)
+        assert sim.positions[39, 0] == pytest.approx(3.9)
+    
+    def test_spawn_cube_matches_object_order(self):
+        """Test spawn_cube lays particles out in the same order as the object path."""
+        ref = SPHFluidSimulation()
+        vec = VectorizedSPHFluidSimulation()
+        for sim in (ref, vec):
+            sim.spawn_cube(Point3(1, 2, 3), 1.0, 0.25)
+        
+        np.testing.assert_allclose(ref.get_positions(), vec.get_positions(), atol=1e-6)
+    
+    def test_matches_object_solver(self):
+        """Test the vectorized solver reproduces the object solver."""
+        ref = _gentle(SPHFluidSimulation())
+        vec = _gentle(VectorizedSPHFluidSimulation())
+        
+        for _ in range(5):
+            ref.update(1.0 / 60.0)
+            vec.update(1.0 / 60.0)
+        
+        ref_density = np.array([p.density for p in ref.particles])
+        np.testing.assert_allclose(vec.get_positions(), ref.get_positions(), atol=1e-4)
+        np.testing.assert_allclose(vec.densities, ref_density, rtol=1e-4)
+    
+    def test_particle_snapshot(self):
+        """Test particles property exposes SPHParticle snapshots."""
+        sim = VectorizedSPHFluidSimulation()
+        sim.add_particle(Point3(1, 2, 3))
+        
+        snapshot = sim.particles
+        assert len(snapshot) == 1
+        assert snapshot[0].position[2] == pytest.approx(3.0)
+
+
+class TestParallelSPH:
+    """Test the shared-memory process pool solver."""
+    
+    def test_matches_vectorized_solver(self):
+        """Test slab decomposition with ghost layers reproduces the serial result."""
+        ref = _gentle(VectorizedSPHFluidSimulation())
+        par = _gentle(ParallelSPHFluidSimulation(workers=2))
+        par.min_parallel_particles = 0
+        
+        try:
+            for _ in range(3):
+                ref.update(1.0 / 60.0)
+                par.update(1.0 / 60.0)
+            
+            np.testing.assert_allclose(par.positions, ref.positions, atol=1e-5)
+            np.testing.assert_allclose(par.densities, ref.densities, rtol=1e-5)
+            
+            assert len(par.worker_timings) == 2
+            assert sum(t['owned'] for t in par.worker_timings) == par.particle_count
+            assert all('density_ms' in t and 'forces_ms' in t for t in par.worker_timings)
+        finally:
+            par.close()
+    
+    def test_growth_restarts_pool(self):
+        """Test adding particles after the pool started keeps state intact."""
+        par = ParallelSPHFluidSimulation(particle_count=16, workers=2)
+        par.min_parallel_particles = 0
+        
+        try:
+            par.spawn_cube(Point3(0, 0, 0), 1.0, 0.25)
+            par.update(0.01)
+            before = par.positions.copy()
+            
+            par.spawn_cube(Point3(3, 0, 0), 1.0, 0.25)
+            assert np.array_equal(par.positions[:len(before)], before)
+            
+            par.update(0.01)
+            assert par.particle_count == 2 * len(before)
+            assert len(par.worker_timings) == 2
+        finally:
+            par.close()
+        
+        assert not par._workers
+
+
+def _visual_positions(node_path):
+    """Read back vertex positions from a fluid visual."""
+    vdata = node_path.node().get_geom(0).get_vertex_data()
+    reader = GeomVertexReader(vdata, 'vertex')
+    return np.array([tuple(reader.get_data3()) for _ in range(vdata.get_num_rows())])
+
+
+class TestFluidVisual:
+    """Test the buffer-copy particle visual path."""
+    
+    @pytest.mark.parametrize("sim_class", [SPHFluidSimulation, VectorizedSPHFluidSimulation])
+    def test_visual_tracks_positions(self, sim_class):
+        """Test create_visual and update_visual upload current positions."""
+        sim = _gentle(sim_class())
+        visual = sim.create_visual(NodePath("render"))
+        np.testing.assert_allclose(_visual_positions(visual), sim.get_positions(), atol=1e-6)
+        
+        sim.update(1.0 / 60.0)
+        sim.update_visual()
+        np.testing.assert_allclose(_visual_positions(visual), sim.get_positions(), atol=1e-6)
+    
+    def test_skips_unchanged_frames(self):
+        """Test update_visual does nothing when the sim has not stepped."""
+        sim = _gentle(VectorizedSPHFluidSimulation())
+        visual = sim.create_visual(NodePath("render"))
+        
+        sim.positions[:] = 0.0
+        sim.update_visual()
+        assert np.abs(_visual_positions(visual)).max() > 0
+        
+        sim.update_visual(force=True)
+        assert np.abs(_visual_positions(visual)).max() == 0
+    
+    def test_respawn_resizes_visual(self):
+        """Test adding particles after create_visual grows the point primitive."""
+        sim = _gentle(VectorizedSPHFluidSimulation())
+        visual = sim.create_visual(NodePath("render"))
+        
+        sim.spawn_cube(Point3(4, 4, 4), 0.4, 0.2)
+        sim.update_visual()
+        
+        geom = visual.node().get_geom(0)
+        assert geom.get_vertex_data().get_num_rows() == sim.particle_count
+        assert geom.get_primitive(0).get_num_vertices() == sim.particle_count
+    
+    def test_fluid_system_updates_visuals(self):
+        """Test FluidSystem.update refreshes visuals of stepped sims."""
+        system = FluidSystem(None, BulletWorld())
+        sim = _gentle(system.create_fluid_simulation(backend="numpy"))
+        visual = sim.create_visual(NodePath("render"))
+        
+        system.update(1.0 / 60.0)
+        np.testing.assert_allclose(_visual_positions(visual), sim.get_positions(), atol=1e-6)
+
+
+class TestAdaptiveStepping:
+    """Test CFL/force based substep selection."""
+    
+    def test_calm_fluid_takes_large_steps(self):
+        """Test a resting fluid advances a frame in a single substep."""
+        sim = VectorizedSPHFluidSimulation()
+        sim.adaptive_timestep = True
+        sim.add_particle(Point3(0, 0, 0))
+        
+        sim.update(1.0 / 60.0)
+        assert sim.last_step_stats['substeps'] == 1
+        assert sim.last_step_stats['simulated_time'] == pytest.approx(1.0 / 60.0)
+    
+    @pytest.mark.parametrize("sim_class", [SPHFluidSimulation, VectorizedSPHFluidSimulation])
+    def test_fast_fluid_subdivides(self, sim_class):
+        """Test high velocities shrink the step to satisfy the CFL limit."""
+        sim = sim_class()
+        sim.adaptive_timestep = True
+        sim.add_particle(Point3(0, 0, 0), Vec3(50, 0, 0))
+        
+        cfl_step = sim.cfl_factor * sim.smoothing_radius / 50.0
+        assert sim.compute_stable_time_step() == pytest.approx(cfl_step, rel=1e-3)
+        
+        sim.update(1.0 / 60.0)
+        stats = sim.last_step_stats
+        assert stats['substeps'] >= 4
+        assert stats['time_step'] <= cfl_step + 1e-9
+        assert stats['simulated_time'] == pytest.approx(1.0 / 60.0)
+    
+    def test_budget_overrun_drops_time(self):
+        """Test exceeding the frame budget stops substepping and is reported."""
+        profiler = Mock()
+        system = FluidSystem(None, BulletWorld(), profiler=profiler)
+        sim = system.create_fluid_simulation(backend="numpy")
+        sim.adaptive_timestep = True
+        sim.step_budget_ms = 1e-9
+        sim.add_particle(Point3(0, 0, 0), Vec3(50, 0, 0))
+        
+        system.update(1.0 / 60.0)
+        
+        assert sim.last_step_stats['substeps'] == 1
+        assert sim.last_step_stats['budget_overrun']
+        assert sim.budget_overruns == 1
+        profiler.record_zone.assert_called_once()
+        profiler.record_counter.assert_any_call('fluid_budget_overruns', 1)
+        profiler.record_counter.assert_any_call('fluid_time_step', sim.last_step_stats['time_step'])
+
+
+class TestPBF:
+    """Test the Position-Based Fluids solver."""
+    
+    def test_calibrates_rest_density(self):
+        """Test the rest density is taken from the initial packing."""
+        sim = PBFFluidSimulation()
+        sim.spawn_cube(Point3(0, 0, 0), 1.0, 0.25)
+        sim.update(1.0 / 60.0)
+        
+        assert sim.rest_density > 0
+        assert sim.last_step_stats['substeps'] == 1
+    
+    def test_stable_at_frame_rate_steps(self):
+        """Test a falling block settles at one 1/60 s step per frame."""
+        sim = PBFFluidSimulation()
+        sim.spawn_cube(Point3(0, 0, -8.5), 2.0, 0.25)
+        
+        for _ in range(120):
+            sim.update(1.0 / 60.0)
+        
+        assert np.isfinite(sim.positions).all()
+        assert np.abs(sim.positions).max() <= 10.0
+        assert np.linalg.norm(sim.velocities, axis=1).max() < 5.0
+        assert sim.densities.max() < 1.3 * sim.rest_density
+    
+    def test_explicit_sph_unstable_at_same_step(self):
+        """Test the same scene with explicit SPH is not usable at 1/60 s."""
+        sim = VectorizedSPHFluidSimulation()
+        sim.spawn_cube(Point3(0, 0, -8.5), 2.0, 0.25)
+        
+        for _ in range(30):
+            sim.update(1.0 / 60.0)
+        
+        assert np.linalg.norm(sim.velocities, axis=1).max() > 5.0
+
+
+def _rigid_world(box_mass=0.0):
+    """World with a ground plane and a 2x2x1 box resting on it."""
+    render = NodePath('render')
+    world = BulletWorld()
+    
+    ground = BulletRigidBodyNode('ground')
+    ground.add_shape(BulletPlaneShape(Vec3(0, 0, 1), 0))
+    render.attach_new_node(ground)
+    world.attach_rigid_body(ground)
+    
+    box = BulletRigidBodyNode('box')
+    box.add_shape(BulletBoxShape(Vec3(1, 1, 0.5)))
+    box.set_mass(box_mass)
+    render.attach_new_node(box).set_pos(0, 0, 0.5)
+    world.attach_rigid_body(box)
+    return world, box
+
+
+class TestRigidCoupling:
+    """Test fluid boundaries against Bullet rigid bodies."""
+    
+    def test_gather_flattens_bounds(self):
+        """Test bodies become AABB rows and planes become half-spaces."""
+        world, box = _rigid_world()
+        NodePath.any_path(box).set_h(90)
+        colliders = RigidBodyColliders()
+        colliders.gather(world)
+        
+        assert colliders.box_count == 1
+        np.testing.assert_allclose(colliders.box_min[0], [-1, -1, 0], atol=1e-5)
+        np.testing.assert_allclose(colliders.box_max[0], [1, 1, 1], atol=1e-5)
+        np.testing.assert_allclose(colliders.plane_normals, [[0, 0, 1]])
+        np.testing.assert_allclose(colliders.plane_offsets, [0])
+    
+    def test_resolve_pushes_out_and_reflects(self):
+        """Test penetrating particles exit the nearest face with a bounce."""
+        world, _ = _rigid_world()
+        colliders = RigidBodyColliders()
+        colliders.gather(world)
+        
+        positions = np.array([[0.0, 0.0, 0.9], [3.0, 0.0, -0.2], [3.0, 0.0, 2.0]], dtype=np.float32)
+        velocities = np.array([[0, 0, -2.0], [0, 0, -1.0], [0, 0, -1.0]], dtype=np.float32)
+        colliders.resolve(positions, velocities, np.ones(3, dtype=np.float32), restitution=0.5)
+        
+        np.testing.assert_allclose(positions[:, 2], [1.0, 0.0, 2.0])
+        np.testing.assert_allclose(velocities[:, 2], [1.0, 0.5, -1.0])
+        assert colliders.contacts == 2
+    
+    def test_impulses_reach_dynamic_bodies(self):
+        """Test particle momentum change is applied to the body in one batch."""
+        world, box = _rigid_world(box_mass=5.0)
+        sim = VectorizedSPHFluidSimulation()
+        sim.physics_world = world
+        sim.gravity[:] = 0
+        sim.add_particles(np.array([[-0.5, 0, 1.01], [0.5, 0, 1.01]]),
+                          velocities=np.array([[0, 0, -2.0], [0, 0, -2.0]]))
+        
+        sim.update(0.01)
+        
+        # Each particle reverses with restitution 0.5: delta-v of 3 per particle
+        assert box.get_linear_velocity().z == pytest.approx(-6.0 / 5.0, rel=1e-4)
+        np.testing.assert_allclose(sim.velocities[:, 2], [1.0, 1.0])
+    
+    @pytest.mark.parametrize("sim_class", [SPHFluidSimulation, VectorizedSPHFluidSimulation, PBFFluidSimulation])
+    def test_ground_plane_replaces_box(self, sim_class):
+        """Test a ground plane holds the fluid with the fallback box disabled."""
+        world, _ = _rigid_world()
+        sim = sim_class()
+        sim.physics_world = world
+        sim.bounds = None
+        sim.spawn_cube(Point3(4, 0, 0.5), 0.6, 0.2)
+        
+        for _ in range(20):
+            sim.update(1.0 / 60.0)
+        
+        assert sim.get_positions()[:, 2].min() >= 0.0
+
+
+def _cube_mesh(parent):
+    """Closed 2x2x2 cube built from six cards."""
+    maker = CardMaker('face')
+    maker.set_frame(-1, 1, -1, 1)
+    cube = parent.attach_new_node('cube')
+    for h, p, pos in [(0, 0, (0, -1, 0)), (180, 0, (0, 1, 0)), (90, 0, (1, 0, 0)),
+                      (-90, 0, (-1, 0, 0)), (0, -90, (0, 0, 1)), (0, 90, (0, 0, -1))]:
+        face = cube.attach_new_node(maker.generate())
+        face.set_hpr(h, p, 0)
+        face.set_pos(*pos)
+    return cube
+
+
+needs_scipy = pytest.mark.skipif(not fluid_system.SCIPY_AVAILABLE, reason="Voronoi baking needs scipy")
+
+
+class TestFracture:
+    """Test baked Voronoi fracture and the fragment pool."""
+    
+    @needs_scipy
+    def test_cells_partition_the_mesh(self):
+        """Test baked cells are convex pieces that fill the mesh volume."""
+        cube = _cube_mesh(NodePath('render'))
+        fracture = FractureBaker().bake(cube, num_fragments=6, seed=3)
+        
+        assert fracture.fragment_count == 6
+        assert fracture.volumes.sum() == pytest.approx(8.0, rel=1e-4)
+        for centroid, vertices in zip(fracture.centroids, fracture.vertices):
+            assert np.all(np.abs(centroid + vertices) <= 1.0 + 1e-5)
+    
+    @needs_scipy
+    def test_cache_round_trip(self, tmp_path):
+        """Test a second bake of the same mesh loads from the asset cache."""
+        cube = _cube_mesh(NodePath('render'))
+        cache = AssetCache(str(tmp_path / "cache"))
+        first = FractureBaker(cache).bake(cube, num_fragments=5)
+        
+        baker = FractureBaker(cache)
+        second = baker.bake(cube, num_fragments=5)
+        
+        assert (baker.bakes, baker.cache_hits) == (0, 1)
+        np.testing.assert_allclose(second.centroids, first.centroids)
+        for a, b in zip(first.triangles, second.triangles):
+            np.testing.assert_array_equal(a, b)
+    
+    @needs_scipy
+    def test_save_load(self, tmp_path):
+        """Test fragments survive a .npz round trip."""
+        cube = _cube_mesh(NodePath('render'))
+        fracture = FractureBaker().bake(cube, num_fragments=4)
+        fracture.save(str(tmp_path / "f.npz"))
+        
+        loaded = BakedFracture.load(str(tmp_path / "f.npz"))
+        np.testing.assert_allclose(loaded.volumes, fracture.volumes)
+        assert [len(v) for v in loaded.vertices] == [len(v) for v in fracture.vertices]
+    
+    @needs_scipy
+    def test_fracture_swaps_in_pooled_fragments(self):
+        """Test fracture shows pre-built fragments and enables their bodies."""
+        render = NodePath('render')
+        cube = _cube_mesh(render)
+        cube.set_pos(5, 0, 2)
+        world = BulletWorld()
+        obj = DestructibleObject(cube, world)
+        obj.prepare_fracture(num_fragments=4)
+        
+        pooled = list(obj.fragment_pool.nodes)
+        assert all(node.is_hidden() for node in pooled)
+        assert world.get_num_rigid_bodies() == 0
+        
+        obj.take_damage(60.0, Point3(5, 0, 3))
+        
+        assert obj.is_fractured and cube.is_hidden()
+        assert obj.fragments == pooled
+        assert not any(node.is_hidden() for node in pooled)
+        assert world.get_num_rigid_bodies() == 4
+        for node, centroid in zip(pooled, obj.fragment_pool.fracture.centroids):
+            np.testing.assert_allclose(node.get_pos(render), centroid + [5, 0, 2], atol=1e-5)
+        
+        obj.restore()
+        assert world.get_num_rigid_bodies() == 0
+        assert not cube.is_hidden() and all(node.is_hidden() for node in pooled)
+    
+    @needs_scipy
+    def test_impulse_pushes_away_in_world_space(self):
+        """Test impulses point from the impact to fragments under a moved parent."""
+        render = NodePath('render')
+        holder = render.attach_new_node('holder')
+        holder.set_pos(100, 0, 0)
+        obj = DestructibleObject(_cube_mesh(holder), BulletWorld())
+        obj.fracture_impulse = 5.0
+        obj.prepare_fracture(num_fragments=4)
+        
+        obj.fracture(Point3(100, 0, -5))
+        for node in obj.fragments:
+            velocity = node.node().get_linear_velocity()
+            offset = node.get_pos(render) - Point3(100, 0, -5)
+            offset.normalize()
+            velocity.normalize()
+            assert velocity.dot(offset) == pytest.approx(1.0, abs=1e-4)
+    
+    @needs_scipy
+    def test_detached_object_has_no_pool(self):
+        """Test fragments are not built under a node that never renders."""
+        cube = _cube_mesh(NodePath('render'))
+        cube.detach_node()
+        obj = DestructibleObject(cube, BulletWorld())
+        with pytest.raises(ValueError):
+            obj.prepare_fracture(num_fragments=4)
+    
+    @needs_scipy
+    def test_make_destructible_prepares_from_cache(self, tmp_path):
+        """Test make_destructible bakes at load time through the system's cache."""
+        render = NodePath('render')
+        system = FluidSystem(None, BulletWorld(), fracture_cache_dir=str(tmp_path / "cache"))
+        
+        first = system.make_destructible(_cube_mesh(render), num_fragments=4)
+        second = system.make_destructible(_cube_mesh(render), num_fragments=4)
+        
+        assert first.fragment_pool is not None and second.fragment_pool is not None
+        assert (system.fracture_baker.bakes, system.fracture_baker.cache_hits) == (1, 1)
+    
+    @needs_scipy
+    def test_no_cache_dir_bakes_without_writing(self, tmp_path, monkeypatch):
+        """Test systems without a cache directory never write one."""
+        monkeypatch.chdir(tmp_path)
+        render = NodePath('render')
+        system = FluidSystem(None, BulletWorld())
+        
+        assert system.make_destructible(_cube_mesh(render), num_fragments=4).fragment_pool is not None
+        assert system.fracture_baker.cache is None
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_unprepared_fracture_does_not_bake(self, caplog):
+        """Test fracturing an unprepared object warns and uses copies."""
+        render = NodePath('render')
+        cube = _cube_mesh(render)
+        obj = DestructibleObject(cube, BulletWorld())
+        
+        with caplog.at_level("WARNING"):
+            obj.fracture(Point3(0, 0, 0), num_fragments=3)
+        
+        assert obj.fragment_pool is None
+        assert len(obj.fragments) == 3
+        assert "prepare_fracture" in caplog.text
+    
+    def test_without_scipy_falls_back_to_copies(self, monkeypatch):
+        """Test objects still break apart (as copies) when scipy is missing."""
+        monkeypatch.setattr(fluid_system, "SCIPY_AVAILABLE", False)
+        render = NodePath('render')
+        cube = _cube_mesh(render)
+        system = FluidSystem(None, BulletWorld())
+        obj = system.make_destructible(cube)
+        assert obj.fragment_pool is None
+        
+        obj.take_damage(60.0, Point3(0, 0, 1))
+        assert obj.is_fractured and cube.is_hidden()
+        assert len(obj.fragments) == 8
+        assert all(fragment.get_parent() == render for fragment in obj.fragments)
+
+
+class TestSoftBodyManager:
+    """Test cloth LOD and cost tracking."""
+    
+    def _scene(self):
+        render = NodePath('render')
+        world = BulletWorld()
+        world.set_gravity(Vec3(0, 0, -9.81))
+        system = FluidSystem(None, world)
+        cloth = system.create_cloth(Point3(0, 0, 0), Point3(2, 0, 2), 6, 6)
+        cloth.reparent_to(render)
+        camera = render.attach_new_node(Camera('cam', PerspectiveLens()))
+        return world, system.cloth_system.soft_bodies, cloth, camera
+    
+    def test_cloth_geom_follows_nodes(self):
+        """Test the render geom is linked and tracks soft body nodes."""
+        world, manager, cloth, _ = self._scene()
+        world.do_physics(1.0 / 60.0)
+        
+        geom = cloth.find('**/+GeomNode')
+        reader = GeomVertexReader(geom.node().get_geom(0).get_vertex_data(), 'vertex')
+        rows = []
+        while not reader.is_at_end():
+            rows.append(tuple(reader.get_data3()))
+        nodes = [tuple(e.get_pos()) for e in cloth.node().get_nodes()]
+        np.testing.assert_allclose(rows, nodes, atol=1e-4)
+        assert manager.get_stats()['sync_rows'] == 36
+    
+    def test_far_cloth_sleeps_with_hysteresis(self):
+        """Test distant cloth leaves the world and wakes only inside the band."""
+        world, manager, _, camera = self._scene()
+        
+        manager.update(Point3(1, -100, 1))
+        assert world.get_num_soft_bodies() == 0
+        assert manager.get_stats()['step_cost'] == 0
+        
+        manager.update(Point3(1, -manager.sleep_distance + 2, 1))
+        assert manager.records[0].asleep
+        
+        manager.update(Point3(1, -10, 1))
+        assert world.get_num_soft_bodies() == 1
+        assert not manager.records[0].asleep
+    
+    def test_iterations_drop_with_distance_and_visibility(self):
+        """Test solver iterations follow distance bands and screen presence."""
+        _, manager, cloth, camera = self._scene()
+        cfg = cloth.node().get_cfg()
+        
+        camera.set_pos(1, -10, 1)
+        manager.update(camera.get_pos(), camera)
+        assert cfg.get_positions_solver_iterations() == 4
+        
+        camera.set_pos(1, -25, 1)
+        manager.update(camera.get_pos(), camera)
+        assert cfg.get_positions_solver_iterations() == 2
+        
+        camera.look_at(1, -50, 1)
+        manager.update(camera.get_pos(), camera)
+        record = manager.records[0]
+        assert not record.on_screen and not record.linked
+        assert cfg.get_positions_solver_iterations() == 1
+        assert manager.get_stats()['bodies'][0]['step_cost'] == 36
+    
+    def test_profiler_counters(self):
+        """Test manager totals are reported to the profiler."""
+        profiler = Mock()
+        world = BulletWorld()
+        system = FluidSystem(None, world, profiler=profiler)
+        system.create_cloth(Point3(0, 0, 0), Point3(2, 0, 2), 4, 4)
+        
+        system.cloth_system.soft_bodies.update(Point3(0, -5, 0))
+        profiler.record_counter.assert_any_call('soft_body_active', 1)
+        profiler.record_counter.assert_any_call('soft_body_step_cost', 16 * 4)
+
+
+class TestFluidSystem:
+    """Test FluidSystem backend selection."""
+    
+    def test_backend_selection(self):
+        """Test create_fluid_simulation picks the requested backend."""
+        system = FluidSystem(None, BulletWorld())
+        
+        assert type(system.create_fluid_simulation()) is SPHFluidSimulation
+        assert isinstance(system.create_fluid_simulation(backend="numpy"), VectorizedSPHFluidSimulation)
+        
+        parallel = system.create_fluid_simulation(backend="parallel", workers=2)
+        assert parallel.num_workers == 2
+        parallel.close()
+        assert isinstance(system.create_fluid_simulation(backend="pbf"), PBFFluidSimulation)
+        assert len(system.fluid_simulations) == 4
+        assert all(sim.physics_world is system.physics_world for sim in system.fluid_simulations)
+    
+    def test_unknown_backend(self):
+        """Test unknown backends are rejected."""
+        system = FluidSystem(None, BulletWorld())
+        with pytest.raises(ValueError):
+            system.create_fluid_simulation(backend="cuda")
@@ -0,0 +1,97 @@
+"""Unit tests for the pathfinding benchmark module.
+
+Tests cover:
+- Grid layouts and query generation
+- Benchmark case records and cost agreement
+- Cost mismatch checks and CLI
+"""
+
+import numpy as np
+import pytest
+
+from engine_modules.benchmark_results import save_results, load_results
+from engine_modules.pathfinding_benchmark import (
+    create_navmesh,
+    create_queries,
+    benchmark_case,
+    run_pathfinding_benchmark,
+    check_costs,
+    compare_results,
+    main,
+)
+
+
+class TestLayouts:
+    """Test benchmark grid layouts."""
+    
+    def test_maze_is_connected(self):
+        """Test every open maze cell is reachable from every other."""
+        navmesh = create_navmesh("maze", 21)
+        open_ids = np.flatnonzero(navmesh.walkable)
+        
+        assert 0.3 < len(open_ids) / navmesh.node_count < 0.8
+        for goal in open_ids[::25]:
+            assert navmesh.find_path_ids(int(open_ids[0]), int(goal))
+    
+    def test_queries_are_walkable(self):
+        """Test queries only use walkable cells and repeat per seed."""
+        navmesh = create_navmesh("open", 32, seed=3)
+        queries = create_queries(navmesh, 10, seed=3)
+        
+        assert all(navmesh.walkable[a] and navmesh.walkable[b] for a, b in queries)
+        assert queries == create_queries(navmesh, 10, seed=3)
+    
+    def test_unknown_layout(self):
+        """Test unknown layouts are rejected."""
+        with pytest.raises(ValueError):
+            create_navmesh("cave", 16)
+
+
+class TestBenchmarkRun:
+    """Test running benchmark cases."""
+    
+    def test_case_records_metrics(self):
+        """Test a case reports timing, expansions and path cost."""
+        case = benchmark_case("open", 24, "jps", queries=4)
+        
+        assert case["search"] == "jps"
+        assert case["found"] == 4
+        assert case["ms_total"] >= case["ms_per_query"] > 0
+        assert case["expansions"] > 0 and case["path_cost"] > 0
+    
+    def test_modes_agree_on_cost(self):
+        """Test A* and JPS find equally short paths, JPS with fewer expansions."""
+        document = run_pathfinding_benchmark(sizes=(33,), queries=5)
+        
+        assert check_costs(document) == []
+        by_mode = {(r["layout"], r["mode"]): r for r in document["results"]}
+        for layout in ("open", "maze"):
+            assert by_mode[(layout, "jps")]["expansions"] < by_mode[(layout, "astar")]["expansions"]
+
+
+class TestResults:
+    """Test cost checks and the CLI."""
+    
+    def test_check_costs_flags_mismatch(self):
+        """Test differing path costs between modes are reported."""
+        document = {"results": [
+            {"layout": "maze", "size": 16, "mode": "astar", "found": 2, "path_cost": 40.0},
+            {"layout": "maze", "size": 16, "mode": "jps", "found": 2, "path_cost": 38.0},
+        ]}
+        assert check_costs(document)[0]["costs"] == (40.0, 38.0)
+    
+    def test_cli_exit_code(self, tmp_path):
+        """Test the CLI writes results and fails on regressions."""
+        baseline = tmp_path / "baseline.json"
+        save_results({"results": [
+            {"layout": "open", "size": 16, "mode": "astar", "ms_per_query": 1e-9, "expansions": -1},
+        ]}, str(baseline))
+        output = tmp_path / "out.json"
+        
+        code = main(["--sizes", "16", "--layouts", "open", "--queries", "2",
+                     "--output", str(output), "--baseline", str(baseline)])
+        
+        assert code == 1
+        current = load_results(str(output))
+        assert len(current["results"]) == 2
+        assert compare_results(load_results(str(baseline)), current)[0]["expansions_changed"]
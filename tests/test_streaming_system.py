@@ -0,0 +1,138 @@
+"""Unit tests for the world streaming module.
+
+Tests cover:
+- Zone spatial index queries
+- Streaming updates that rank only the zones near the player
+- Reuse of the ranking until the player moves far enough
+"""
+
+import random
+
+import pytest
+from panda3d.core import Point3, NodePath
+
+from engine_modules.streaming_system import (
+    StreamingManager,
+    StreamingPriority,
+    ZoneSpatialIndex,
+)
+
+
+class _Base:
+    """Minimal ShowBase stand-in (no loader, so zones load empty)."""
+
+    def __init__(self):
+        self.render = NodePath("render")
+        self.loader = None
+
+
+def _grid_manager(grid=(64, 64), zone_size=50.0):
+    manager = StreamingManager(_Base())
+    manager.create_grid_zones(grid, zone_size)
+    manager.max_loaded_zones = 1000
+    manager.max_concurrent_loads = 1000
+    return manager
+
+
+class TestZoneSpatialIndex:
+    """Test the zone grid."""
+
+    def test_query_is_superset(self):
+        """Test queries return every zone within reach of the point."""
+        rng = random.Random(2)
+        manager = StreamingManager(_Base())
+        for i in range(300):
+            manager.create_zone(f"z{i}", Point3(rng.uniform(-500, 500), rng.uniform(-500, 500), 0),
+                                rng.uniform(5, 60))
+        index = ZoneSpatialIndex(40.0)
+        for zone in manager.zones.values():
+            index.insert(zone)
+
+        for _ in range(50):
+            point = Point3(rng.uniform(-600, 600), rng.uniform(-600, 600), 0)
+            reach = rng.uniform(0, 200)
+            found = {zone.zone_id for zone in index.query(point, reach)}
+            near = {zone.zone_id for zone in manager.zones.values() if zone.distance_to(point) <= reach + zone.radius}
+            assert near <= found
+            assert len(found) == len(set(found))
+
+    def test_large_zone_spans_cells(self):
+        """Test zones are found from every cell their bounds overlap."""
+        manager = StreamingManager(_Base())
+        zone = manager.create_zone("big", Point3(0, 0, 0), 100.0)
+        index = ZoneSpatialIndex(10.0)
+        index.insert(zone)
+        assert index.query(Point3(95, 0, 0), 0.0) == [zone]
+        assert index.query(Point3(150, 0, 0), 0.0) == []
+
+
+class TestStreamingManager:
+    """Test indexed streaming updates."""
+
+    def test_matches_full_scan(self):
+        """Test the ranking holds exactly the zones a full scan would keep."""
+        manager = _grid_manager()
+        rng = random.Random(4)
+        for _ in range(20):
+            manager.update_player_position(Point3(rng.uniform(-1600, 1600), rng.uniform(-1600, 1600), 0))
+            manager.update(0.016)
+
+            expected = {zone.zone_id: manager._calculate_priority(zone) for zone in manager.zones.values()}
+            ranked = {zone.zone_id: priority for zone, priority in manager._rank_zones()}
+            kept = {zone_id for zone_id, priority in expected.items() if priority != StreamingPriority.UNLOAD}
+            assert kept <= set(ranked)
+            assert all(ranked[zone_id] == expected[zone_id] for zone_id in ranked)
+            assert manager.loaded_zones == kept
+            assert all(zone.priority == expected[zone.zone_id].value for zone in manager.zones.values())
+
+        assert manager.get_status()["zones_evaluated"] < len(manager.zones) // 50
+
+    def test_ranking_reused_for_small_moves(self):
+        """Test priorities are recomputed on cell changes or long moves only."""
+        manager = _grid_manager((8, 8))
+        manager.update_player_position(Point3(10, 10, 0))
+        manager.update(0.016)
+        assert manager.priority_updates == 1
+
+        manager.update_player_position(Point3(13, 10, 0))
+        manager.update(0.016)
+        assert manager.priority_updates == 1
+
+        manager.update_player_position(Point3(20, 10, 0))  # same 50 m cell, 10 m from the last ranking
+        manager.update(0.016)
+        assert manager.priority_updates == 2
+
+        manager.update_player_position(Point3(50.5, 10, 0))
+        manager.update(0.016)
+        manager.update_player_position(Point3(49.5, 10, 0))
+        manager.update(0.016)
+        assert manager.priority_updates == 4
+
+        manager.set_budgets(max_loaded_zones=1000, view_distance=60.0)
+        manager.update(0.016)
+        assert manager.priority_updates == 5
+
+    def test_far_loaded_zones_unload(self):
+        """Test zones loaded near the old position unload after a teleport."""
+        manager = _grid_manager()
+        manager.update_player_position(Point3(0, 0, 0))
+        manager.update(0.016)
+        before = set(manager.loaded_zones)
+        assert "zone_32_32" in before
+
+        manager.update_player_position(Point3(1500, 1500, 0))
+        manager.update(0.016)
+        assert not before & manager.loaded_zones
+        assert manager.zones["zone_32_32"].priority == StreamingPriority.UNLOAD.value
+
+    def test_new_zones_are_indexed(self):
+        """Test zones created after an update are picked up."""
+        manager = _grid_manager((4, 4))
+        manager.update(0.016)
+        zone = manager.create_zone("late", Point3(5000, 5000, 0), 25.0)
+
+        manager.update_player_position(Point3(5000, 5000, 0))
+        manager.update(0.016)
+        assert zone.is_loaded
+        assert zone.priority == StreamingPriority.CRITICAL.value
+        assert manager.zone_index.count == 17